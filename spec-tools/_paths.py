@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+# Where the SPEC CPU 2017 tools find the modules they share
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to add the strmem benchmarks directory to the module search path,
+since the support module is shared with them.  Scripts import it before
+support.
+"""
+
+import os.path
+import sys
+
+# What we export
+
+__all__ = []
+
+_STRMEM = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), 'strmem-benchmarks')
+if _STRMEM not in sys.path:
+    sys.path.append(_STRMEM)
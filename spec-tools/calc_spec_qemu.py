@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# Script to compute SPEC CPU 2017 scores obtained by QEMU
+
+# Copyright (C) 2023, 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This computes the SPEC ratios of any number of runs of SPEC CPU 2017 under
+QEMU, from the instruction counts of their workloads.
+
+Each run is given by the log file of runspec-qemu.sh, which names the SPEC
+tree and data size, or by a SPEC tree and --size.  It may be labeled, for
+example with the QEMU commit, as LABEL=LOG or LABEL=DIR.
+"""
+
+import argparse
+import os
+import os.path
+import sys
+
+import _paths  # pylint: disable=unused-import
+from speclog import SpecLogIndex
+from specresults import BaseData
+from specresults import IcountScanner
+from specresults import SpecRun
+from specresults import SpecScores
+from support import check_python_version
+
+
+def parse_args():
+    """Parse the arguments."""
+    tooldir_dft = os.path.dirname(os.path.dirname(os.path.abspath(
+        sys.argv[0])))
+    parser = argparse.ArgumentParser(
+        description='Compute SPEC CPU 2017 scores of runs under QEMU')
+    parser.add_argument(
+        'runs',
+        type=str,
+        nargs='*',
+        metavar='[LABEL=]LOG|DIR',
+        help='Log file of runspec-qemu.sh, or SPEC directory, of each run',
+    )
+    parser.add_argument(
+        '--speclog',
+        type=str,
+        action='append',
+        default=[],
+        metavar='LOG',
+        help='Log file of runspec-qemu.sh of a run.  May be repeated',
+    )
+    parser.add_argument(
+        '--size',
+        type=str,
+        default=None,
+        choices=['test', 'train', 'ref'],
+        help='Data size of runs given as SPEC directories (default: from ' \
+             'the log)',
+    )
+    fmt = parser.add_mutually_exclusive_group()
+    fmt.add_argument(
+        '--txt',
+        action='store_const',
+        dest='pformat',
+        const='txt',
+        default='txt',
+        help='Produce output as plain text (default)',
+    )
+    fmt.add_argument(
+        '--csv',
+        action='store_const',
+        dest='pformat',
+        const='csv',
+        help='Produce output as CSV',
+    )
+    fmt.add_argument(
+        '--md',
+        action='store_const',
+        dest='pformat',
+        const='md',
+        help='Produce output as a Markdown table',
+    )
+    parser.add_argument(
+        '--cache',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='Cache of the instruction count files found (default: ' \
+             '.icount-cache.json in the first SPEC directory)',
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        default=False,
+        help='Do not use a cache',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        metavar='NUM',
+        help='Number of directories and files to read concurrently ' \
+             '(default: chosen by Python)',
+    )
+    parser.add_argument(
+        '--tooldir',
+        type=str,
+        default=tooldir_dft,
+        metavar='DIR',
+        help='Directory with the SPEC base data (default: %(default)s)',
+    )
+    args = parser.parse_args()
+    args.runs += args.speclog
+    if not args.runs:
+        parser.print_usage(sys.stderr)
+        sys.exit(1)
+    return args
+
+
+def get_runs(args):
+    """The runs to score, from the arguments."""
+    runs = []
+    logs = {}
+    for spec in args.runs:
+        label, sep, path = spec.rpartition('=')
+        if not sep or os.path.exists(spec):
+            label, path = None, spec
+        if os.path.isdir(path):
+            if not args.size:
+                print(f'ERROR: --size needed for SPEC directory {path}',
+                      file=sys.stderr)
+                sys.exit(1)
+            run = SpecRun(label or os.path.basename(os.path.realpath(path)),
+                          path, args.size)
+        elif os.path.isfile(path):
+            run = SpecRun.from_log(path, label)
+            if not run:
+                print(f'ERROR: {path} is not a SPEC log', file=sys.stderr)
+                sys.exit(1)
+            logs[run] = path
+        else:
+            print(f'ERROR: non-existent SPEC log or directory {path}',
+                  file=sys.stderr)
+            sys.exit(1)
+        if not os.path.isdir(run.specdir):
+            print(f'ERROR: non-existent SPEC directory "{run.specdir}"',
+                  file=sys.stderr)
+            sys.exit(1)
+        runs.append(run)
+    if len(set(r.size for r in runs)) > 1:
+        print('ERROR: runs of different sizes cannot be compared',
+              file=sys.stderr)
+        sys.exit(1)
+    if len(set(r.label for r in runs)) != len(runs):
+        print('ERROR: runs must have different labels', file=sys.stderr)
+        sys.exit(1)
+    own_workloads(runs, logs)
+    return runs
+
+
+def own_workloads(runs, logs):
+    """Runs which share a SPEC tree count only the instruction count files
+       of their own workloads, so must be given by their logs."""
+    for r in runs:
+        if sum(1 for o in runs if o.specdir == r.specdir) == 1:
+            continue
+        if r not in logs:
+            print(f'ERROR: the log of {r.label} is needed, since other runs '
+                  f'share SPEC directory {r.specdir}', file=sys.stderr)
+            sys.exit(1)
+        r.own(SpecLogIndex(logs[r]).get()['workloads'])
+
+
+def main():
+    """Main program computing scores"""
+    args = parse_args()
+    runs = get_runs(args)
+    size = runs[0].size
+    basefile = BaseData.filename(args.tooldir, size)
+    if not basefile:
+        print(f'ERROR: Unsupported size: {size}', file=sys.stderr)
+        return 1
+
+    if args.no_cache:
+        cachefile = None
+    elif args.cache:
+        cachefile = args.cache
+    else:
+        cachefile = os.path.join(runs[0].specdir, '.icount-cache.json')
+    scanner = IcountScanner(cachefile, args.jobs)
+    icounts = scanner.scan([r.specdir for r in runs])
+    for r in runs:
+        r.total(icounts[r.specdir])
+    for w in scanner.warnings:
+        print(w, file=sys.stderr)
+    if not scanner.save():
+        print(f'Warning: Unable to save cache {cachefile}', file=sys.stderr)
+
+    scores = SpecScores(BaseData.load(basefile), runs)
+    if args.pformat == 'csv':
+        print(scores.csv(), end='')
+    elif args.pformat == 'md':
+        print(scores.markdown(), end='')
+    else:
+        print(scores.text(), end='')
+    return 0
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())
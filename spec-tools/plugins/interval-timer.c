@@ -0,0 +1,261 @@
+/* QEMU plugin to time intervals of a program marked by instruction count
+
+   Copyright (C) 2024 Embecosm Limited
+   Contributor Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+   SPDX-License-Identifier: GPL-3.0-or-later */
+
+/* Arguments are:
+
+   marks=FILE   Instruction counts at which to record the time, one per line
+		in ascending order
+   outfile=FILE Where to write the times
+   stop=on|off  Whether to exit once the last mark is reached (default on)
+
+   Each line of the output is the number of the mark, the instructions
+   executed when it was reached and the process CPU time and monotonic time
+   in nanoseconds.  If the program finishes before the last mark, or there
+   are no marks, there is a final line "end" with the same values when it
+   finished.
+
+   Instructions are counted inline as each translation block starts, adding
+   all of its instructions before any of them run, and the conditional
+   callback follows, still before the block runs.  So a mark is reached as
+   the block which passes it starts: the times are from before that block
+   runs, but the instructions include all of it, so may be past the mark by
+   up to the length of the block.  The count of instructions to go to the
+   next mark is kept as an unsigned number which wraps to a very large value
+   once the mark is passed, so a single conditional callback is all that is
+   needed and no callback is made until then.  This needs QEMU 9.1 or later.
+   Programs are assumed to be single threaded. */
+
+#include <inttypes.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include <qemu-plugin.h>
+
+QEMU_PLUGIN_EXPORT int qemu_plugin_version = QEMU_PLUGIN_VERSION;
+
+/* A passed mark wraps the count to go to at least this.  Once there are no
+   more marks, the count starts just below it, so it is never reached. */
+#define PASSED (UINT64_C (1) << 63)
+#define NEVER (PASSED - 1)
+
+struct counts
+{
+  uint64_t insns;	/* Instructions executed */
+  uint64_t left;	/* Instructions to go to the next mark */
+};
+
+struct record
+{
+  uint64_t insns;
+  uint64_t cpu_ns;
+  uint64_t wall_ns;
+};
+
+static struct qemu_plugin_scoreboard *counts;
+static qemu_plugin_u64 insns_u64;
+static qemu_plugin_u64 left_u64;
+
+static uint64_t *marks;
+static size_t nmarks;
+static size_t next_mark;
+static struct record *records;
+static char *outfile;
+static bool stop = true;
+static bool written;
+
+/* Nanoseconds on a clock. */
+static uint64_t
+clock_ns (clockid_t clk)
+{
+  struct timespec ts;
+
+  clock_gettime (clk, &ts);
+  return (uint64_t) ts.tv_sec * UINT64_C (1000000000) + ts.tv_nsec;
+}
+
+/* Write out the records, with a final "end" line if we have not reached
+   the last mark. */
+static void
+write_records (unsigned int vcpu_index)
+{
+  FILE *fh;
+
+  if (written)
+    return;
+  written = true;
+  fh = fopen (outfile, "w");
+  if (fh == NULL)
+    {
+      qemu_plugin_outs ("interval-timer: unable to write times\n");
+      return;
+    }
+  for (size_t i = 0; i < next_mark; i++)
+    fprintf (fh, "%zu %" PRIu64 " %" PRIu64 " %" PRIu64 "\n", i,
+	     records[i].insns, records[i].cpu_ns, records[i].wall_ns);
+  if (next_mark < nmarks || nmarks == 0)
+    fprintf (fh, "end %" PRIu64 " %" PRIu64 " %" PRIu64 "\n",
+	     qemu_plugin_u64_get (insns_u64, vcpu_index),
+	     clock_ns (CLOCK_PROCESS_CPUTIME_ID), clock_ns (CLOCK_MONOTONIC));
+  fclose (fh);
+}
+
+/* A mark has been passed.  Record it and count to the next one, or stop
+   after the last. */
+static void
+vcpu_mark (unsigned int vcpu_index, void *udata)
+{
+  uint64_t cpu_ns = clock_ns (CLOCK_PROCESS_CPUTIME_ID);
+  uint64_t wall_ns = clock_ns (CLOCK_MONOTONIC);
+
+  if (next_mark >= nmarks)
+    return;
+  records[next_mark].insns = qemu_plugin_u64_get (insns_u64, vcpu_index);
+  records[next_mark].cpu_ns = cpu_ns;
+  records[next_mark].wall_ns = wall_ns;
+  next_mark++;
+
+  if (next_mark < nmarks)
+    {
+      uint64_t left = qemu_plugin_u64_get (left_u64, vcpu_index);
+
+      qemu_plugin_u64_set (left_u64, vcpu_index,
+			   left + marks[next_mark] - marks[next_mark - 1]);
+      return;
+    }
+
+  qemu_plugin_u64_set (left_u64, vcpu_index, NEVER);
+  if (stop)
+    {
+      write_records (vcpu_index);
+      exit (0);
+    }
+}
+
+static void
+vcpu_tb_trans (qemu_plugin_id_t id, struct qemu_plugin_tb *tb)
+{
+  uint64_t n = qemu_plugin_tb_n_insns (tb);
+
+  qemu_plugin_register_vcpu_tb_exec_inline_per_vcpu (
+    tb, QEMU_PLUGIN_INLINE_ADD_U64, insns_u64, n);
+  qemu_plugin_register_vcpu_tb_exec_inline_per_vcpu (
+    tb, QEMU_PLUGIN_INLINE_ADD_U64, left_u64, -n);
+  qemu_plugin_register_vcpu_tb_exec_cond_cb (
+    tb, vcpu_mark, QEMU_PLUGIN_CB_NO_REGS, QEMU_PLUGIN_COND_GE, left_u64,
+    PASSED, NULL);
+}
+
+static void
+vcpu_init (qemu_plugin_id_t id, unsigned int vcpu_index)
+{
+  qemu_plugin_u64_set (left_u64, vcpu_index, nmarks ? marks[0] : NEVER);
+}
+
+static void
+plugin_exit (qemu_plugin_id_t id, void *p)
+{
+  write_records (0);
+  qemu_plugin_scoreboard_free (counts);
+}
+
+/* Read the marks.  Return zero on success. */
+static int
+read_marks (const char *marksfile)
+{
+  FILE *fh = fopen (marksfile, "r");
+  size_t size = 64;
+  uint64_t mark;
+
+  if (fh == NULL)
+    return -1;
+  marks = malloc (size * sizeof (*marks));
+  while (marks != NULL && fscanf (fh, "%" SCNu64, &mark) == 1)
+    {
+      if (nmarks == size)
+	{
+	  size *= 2;
+	  marks = realloc (marks, size * sizeof (*marks));
+	  if (marks == NULL)
+	    break;
+	}
+      marks[nmarks++] = mark;
+    }
+  fclose (fh);
+  if (marks == NULL)
+    return -1;
+  for (size_t i = 1; i < nmarks; i++)
+    if (marks[i] < marks[i - 1])
+      return -1;
+  records = calloc (nmarks + 1, sizeof (*records));
+  return records == NULL ? -1 : 0;
+}
+
+QEMU_PLUGIN_EXPORT int
+qemu_plugin_install (qemu_plugin_id_t id, const qemu_info_t *info, int argc,
+		     char **argv)
+{
+  const char *marksfile = NULL;
+
+  for (int i = 0; i < argc; i++)
+    {
+      char *opt = argv[i];
+      char *val = strchr (opt, '=');
+
+      if (val == NULL)
+	{
+	  fprintf (stderr, "interval-timer: option parsing failed: %s\n",
+		   opt);
+	  return -1;
+	}
+      *val++ = '\0';
+      if (strcmp (opt, "marks") == 0)
+	marksfile = val;
+      else if (strcmp (opt, "outfile") == 0)
+	outfile = val;
+      else if (strcmp (opt, "stop") == 0)
+	{
+	  if (!qemu_plugin_bool_parse (opt, val, &stop))
+	    {
+	      fprintf (stderr, "interval-timer: boolean argument parsing "
+		       "failed: %s=%s\n", opt, val);
+	      return -1;
+	    }
+	}
+      else
+	{
+	  fprintf (stderr, "interval-timer: option parsing failed: %s\n",
+		   opt);
+	  return -1;
+	}
+    }
+  if (marksfile == NULL || outfile == NULL)
+    {
+      fprintf (stderr, "interval-timer: marks and outfile are needed\n");
+      return -1;
+    }
+  if (read_marks (marksfile) != 0)
+    {
+      fprintf (stderr, "interval-timer: unable to read marks from %s\n",
+	       marksfile);
+      return -1;
+    }
+
+  counts = qemu_plugin_scoreboard_new (sizeof (struct counts));
+  insns_u64 = qemu_plugin_scoreboard_u64_in_struct (counts, struct counts,
+						    insns);
+  left_u64 = qemu_plugin_scoreboard_u64_in_struct (counts, struct counts,
+						   left);
+
+  qemu_plugin_register_vcpu_init_cb (id, vcpu_init);
+  qemu_plugin_register_vcpu_tb_trans_cb (id, vcpu_tb_trans);
+  qemu_plugin_register_atexit_cb (id, plugin_exit, NULL);
+  return 0;
+}
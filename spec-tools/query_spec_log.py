@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+# Script to query the logs of SPEC CPU 2017 runs under QEMU
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This answers questions about the logs of runspec-qemu.sh from their
+indexes, indexing each log the first time it is seen.
+
+"index" indexes logs, several at once.  "times" reports the QEMU times of
+each benchmark, as dump-qemu-times.sh does.  "workloads" lists every workload
+with its command, time and status.  "compare" compares the times of each
+workload across logs.  "breakout" writes the run and check scripts of a log,
+as runspec-breakout.awk does.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import io
+import os
+import os.path
+import sys
+
+import _paths  # pylint: disable=unused-import
+from speclog import SpecLogIndex
+from support import check_python_version
+
+
+def _table(title, hdr, rows, pformat):
+    """A table with a title, as text, CSV or Markdown.  The first column is
+       text and the rest are numbers or None."""
+    res = f'\n{title}\n{"=" * len(title)}\n\n'
+    cells = [[r[0]] + ['-' if v is None else f'{v:.3f}' for v in r[1:]]
+             for r in rows]
+    if pformat == 'csv':
+        fh = io.StringIO()
+        csv.writer(fh, dialect=csv.unix_dialect).writerows([hdr] + cells)
+        return res + fh.getvalue()
+    width = max([25] + [len(c[0]) for c in cells])
+    if pformat == 'md':
+        lines = [hdr, [':' + '-' * (width - 1)]
+                 + ['-' * 11 + ':'] * (len(hdr) - 1)] + cells
+        fmt = '| {:<{w}} |' + ' {:>12} |' * (len(hdr) - 1)
+    else:
+        lines = [hdr, ['-' * len(h) for h in hdr]] + cells
+        fmt = '{:<{w}}' + ' {:>12}' * (len(hdr) - 1)
+    return res + ''.join(fmt.format(*l, w=width) + '\n' for l in lines)
+
+
+def _get(logfile, rebuild):
+    """The index of a log, for use in a separate process."""
+    return SpecLogIndex(logfile).get(rebuild)
+
+
+def _indexes(args):
+    """The index of each log, building those which are out of date in
+       parallel."""
+    for logfile in args.logs:
+        if not os.path.isfile(logfile):
+            print(f'ERROR: non-existent SPEC log {logfile}', file=sys.stderr)
+            sys.exit(1)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=args.jobs) as executor:
+        resf = [executor.submit(_get, l, args.rebuild) for l in args.logs]
+        return [f.result() for f in resf]
+
+
+def do_index(args):
+    """Index logs and summarize them."""
+    for logfile, index in zip(args.logs, _indexes(args)):
+        nfail = sum(1 for w in index['workloads']
+                    if w['status'] == 'failed')
+        nbm = len(set(w['bm'] for w in index['workloads']))
+        print(f'{logfile}: {nbm} benchmarks, '
+              f'{len(index["workloads"])} workloads, {nfail} failed')
+    return 0
+
+
+def do_times(args):
+    """The QEMU times of each benchmark of a log."""
+    index = _indexes(args)[0]
+    totals = {}
+    longest = {}
+    runs = []
+    for wl in index['workloads']:
+        times = [wl['real'], wl['user'], wl['sys']]
+        if all(t is None for t in times):
+            continue
+        times = [t or 0.0 for t in times]
+        tot = totals.setdefault(wl['bm'], [0.0, 0.0, 0.0])
+        top = longest.setdefault(wl['bm'], [0.0, 0.0, 0.0])
+        for i, t in enumerate(times):
+            tot[i] += t
+            top[i] = max(top[i], t)
+        runs.append([f'{wl["bm"]}-run-{wl["num"]}'] + times)
+    hdr = ['Benchmark', 'Real', 'User', 'Sys']
+    res = _table('Total timings per benchmark', hdr,
+                 [[bm] + totals[bm] for bm in sorted(totals)], args.pformat)
+    if args.verbose:
+        res += _table('Timings per run', hdr, sorted(runs), args.pformat)
+        res += _table('Longest run by benchmark', hdr,
+                      [[bm] + longest[bm] for bm in sorted(longest)],
+                      args.pformat)
+    print(res, end='')
+    return 0
+
+
+def do_workloads(args):
+    """Every workload of a log."""
+    index = _indexes(args)[0]
+    for wl in index['workloads']:
+        if args.bmlist and wl['bm'] not in args.bmlist:
+            continue
+        real = '-' if wl['real'] is None else f'{wl["real"]:.3f}'
+        print(f'{wl["bm"]}-run-{wl["num"]} copy {wl["copy"]} '
+              f'{wl["status"] or "unchecked"} {real}s')
+        if args.verbose:
+            for line in wl['script']:
+                print(f'    {line}')
+    return 0
+
+
+def do_compare(args):
+    """The user plus system time of each workload across logs, with the
+       ratio of each to the first log."""
+    indexes = _indexes(args)
+    names = [os.path.basename(l) for l in args.logs]
+    times = {}
+    for n, index in enumerate(indexes):
+        for wl in index['workloads']:
+            if args.bmlist and wl['bm'] not in args.bmlist:
+                continue
+            if wl['user'] is None and wl['sys'] is None:
+                continue
+            key = f'{wl["bm"]}-run-{wl["num"]}'
+            times.setdefault(key, [None] * len(indexes))[n] = \
+                (wl['user'] or 0.0) + (wl['sys'] or 0.0)
+    hdr = ['Workload'] + names + [f'{m}/{names[0]}' for m in names[1:]]
+    rows = []
+    for key in sorted(times):
+        row = times[key]
+        base = row[0]
+        ratios = [t / base if t is not None and base else None
+                  for t in row[1:]]
+        rows.append([key] + row + ratios)
+    print(_table('User plus system time per workload', hdr, rows,
+                 args.pformat), end='')
+    return 0
+
+
+def do_breakout(args):
+    """Write the run and check scripts of a log."""
+    if not os.path.isfile(args.logs[0]):
+        print(f'ERROR: non-existent SPEC log {args.logs[0]}', file=sys.stderr)
+        return 1
+    index = SpecLogIndex(args.logs[0])
+    index.get(args.rebuild)
+    os.makedirs(args.scriptdir, exist_ok=True)
+    scripts = index.breakout(args.scriptdir, args.bmlist)
+    print(f'Wrote {len(scripts)} scripts to {args.scriptdir}')
+    return 0
+
+
+def parse_args():
+    """Parse the arguments."""
+    parser = argparse.ArgumentParser(
+        description='Query the logs of SPEC CPU 2017 runs under QEMU')
+    parser.add_argument(
+        '--rebuild',
+        action='store_true',
+        default=False,
+        help='Index the logs again, even if their indexes are up to date',
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        metavar='NUM',
+        help='Number of logs to index concurrently (default: chosen by ' \
+             'Python)',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(p, nlogs, formats=True):
+        p.add_argument(
+            'logs',
+            type=str,
+            nargs=nlogs,
+            metavar='LOG',
+            help='Log file of runspec-qemu.sh',
+        )
+        p.add_argument(
+            '--bmlist',
+            type=str,
+            nargs='+',
+            default=None,
+            metavar='BENCHMARK',
+            help='Benchmarks to report (default: all)',
+        )
+        p.add_argument(
+            '--verbose',
+            action='store_true',
+            default=False,
+            help='Report in more detail',
+        )
+        if not formats:
+            return
+        fmt = p.add_mutually_exclusive_group()
+        fmt.add_argument(
+            '--txt',
+            action='store_const',
+            dest='pformat',
+            const='txt',
+            default='txt',
+            help='Produce output as plain text (default)',
+        )
+        fmt.add_argument(
+            '--csv',
+            action='store_const',
+            dest='pformat',
+            const='csv',
+            help='Produce output as CSV',
+        )
+        fmt.add_argument(
+            '--md',
+            action='store_const',
+            dest='pformat',
+            const='md',
+            help='Produce output as Markdown tables',
+        )
+
+    add_common(sub.add_parser('index', help='Index logs'), '+', False)
+    add_common(sub.add_parser('times', help='QEMU times of each benchmark'),
+               1)
+    add_common(sub.add_parser('workloads', help='Workloads of a log'), 1,
+               False)
+    add_common(sub.add_parser('compare', help='Compare workload times ' \
+                              'across logs'), '+')
+    brk = sub.add_parser('breakout', help='Write run and check scripts')
+    add_common(brk, 1, False)
+    brk.add_argument(
+        '--scriptdir',
+        type=str,
+        required=True,
+        metavar='DIR',
+        help='Directory for the scripts',
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Main program querying logs"""
+    args = parse_args()
+    return {'index': do_index, 'times': do_times,
+            'workloads': do_workloads, 'compare': do_compare,
+            'breakout': do_breakout}[args.command](args)
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())
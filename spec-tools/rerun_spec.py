@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+
+# Script to run SPEC CPU 2017 workloads again under other QEMU builds
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This runs the workloads of an earlier SPEC CPU 2017 run again, under any
+number of QEMU builds at once, then checks their results and scores them.
+
+The workloads come from the log of runspec-qemu.sh (--speclog), or from the
+run and check scripts written by runspec-breakout.awk (--scriptdir).  Each
+build is given as [LABEL=]INSTALLDIR[,PLUGIN], where INSTALLDIR has
+bin/qemu-riscv64 and PLUGIN is its libinsn.so instruction counting plugin
+(default: --plugin).  The SPEC build of the earlier run must still be in
+place, and QEMU_LD_PREFIX set as for runspec-qemu.sh.
+"""
+
+import argparse
+import glob
+import os
+import os.path
+import sys
+import time
+
+import _paths  # pylint: disable=unused-import
+from speclog import SpecLogIndex
+from specrerun import QemuBuild
+from specrerun import Rerunner
+from specrerun import Workload
+from specresults import BaseData
+from specresults import IcountScanner
+from specresults import SpecRun
+from specresults import SpecScores
+from support import Log
+from support import check_python_version
+
+
+def parse_args():
+    """Parse the arguments."""
+    tooldir_dft = os.path.dirname(os.path.dirname(os.path.abspath(
+        sys.argv[0])))
+    parser = argparse.ArgumentParser(
+        description='Run SPEC CPU 2017 workloads again under QEMU builds')
+    parser.add_argument(
+        'builds',
+        type=str,
+        nargs='+',
+        metavar='[LABEL=]DIR[,PLUGIN]',
+        help='QEMU installation directory, and optionally its plugin, of ' \
+             'each build',
+    )
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument(
+        '--speclog',
+        type=str,
+        default=None,
+        metavar='LOG',
+        help='Log file of runspec-qemu.sh with the workloads',
+    )
+    src.add_argument(
+        '--scriptdir',
+        type=str,
+        default=None,
+        metavar='DIR',
+        help='Directory with the run and check scripts of the workloads',
+    )
+    parser.add_argument(
+        '--plugin',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='Instruction counting plugin for builds without their own ' \
+             '(default: do not count instructions)',
+    )
+    parser.add_argument(
+        '--outdir',
+        type=str,
+        default='rerun',
+        metavar='DIR',
+        help='Directory for the results (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--bmlist',
+        type=str,
+        nargs='+',
+        default=None,
+        metavar='BENCHMARK',
+        help='Benchmarks to run (default: all)',
+    )
+    Rerunner.add_arguments(parser)
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        default=True,
+        help='Run the check scripts (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--no-check',
+        action='store_false',
+        dest='check',
+        help='Do not run the check scripts',
+    )
+    parser.add_argument(
+        '--size',
+        type=str,
+        default=None,
+        choices=['test', 'train', 'ref'],
+        help='Data size of the workloads, for scoring (default: from the ' \
+             'log)',
+    )
+    fmt = parser.add_mutually_exclusive_group()
+    fmt.add_argument(
+        '--txt',
+        action='store_const',
+        dest='pformat',
+        const='txt',
+        default='txt',
+        help='Produce scores as plain text (default)',
+    )
+    fmt.add_argument(
+        '--csv',
+        action='store_const',
+        dest='pformat',
+        const='csv',
+        help='Produce scores as CSV',
+    )
+    fmt.add_argument(
+        '--md',
+        action='store_const',
+        dest='pformat',
+        const='md',
+        help='Produce scores as a Markdown table',
+    )
+    parser.add_argument(
+        '--tooldir',
+        type=str,
+        default=tooldir_dft,
+        metavar='DIR',
+        help='Directory with the SPEC base data (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--logdir',
+        type=str,
+        default='logs',
+        metavar='DIR',
+        help='Directory in which to store logs (default: %(default)s)',
+    )
+    args = parser.parse_args()
+    for e in Rerunner.check_arguments(args):
+        print(f'ERROR: {e}', file=sys.stderr)
+        sys.exit(1)
+    return args
+
+
+def get_builds(args):
+    """The QEMU builds, from the arguments."""
+    builds = [QemuBuild.parse(spec, args.plugin) for spec in args.builds]
+    for e in QemuBuild.check_all(builds):
+        print(f'ERROR: {e}', file=sys.stderr)
+        sys.exit(1)
+    return builds
+
+
+def get_workloads(args):
+    """The run and check workloads, and the data size if the log gives
+       it."""
+    if args.speclog:
+        if not os.path.isfile(args.speclog):
+            print(f'ERROR: non-existent SPEC log {args.speclog}',
+                  file=sys.stderr)
+            sys.exit(1)
+        index = SpecLogIndex(args.speclog).get()
+        runs, checks = Workload.from_index(index)
+        size = index['params'].get('size')
+    else:
+        if not os.path.isdir(args.scriptdir):
+            print(f'ERROR: non-existent script directory {args.scriptdir}',
+                  file=sys.stderr)
+            sys.exit(1)
+        scripts = sorted(glob.glob(os.path.join(args.scriptdir, '*.sh')))
+        workloads = [w for w in map(Workload.from_script, scripts) if w]
+        runs = [w for w in workloads if w.kind == 'run']
+        checks = [w for w in workloads if w.kind == 'check']
+        size = None
+    if args.bmlist:
+        runs = [w for w in runs if w.bm in args.bmlist]
+    if not runs:
+        print('ERROR: no workloads to run', file=sys.stderr)
+        sys.exit(1)
+    return runs, checks, args.size or size
+
+
+def score(builds, rerunner, size, args, log):
+    """Score the builds that counted instructions, leaving out the
+       instruction counts of runs that failed or timed out."""
+    counted = [b for b in builds if b.plugin]
+    if not counted:
+        return
+    basefile = BaseData.filename(args.tooldir, size) if size else None
+    if not basefile:
+        log.info('No scores without the data size of the workloads')
+        return
+    runs = [SpecRun(b.label, rerunner.builddir(b, 'icount'), size)
+            for b in counted]
+    scanner = IcountScanner(None)
+    icounts = scanner.scan([r.specdir for r in runs])
+    for b, r in zip(counted, runs):
+        good = rerunner.icounts(b)
+        r.total({icf: insns for icf, insns in icounts[r.specdir].items()
+                 if icf in good})
+    scores = SpecScores(BaseData.load(basefile), runs)
+    if args.pformat == 'csv':
+        print(scores.csv(), end='')
+    elif args.pformat == 'md':
+        print(scores.markdown(), end='')
+    else:
+        print(scores.text(), end='')
+
+
+def main():
+    """Main program running workloads"""
+    args = parse_args()
+    builds = get_builds(args)
+    runs, checks, size = get_workloads(args)
+    log = Log()
+    log.setup(args.logdir, 'rerun-' + time.strftime('%Y-%m-%d-%H-%M-%S')
+              + '.log')
+    log.info(f'Running {len(runs)} workloads under {len(builds)} builds on '
+             f'{len(args.cpus)} CPUs')
+
+    rerunner = Rerunner(builds, runs, checks, args.outdir, args.cpus,
+                        args.pin, args.timeout, log)
+    if not rerunner.prepare():
+        return 1
+    rerunner.run()
+    if args.check:
+        rerunner.check()
+    for csvfile in rerunner.save():
+        log.info(f'Results in {csvfile}')
+    for b in builds:
+        res = rerunner.results[b.label].values()
+        cpu = sum(r['user'] + r['sys'] for r in res)
+        nbad = sum(1 for r in res if r['status'] in ('failed', 'timeout'))
+        log.info(f'{b.label}: {cpu:.2f}s user plus system, {nbad} of '
+                 f'{len(res)} workloads failed')
+    score(builds, rerunner, size, args, log)
+    return 0
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+
+# Script to estimate SPEC CPU 2017 times under QEMU from sampled runs
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This estimates the time QEMU builds take to run SPEC CPU 2017 workloads,
+and their SPEC ratios, from runs of just a few representative intervals of
+each workload.
+
+"profile" runs the workloads once with QEMU's bbv plugin.  "cluster" finds
+the phases of each program and the intervals to represent them.  "time"
+runs the workloads under any number of QEMU builds with the interval-timer
+plugin, stopping each once its representative intervals have run, and
+estimates the time of each benchmark, with a 95% bound, and the SPEC ratios.
+"validate" compares the estimates for a build with a full run of it.
+
+Everything is kept in the sample directory, so the profile and phases are
+made once and used for every new build.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import json
+import os
+import os.path
+import sys
+import time
+
+import _paths  # pylint: disable=unused-import
+from speclog import SpecLogIndex
+from specrerun import QemuBuild
+from specrerun import Rerunner
+from specrerun import Workload
+from specresults import BaseData
+from specsample import BbvProfiler
+from specsample import IntervalTimer
+from specsample import PhaseAnalysis
+from specsample import PhaseEstimate
+from support import Log
+from support import check_python_version
+
+# Sampled runs executing more than this fraction of the instructions of full
+# runs save too little time to be worth it
+MAX_RUN_FRACTION = 0.9
+
+
+def _load(sampledir, name):
+    """A JSON file of the sample directory, exiting if we do not have it."""
+    jsonfile = os.path.join(sampledir, name)
+    try:
+        with open(jsonfile, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        print(f'ERROR: Unable to read {jsonfile}: {type(e).__name__}',
+              file=sys.stderr)
+        sys.exit(1)
+
+
+def _save(sampledir, name, data):
+    """Save a JSON file in the sample directory."""
+    jsonfile = os.path.join(sampledir, name)
+    with open(jsonfile, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh, indent=1)
+    return jsonfile
+
+
+def _workloads(profile):
+    """The run workloads of a profile."""
+    return [Workload(w['bm'], w['num'], 'run', w['script'], w['expected'])
+            for w in profile['workloads']]
+
+
+def _builds(args, plugin):
+    """The QEMU builds, from the arguments."""
+    builds = [QemuBuild.parse(spec, plugin) for spec in args.builds]
+    for e in QemuBuild.check_all(builds):
+        print(f'ERROR: {e}', file=sys.stderr)
+        sys.exit(1)
+    return builds
+
+
+def do_profile(args, log):
+    """Profile the workloads."""
+    if args.speclog:
+        index = SpecLogIndex(args.speclog).get()
+        runs, _ = Workload.from_index(index)
+        size = index['params'].get('size')
+    else:
+        scripts = sorted(glob.glob(os.path.join(args.scriptdir, '*.sh')))
+        runs = [w for w in map(Workload.from_script, scripts)
+                if w and w.kind == 'run']
+        size = None
+    if args.bmlist:
+        runs = [w for w in runs if w.bm in args.bmlist]
+    if not runs:
+        log.error('ERROR: no workloads to profile')
+        return 1
+    build = _builds(args, args.plugin)[0]
+    if not build.plugin:
+        log.warning('Warning: Without libinsn, the instructions after the '
+                    'last full interval of each program are not counted')
+    profiler = BbvProfiler(build, args.bbv_plugin, args.interval, runs,
+                           args.sampledir, args.cpus, args.pin, args.timeout,
+                           log)
+    if not profiler.prepare():
+        return 1
+    profiler.run()
+    profile = {
+        'size': args.size or size,
+        'interval': args.interval,
+        'workloads': [{'bm': w.bm, 'num': w.num, 'script': w.script,
+                       'expected': w.expected} for w in runs],
+        'programs': profiler.programs(),
+    }
+    log.info(f'Profile in {_save(args.sampledir, "profile.json", profile)}')
+    return 0
+
+
+def _analyze(analysis, bbfile, total):
+    """The phases of one program, for use in a separate process."""
+    return analysis.analyze(PhaseAnalysis.read(bbfile), total)
+
+
+def do_cluster(args, log):
+    """Find the phases of every program."""
+    profile = _load(args.sampledir, 'profile.json')
+    analysis = PhaseAnalysis(args.maxk, args.dims, args.seeds, args.samples,
+                             args.tolerance, args.seed)
+    phases = {}
+    start = time.time()
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        resf = {executor.submit(_analyze, analysis, p['bbv'], p['insns']):
+                prog for prog, p in profile['programs'].items()}
+        for f in concurrent.futures.as_completed(resf):
+            prog = resf[f]
+            try:
+                phases[prog] = f.result()
+            except (OSError, ValueError) as e:
+                log.error(f'ERROR: Unable to analyze {prog}: '
+                          f'{type(e).__name__}.')
+                return 1
+    run = 0
+    total = 0
+    for prog in sorted(phases):
+        ph = phases[prog]
+        marks = ph['marks']
+        run += marks[-1] if marks else ph['total']
+        total += ph['total']
+        nreps = sum(len(c['reps']) for c in ph['clusters'])
+        log.info(f'{prog}: {len(ph["intervals"])} intervals, '
+                 f'{len(ph["clusters"])} phases, {nreps} representatives')
+    log.info(f'Analyzed {len(phases)} programs in '
+             f'{time.time() - start:.2f}s')
+    if total:
+        log.info(f'Sampled runs execute {100.0 * run / total:.1f}% of the '
+                 'instructions of full runs')
+        if run > MAX_RUN_FRACTION * total:
+            log.warning('Warning: Sampled runs save little time over full '
+                        'runs, so a larger --tolerance may be needed')
+    log.info(f'Phases in {_save(args.sampledir, "phases.json", phases)}')
+    return 0
+
+
+def _estimates(profile, phases, times):
+    """The estimated time of each workload and benchmark, as dictionaries
+       of tuples of time and 95% bound, and the programs which could not be
+       estimated."""
+    byprog = {}
+    missing = []
+    for prog, p in profile['programs'].items():
+        est = None
+        if prog in phases:
+            est = PhaseEstimate.program(phases[prog], times.get(prog, {}))
+        if est is None:
+            missing.append(prog)
+        else:
+            byprog[prog] = (p, est)
+    workloads = {}
+    benchmarks = {}
+    for p, est in byprog.values():
+        workloads.setdefault(p['workload'], []).append(est)
+        benchmarks.setdefault(p['bm'], []).append(est)
+    return ({w: PhaseEstimate.combine(e) for w, e in workloads.items()},
+            {b: PhaseEstimate.combine(e) for b, e in benchmarks.items()},
+            missing)
+
+
+def _fmt(val, bound=None):
+    """A number, with its bound if known."""
+    if val is None:
+        return '-'
+    if bound is None:
+        return f'{val:.3f}'
+    return f'{val:.3f} ± {bound:.3f}'
+
+
+def _print_table(hdr, rows, pformat):
+    """Print a table as text, CSV or Markdown."""
+    if pformat == 'csv':
+        csv.writer(sys.stdout, dialect=csv.unix_dialect).writerows(
+            [hdr] + rows)
+    elif pformat == 'md':
+        print('| ' + ' | '.join(hdr) + ' |')
+        print('|:--' + '|--:' * (len(hdr) - 1) + '|')
+        for row in rows:
+            print('| ' + ' | '.join(row) + ' |')
+    else:
+        widths = [max(len(r[i]) for r in [hdr] + rows)
+                  for i in range(len(hdr))]
+        for row in [hdr, ['-' * len(h) for h in hdr]] + rows:
+            cols = [f'{row[0]:<{widths[0]}s}']
+            cols += [f'{f:>{w}s}' for f, w in zip(row[1:], widths[1:])]
+            print(' '.join(cols).rstrip())
+
+
+def _base(args, size):
+    """The base times for a data size, or None if we have none."""
+    basefile = BaseData.filename(args.tooldir, size) if size else None
+    return BaseData.load(basefile) if basefile else None
+
+
+def do_time(args, log):
+    """Time the representative intervals under each build and estimate the
+       times and SPEC ratios."""
+    profile = _load(args.sampledir, 'profile.json')
+    phases = _load(args.sampledir, 'phases.json')
+    builds = _builds(args, args.timer_plugin)
+    if not all(b.plugin for b in builds):
+        log.error('ERROR: the interval-timer plugin is needed')
+        return 1
+    timer = IntervalTimer(builds, phases, _workloads(profile),
+                          args.sampledir, args.cpus, args.pin, args.timeout,
+                          log)
+    if not timer.prepare():
+        return 1
+    timer.run()
+
+    base = _base(args, args.size or profile['size']) or {}
+    results = {}
+    for b in builds:
+        wls, bms, missing = _estimates(profile, phases, timer.times(b))
+        for prog in missing:
+            log.warning(f'Warning: No estimate for {prog} for {b.label}')
+        ratios, spec = PhaseEstimate.ratios(base, bms)
+        results[b.label] = {'workloads': wls, 'benchmarks': bms,
+                            'ratios': ratios, 'spec': spec}
+        _save(timer.builddir(b, ''), 'estimates.json', results[b.label])
+        log.info(f'Estimates in {timer.builddir(b, "estimates.json")}')
+
+    hdr = ['Benchmark']
+    for b in builds:
+        hdr += [f'{b.label} time (s)', f'{b.label} ratio']
+    rows = []
+    for bm in sorted(set(bm for r in results.values()
+                         for bm in r['benchmarks'])):
+        row = [bm]
+        for b in builds:
+            res = results[b.label]
+            row.append(_fmt(*res['benchmarks'].get(bm, (None, None))))
+            row.append(_fmt(*res['ratios'].get(bm, (None, None))))
+        rows.append(row)
+    row = ['SPEC ratio']
+    for b in builds:
+        row += ['', _fmt(*results[b.label]['spec'])]
+    rows.append(row)
+    _print_table(hdr, rows, args.pformat)
+    return 0
+
+
+def do_validate(args, log):
+    """Compare the estimates for a build with a full run of it."""
+    profile = _load(args.sampledir, 'profile.json')
+    est = _load(os.path.join(args.sampledir, args.label), 'estimates.json')
+    index = SpecLogIndex(args.speclog).get()
+    full = {}
+    for wl in index['workloads']:
+        if wl['user'] is not None:
+            full[wl['bm']] = full.get(wl['bm'], 0.0) + wl['user'] \
+                + (wl['sys'] or 0.0)
+
+    hdr = ['Benchmark', 'Full (s)', 'Estimate (s)', 'Error %', 'In bound']
+    rows = []
+    errors = []
+    nin = 0
+    nbound = 0
+    for bm in sorted(set(full) & set(est['benchmarks'])):
+        t, bound = est['benchmarks'][bm]
+        err = 100.0 * (t - full[bm]) / full[bm] if full[bm] else None
+        inb = '-'
+        if bound is not None:
+            nbound += 1
+            if abs(t - full[bm]) <= bound:
+                nin += 1
+                inb = 'yes'
+            else:
+                inb = 'no'
+        if err is not None:
+            errors.append(abs(err))
+        rows.append([bm, _fmt(full[bm]), _fmt(t, bound), _fmt(err), inb])
+
+    base = _base(args, args.size or profile['size'])
+    if base:
+        _, spec = PhaseEstimate.ratios(
+            base, {bm: (t, None) for bm, t in full.items()})
+        fullspec = spec[0]
+        estspec = est['spec'][0]
+        if fullspec and estspec:
+            err = 100.0 * (estspec - fullspec) / fullspec
+            rows.append(['SPEC ratio', _fmt(fullspec), _fmt(*est['spec']),
+                         _fmt(err), '-'])
+    _print_table(hdr, rows, args.pformat)
+    if errors:
+        log.info(f'Mean absolute error {sum(errors) / len(errors):.2f}%, '
+                 f'worst {max(errors):.2f}%, {nin} of {nbound} benchmarks '
+                 'within their 95% bounds')
+    return 0
+
+
+def parse_args():
+    """Parse the arguments."""
+    tooldir_dft = os.path.dirname(os.path.dirname(os.path.abspath(
+        sys.argv[0])))
+    parser = argparse.ArgumentParser(
+        description='Estimate SPEC CPU 2017 times under QEMU from sampled ' \
+                    'runs')
+    parser.add_argument(
+        '--sampledir',
+        type=str,
+        default='sample',
+        metavar='DIR',
+        help='Directory for the profile, phases and estimates ' \
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--logdir',
+        type=str,
+        default='logs',
+        metavar='DIR',
+        help='Directory in which to store logs (default: %(default)s)',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_scoring(p):
+        p.add_argument(
+            '--size',
+            type=str,
+            default=None,
+            choices=['test', 'train', 'ref'],
+            help='Data size of the workloads, for SPEC ratios (default: ' \
+                 'from the profile)',
+        )
+        p.add_argument(
+            '--tooldir',
+            type=str,
+            default=tooldir_dft,
+            metavar='DIR',
+            help='Directory with the SPEC base data (default: %(default)s)',
+        )
+        fmt = p.add_mutually_exclusive_group()
+        fmt.add_argument(
+            '--txt',
+            action='store_const',
+            dest='pformat',
+            const='txt',
+            default='txt',
+            help='Produce output as plain text (default)',
+        )
+        fmt.add_argument(
+            '--csv',
+            action='store_const',
+            dest='pformat',
+            const='csv',
+            help='Produce output as CSV',
+        )
+        fmt.add_argument(
+            '--md',
+            action='store_const',
+            dest='pformat',
+            const='md',
+            help='Produce output as a Markdown table',
+        )
+
+    prof = sub.add_parser('profile', help='Profile the workloads')
+    prof.add_argument(
+        'builds',
+        type=str,
+        nargs=1,
+        metavar='[LABEL=]DIR[,PLUGIN]',
+        help='QEMU installation directory, and optionally its libinsn ' \
+             'plugin, to profile with',
+    )
+    src = prof.add_mutually_exclusive_group(required=True)
+    src.add_argument(
+        '--speclog',
+        type=str,
+        default=None,
+        metavar='LOG',
+        help='Log file of runspec-qemu.sh with the workloads',
+    )
+    src.add_argument(
+        '--scriptdir',
+        type=str,
+        default=None,
+        metavar='DIR',
+        help='Directory with the run scripts of the workloads',
+    )
+    prof.add_argument(
+        '--bbv-plugin',
+        type=str,
+        required=True,
+        metavar='FILE',
+        help='QEMU bbv plugin (libbbv.so)',
+    )
+    prof.add_argument(
+        '--plugin',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='QEMU libinsn plugin, to count all instructions (default: ' \
+             'none)',
+    )
+    prof.add_argument(
+        '--interval',
+        type=int,
+        default=100000000,
+        metavar='INSNS',
+        help='Instructions in each interval (default: %(default)s)',
+    )
+    prof.add_argument(
+        '--bmlist',
+        type=str,
+        nargs='+',
+        default=None,
+        metavar='BENCHMARK',
+        help='Benchmarks to profile (default: all)',
+    )
+    prof.add_argument(
+        '--size',
+        type=str,
+        default=None,
+        choices=['test', 'train', 'ref'],
+        help='Data size of the workloads (default: from the log)',
+    )
+    Rerunner.add_arguments(prof)
+
+    clu = sub.add_parser('cluster', help='Find the phases of the programs')
+    clu.add_argument(
+        '--maxk',
+        type=int,
+        default=30,
+        metavar='NUM',
+        help='Most phases of any program (default: %(default)s)',
+    )
+    clu.add_argument(
+        '--dims',
+        type=int,
+        default=15,
+        metavar='NUM',
+        help='Dimensions of the projected vectors (default: %(default)s)',
+    )
+    clu.add_argument(
+        '--seeds',
+        type=int,
+        default=5,
+        metavar='NUM',
+        help='Clusterings tried for each number of phases ' \
+             '(default: %(default)s)',
+    )
+    clu.add_argument(
+        '--samples',
+        type=int,
+        default=2,
+        metavar='NUM',
+        help='Representative intervals of each phase (default: ' \
+             '%(default)s)',
+    )
+    clu.add_argument(
+        '--tolerance',
+        type=float,
+        default=1.0,
+        metavar='NUM',
+        help='Representatives are the earliest intervals of each phase no ' \
+             'further from its centre than this times their RMS distance ' \
+             'from it, or 0 for the nearest (default: %(default)s)',
+    )
+    clu.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        metavar='NUM',
+        help='Seed for the random projection and clustering ' \
+             '(default: %(default)s)',
+    )
+
+    tim = sub.add_parser('time', help='Time the representative intervals')
+    tim.add_argument(
+        'builds',
+        type=str,
+        nargs='+',
+        metavar='[LABEL=]DIR[,PLUGIN]',
+        help='QEMU installation directory, and optionally its ' \
+             'interval-timer plugin, of each build',
+    )
+    tim.add_argument(
+        '--timer-plugin',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='interval-timer plugin for builds without their own',
+    )
+    Rerunner.add_arguments(tim)
+    add_scoring(tim)
+
+    val = sub.add_parser('validate', help='Compare estimates with a full ' \
+                         'run')
+    val.add_argument(
+        'speclog',
+        type=str,
+        metavar='LOG',
+        help='Log file of runspec-qemu.sh of the full run',
+    )
+    val.add_argument(
+        '--label',
+        type=str,
+        required=True,
+        metavar='LABEL',
+        help='Label of the build of the full run',
+    )
+    add_scoring(val)
+
+    args = parser.parse_args()
+    if hasattr(args, 'cpus'):
+        for e in Rerunner.check_arguments(args):
+            print(f'ERROR: {e}', file=sys.stderr)
+            sys.exit(1)
+    if getattr(args, 'speclog', None) and not os.path.isfile(args.speclog):
+        print(f'ERROR: non-existent SPEC log {args.speclog}', file=sys.stderr)
+        sys.exit(1)
+    return args
+
+
+def main():
+    """Main program estimating times from samples"""
+    args = parse_args()
+    os.makedirs(args.sampledir, exist_ok=True)
+    log = Log()
+    log.setup(args.logdir, 'sample-' + time.strftime('%Y-%m-%d-%H-%M-%S')
+              + '.log')
+    return {'profile': do_profile, 'cluster': do_cluster, 'time': do_time,
+            'validate': do_validate}[args.command](args, log)
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())
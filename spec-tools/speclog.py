@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+# Indexing of SPEC CPU 2017 run logs
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to index the log of a runspec-qemu.sh run of SPEC CPU 2017.
+
+The log is read once, memory mapped, finding just the lines that matter with
+a single regular expression, so even logs of hundreds of megabytes are
+indexed in seconds.  The index has the parameters of the run, and for each
+workload its benchmark, number, copy, run directory, command lines, the
+time taken by QEMU and whether its check passed.  It also has the commands of
+each check, so the run and check scripts can be written without reading the
+log again.
+
+The index is saved as JSON next to the log, as <log>.index.json, with the
+size and modification time of the log, and is used in place of the log
+until the log changes.
+"""
+
+import json
+import mmap
+import os
+import os.path
+import re
+
+# What we export
+
+__all__ = [
+    'SpecLogIndex',
+]
+
+
+class SpecLogIndex:
+    """A class for the index of a SPEC log.
+
+       The index is a dictionary with the parameters of the run, a list of
+       workloads and a list of checks, each a dictionary, and the SPEC log of
+       each benchmark.  Workloads and checks are numbered within each
+       benchmark in the order they appear, as are the scripts cut out by
+       runspec-breakout.awk.  Offsets are in bytes from the start of the
+       log."""
+
+    VERSION = 1
+    SUFFIX = '.index.json'
+
+    # All the lines that matter, in one pattern so the log is only scanned
+    # once.  Lines are found by their preceding newline rather than ^, which
+    # is several times faster, so the first line of the log is never matched,
+    # but that is always the parameters heading.
+    _LINE = re.compile(rb'''\n(?:
+          (?P<invoke>Benchmark\ invocation)
+        | (?P<verify>Benchmark\ verification)
+        | \#\ Starting\ run\ for\ copy\ \#(?P<copy>\d+)
+        | (?P<cd>cd\ [^\n]*)
+        | (?P<qemu>qemu-riscv64\ [^\n]*)
+        | The\ log\ for\ this\ run\ is\ in\ (?P<speclog>[^\n]*)
+        | Creating\ script\ to\ run\ (?P<creating>[^\s]+)
+        | (?P<append>Appending\ benchmark\ run\ logs)
+        | Run\ log\ for\ (?P<runname>[^\s]+)
+        | (?P<tkind>real|user|sys)[ \t]+(?P<tval>[^\s]+)
+        | (?P<checking>Checking\ results)
+        | (?P<failed>[^\s]+-check-\d+\.sh)\ failed\ check
+        )[ \t\r]*$''', re.MULTILINE | re.VERBOSE)
+
+    # The parameters at the start of the log, some of which have no colon
+    _PARAM = re.compile(rb'^([a-z0-9_]+):?[ \t]+(.*)$')
+    PARAMS_END = 65536
+
+    _TIME = re.compile(r'^(?:(\d+)m)?([\d.,]+)s?$')
+    _CPUDIR = re.compile(r'/benchspec/CPU/([^/\s]+)/')
+    _SPECPERL = re.compile(r'^qemu-riscv64 .*-- (\S+/specperl.*)$')
+
+    def __init__(self, logfile):
+        """Constructor just records the log."""
+        self.logfile = os.path.realpath(logfile)
+        self.indexfile = self.logfile + SpecLogIndex.SUFFIX
+        self.index = None
+
+    def _stamp(self):
+        """The size and modification time of the log."""
+        st = os.stat(self.logfile)
+        return st.st_size, st.st_mtime_ns
+
+    def load(self):
+        """Load the index if it is up to date with the log.  Return true if
+           it was."""
+        try:
+            with open(self.indexfile, 'r', encoding='utf-8') as fh:
+                index = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if index.get('version') != SpecLogIndex.VERSION \
+           or [index.get('size'), index.get('mtime_ns')] \
+              != list(self._stamp()):
+            return False
+        self.index = index
+        return True
+
+    def save(self):
+        """Save the index, replacing any old one atomically.  Return true on
+           success."""
+        tmpf = self.indexfile + '.tmp'
+        try:
+            with open(tmpf, 'w', encoding='utf-8') as fh:
+                json.dump(self.index, fh, separators=(',', ':'))
+            os.replace(tmpf, self.indexfile)
+        except OSError:
+            return False
+        return True
+
+    def get(self, rebuild=False):
+        """The index, from the saved index if it is up to date, otherwise
+           by reading the log and saving the new index."""
+        if rebuild or not self.load():
+            self.build()
+            self.save()
+        return self.index
+
+    @staticmethod
+    def seconds(val):
+        """The seconds of a time from the bash time builtin, such as
+           1m23.456s, or None if it is not one."""
+        m = SpecLogIndex._TIME.match(val)
+        if not m:
+            return None
+        return int(m.group(1) or 0) * 60.0 \
+            + float(m.group(2).replace(',', '.'))
+
+    @staticmethod
+    def _benchmark(creating, line):
+        """The benchmark of a command, which is the benchmark whose script
+           is being created, or failing that the benchmark in the SPEC
+           directory of the command."""
+        if creating:
+            return creating
+        m = SpecLogIndex._CPUDIR.search(line)
+        return m.group(1) if m else None
+
+    def build(self):
+        """Build the index by reading the log once."""
+        size, mtime_ns = self._stamp()
+        index = {'version': SpecLogIndex.VERSION, 'log': self.logfile,
+                 'size': size, 'mtime_ns': mtime_ns, 'params': {},
+                 'workloads': [], 'checks': [], 'speclogs': {},
+                 'checked': False}
+        if size == 0:
+            self.index = index
+            return index
+        params = index['params']
+        workloads = {}
+        checks = {}
+        failed = set()
+
+        section = None      # 'invoke', 'verify', 'append' or 'check'
+        creating = None     # Benchmark whose scripts are being created
+        counts = {}         # Next number of each benchmark and section
+        current = None      # Workload or check being created
+        runrec = None       # Workload whose run log is being read
+        with open(self.logfile, 'rb') as fh, \
+             mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            head = mm[:SpecLogIndex.PARAMS_END]
+            start = head.find(b'Parameters:\n')
+            lines = head[start:].split(b'\n')[2:] if start >= 0 else []
+            for hline in lines:
+                m = SpecLogIndex._PARAM.match(hline)
+                if not m:
+                    break
+                val = m.group(2).decode('utf-8', 'replace').strip()
+                params.setdefault(m.group(1).decode(), val)
+            for m in SpecLogIndex._LINE.finditer(mm):
+                kind = m.lastgroup
+                line = m.group(0).decode('utf-8', 'replace').strip()
+                if kind == 'creating':
+                    creating = m.group('creating').decode()
+                elif kind in ('invoke', 'verify'):
+                    section = kind
+                    counts[kind] = {}
+                    current = None
+                elif kind == 'copy' and section in ('invoke', 'verify'):
+                    current = {'bm': creating, 'num': None,
+                               'copy': int(m.group('copy')), 'dir': None,
+                               'cmd': None, 'script': [],
+                               'offset': m.start() + 1}
+                    if section == 'invoke':
+                        current.update({'real': None, 'user': None,
+                                        'sys': None, 'runlog': None,
+                                        'status': None})
+                    else:
+                        current['status'] = None
+                elif kind in ('cd', 'qemu') and current is not None \
+                        and section in ('invoke', 'verify'):
+                    if current['bm'] is None:
+                        current['bm'] = SpecLogIndex._benchmark(creating,
+                                                                line)
+                    if current['num'] is None and current['bm']:
+                        bmcounts = counts[section]
+                        current['num'] = bmcounts.get(current['bm'], 0)
+                        bmcounts[current['bm']] = current['num'] + 1
+                        table = workloads if section == 'invoke' else checks
+                        table[(current['bm'], current['num'])] = current
+                    if kind == 'cd':
+                        current['dir'] = line[3:].strip()
+                    else:
+                        sp = SpecLogIndex._SPECPERL.match(line)
+                        if section == 'verify' and sp:
+                            line = sp.group(1)
+                        elif current['cmd'] is None:
+                            current['cmd'] = line
+                    current['script'].append(line)
+                elif kind == 'speclog' and section == 'verify':
+                    bm = current['bm'] if current else creating
+                    if bm:
+                        index['speclogs'][bm] = \
+                            m.group('speclog').decode().split()[0]
+                elif kind == 'append':
+                    section = 'append'
+                    current = None
+                elif kind == 'runname' and section == 'append':
+                    name = m.group('runname').decode()
+                    bm, sep, num = name.rpartition('-run-')
+                    runrec = workloads.get((bm, int(num))) \
+                        if sep and num.isdigit() else None
+                    if runrec:
+                        runrec['runlog'] = [m.start() + 1, None]
+                elif kind == 'tval' and section == 'append' and runrec:
+                    runrec[m.group('tkind').decode()] = \
+                        SpecLogIndex.seconds(m.group('tval').decode())
+                    runrec['runlog'][1] = m.end()
+                elif kind == 'checking':
+                    section = 'check'
+                    index['checked'] = True
+                    runrec = None
+                elif kind == 'failed' and section == 'check':
+                    script = os.path.basename(m.group('failed').decode())
+                    bm, sep, num = script[:-3].rpartition('-check-')
+                    if sep and num.isdigit():
+                        failed.add((bm, int(num)))
+
+        # For ref runs, runspec-qemu.sh runs the three x264 workloads as one
+        self._merge_x264(params, workloads)
+
+        # A check passed if we checked results and it did not fail.  A
+        # workload has the status of the check with the same number, or if
+        # there is none, of all the checks of its benchmark.
+        if index['checked']:
+            for key, chk in checks.items():
+                chk['status'] = 'failed' if key in failed else 'passed'
+        for (bm, num), wl in workloads.items():
+            if (bm, num) in checks:
+                wl['status'] = checks[(bm, num)]['status']
+            else:
+                bmchecks = [c['status'] for (b, _), c in checks.items()
+                            if b == bm]
+                if 'failed' in bmchecks:
+                    wl['status'] = 'failed'
+                elif bmchecks and index['checked']:
+                    wl['status'] = 'passed'
+        index['workloads'] = list(workloads.values())
+        index['checks'] = list(checks.values())
+        self.index = index
+        return index
+
+    @staticmethod
+    def _merge_x264(params, workloads):
+        """Merge the second and third 625.x264_s workloads of a ref run into
+           the first, as runspec-qemu.sh does with their scripts."""
+        bm = '625.x264_s'
+        keys = [(bm, 0), (bm, 1), (bm, 2)]
+        if params.get('size') != 'ref' \
+           or not all(k in workloads for k in keys):
+            return
+        first = workloads[keys[0]]
+        for k in keys[1:]:
+            script = workloads.pop(k)['script']
+            if len(script) > 1:
+                first['script'].append(script[1])
+
+    def runlog(self, wl):
+        """The text of the run log of a workload from the log, or None if
+           there is none."""
+        if not wl.get('runlog') or wl['runlog'][1] is None:
+            return None
+        start, end = wl['runlog']
+        with open(self.logfile, 'rb') as fh:
+            fh.seek(start)
+            return fh.read(end - start).decode('utf-8', 'replace')
+
+    def breakout(self, scriptdir, bmlist=None):
+        """Write the run and check scripts of each workload, as
+           runspec-breakout.awk does, optionally just for the listed
+           benchmarks.  Return the list of scripts written."""
+        written = []
+        for kind, recs in [('run', self.index['workloads']),
+                           ('check', self.index['checks'])]:
+            for rec in recs:
+                if bmlist and rec['bm'] not in bmlist:
+                    continue
+                script = os.path.join(scriptdir,
+                                      f'{rec["bm"]}-{kind}-{rec["num"]}.sh')
+                with open(script, 'w', encoding='utf-8') as fh:
+                    fh.write('\n'.join(rec['script']) + '\n')
+                os.chmod(script, 0o755)
+                written.append(script)
+        return written
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+
+# Running SPEC CPU 2017 workloads again under other QEMU builds
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to run the workloads of a SPEC CPU 2017 run again, under any number
+of QEMU builds, without going back through runcpu.
+
+The workloads are the run and check scripts cut out of a runspec-qemu.sh log,
+either by runspec-breakout.awk or from the index of the log.  Each QEMU build
+gets its own copy of the run directories, so builds can run side by side, and
+the qemu-riscv64 of each script is replaced by that of the build, with its
+instruction counting plugin for the runs.  All the runs of all the builds
+share one pool of CPUs, each run pinned to its own CPU, longest first if the
+times in the log are known, with each workload run by every build in turn so
+that all builds see much the same load.  The user and system time of each
+run are its own, from wait4.  Once everything has run, the check scripts of
+each build are run in its copies of the run directories.
+
+The instruction count files of each build are written where the SPEC
+scoring of specresults finds them, so each build can be scored like any other
+SPEC run.
+"""
+
+import concurrent.futures
+import csv
+import os
+import os.path
+import re
+import shutil
+import signal
+import subprocess
+import time
+
+from specresults import IcountScanner
+
+# What we export
+
+__all__ = [
+    'QemuBuild',
+    'Rerunner',
+    'Workload',
+]
+
+
+class Workload:
+    """A class for the run or check script of one workload of a
+       benchmark.  The script is a list of lines, which are cd to the run
+       directory and the commands."""
+
+    _SCRIPT = re.compile(r'^(.+)-(run|check)-(\d+)\.sh$')
+
+    def __init__(self, bm, num, kind, script, expected=None):
+        """Constructor just records the script, with the time it is expected
+           to take if known."""
+        self.bm = bm
+        self.num = num
+        self.kind = kind
+        self.script = script
+        self.expected = expected
+        self.name = f'{bm}-{kind}-{num}'
+
+    @staticmethod
+    def from_script(path):
+        """The workload of a script from runspec-breakout.awk, or None if it
+           is not one."""
+        m = Workload._SCRIPT.match(os.path.basename(path))
+        if not m:
+            return None
+        with open(path, 'r', encoding='utf-8') as fh:
+            script = [l.rstrip('\n') for l in fh if l.strip()]
+        return Workload(m.group(1), int(m.group(3)), m.group(2), script)
+
+    @staticmethod
+    def from_index(index):
+        """The run and check workloads in the index of a log, as a tuple of
+           two lists."""
+        runs = [Workload(w['bm'], w['num'], 'run', w['script'],
+                         w['user'] + (w['sys'] or 0.0)
+                         if w['user'] is not None else w['real'])
+                for w in index['workloads']]
+        checks = [Workload(c['bm'], c['num'], 'check', c['script'])
+                  for c in index['checks']]
+        return runs, checks
+
+    def rundirs(self):
+        """The run directories of the workload."""
+        return [l[3:].strip() for l in self.script if l.startswith('cd ')]
+
+
+class QemuBuild:
+    """A class for a QEMU build to run workloads with, which is an
+       installation directory, with bin/qemu-riscv64, and optionally the
+       instruction counting plugin.  It has a label, typically its
+       commit."""
+
+    def __init__(self, label, installdir, plugin=None):
+        """Constructor just records the build."""
+        self.label = label
+        self.installdir = os.path.realpath(installdir)
+        self.qemu = os.path.join(self.installdir, 'bin', 'qemu-riscv64')
+        self.plugin = os.path.realpath(plugin) if plugin else None
+
+    @staticmethod
+    def parse(spec, plugin=None):
+        """The build given as LABEL=DIR[,PLUGIN], with the label defaulting
+           to the name of the directory and the plugin to the one given."""
+        label, sep, rest = spec.partition('=')
+        if not sep:
+            label, rest = None, spec
+        installdir, sep, own = rest.partition(',')
+        if sep:
+            plugin = own
+        if not label:
+            label = os.path.basename(os.path.realpath(installdir))
+        return QemuBuild(label, installdir, plugin)
+
+    @staticmethod
+    def check_all(builds):
+        """What is wrong with the builds, as a list of messages, empty if
+           nothing is."""
+        errors = []
+        for b in builds:
+            if not os.access(b.qemu, os.X_OK):
+                errors.append(f'no QEMU {b.qemu}')
+            if b.plugin and not os.path.isfile(b.plugin):
+                errors.append(f'non-existent plugin {b.plugin}')
+        if len(set(b.label for b in builds)) != len(builds):
+            errors.append('builds must have different labels')
+        return errors
+
+
+class Rerunner:
+    """A class to run workloads under several QEMU builds.
+
+       The results of each build are a dictionary indexed by the name of
+       each run workload, of dictionaries of its real, user and system time,
+       instructions executed (None without a plugin) and status, which is
+       "passed" or "failed" once checked, or "timeout"."""
+
+    # How often we look for finished runs
+    POLL_INTERVAL = 0.05
+
+    # The directories of each build, and whether runs count instructions
+    DIRS = ['rundir', 'icount', 'logs']
+    COUNTS = True
+
+    # QEMU arguments that would clash with our instruction counting
+    _CLASH = re.compile(r'\s-(?:plugin|d|D)\s+\S+')
+
+    def __init__(self, builds, runs, checks, outdir, cpus, pin, timeout,
+                 log):
+        """Constructor just records what to run and how."""
+        self._builds = builds
+        self._runs = runs
+        self._checks = checks
+        self._outdir = os.path.realpath(outdir)
+        self._cpus = cpus
+        self._pin = pin
+        self._timeout = timeout
+        self._log = log
+        self._icfs = {b.label: {} for b in builds}
+        self.results = {b.label: {} for b in builds}
+
+    @staticmethod
+    def add_arguments(parser):
+        """Add the arguments for how to run workloads to a parser."""
+        parser.add_argument(
+            '--cpus',
+            type=int,
+            nargs='+',
+            default=None,
+            metavar='CPU',
+            help='CPUs to run on, one run at a time on each, which may be ' \
+                 'repeated (default: all we may use)',
+        )
+        parser.add_argument(
+            '--pin',
+            action='store_true',
+            default=True,
+            help='Pin each run to its CPU (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-pin',
+            action='store_false',
+            dest='pin',
+            help='Do not pin runs to CPUs',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            metavar='SECS',
+            help='Timeout in seconds for each run (default: none)',
+        )
+
+    @staticmethod
+    def check_arguments(args):
+        """Check the arguments for how to run workloads, using all the CPUs
+           we may if none are given.  Return what is wrong with them, as a
+           list of messages, empty if nothing is."""
+        if args.cpus is None:
+            args.cpus = sorted(os.sched_getaffinity(0))
+        elif args.pin:
+            bad = set(args.cpus) - os.sched_getaffinity(0)
+            if bad:
+                return [f'cannot run on CPUs {sorted(bad)}']
+        return []
+
+    def builddir(self, b, what):
+        """One of the directories of a build: "rundir" for its copies of the
+           run directories, "icount" for its instruction counts and "logs"
+           for the output of its scripts."""
+        return os.path.join(self._outdir, b.label, what)
+
+    def _copydir(self, b, rundir, bm):
+        """Where a build has its copy of a run directory.  It keeps its name,
+           so commands that refer to it as ../<name> still work."""
+        return os.path.join(self.builddir(b, 'rundir'), bm,
+                            os.path.basename(rundir.rstrip('/')))
+
+    def _copy(self, b, rundir, bm):
+        """Copy a run directory for a build, replacing any old copy.
+           Instruction counts from earlier runs are not copied."""
+        dst = self._copydir(b, rundir, bm)
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(rundir, dst, symlinks=True,
+                        ignore=shutil.ignore_patterns('*.icount'))
+        return dst
+
+    def prepare(self):
+        """Copy the run directories for every build and clear out old
+           instruction counts.  Return true on success."""
+        todo = set()
+        for b in self._builds:
+            for what in self.DIRS:
+                shutil.rmtree(self.builddir(b, what), ignore_errors=True)
+                os.makedirs(self.builddir(b, what))
+            for wl in self._runs:
+                for rundir in wl.rundirs():
+                    todo.add((b, rundir, wl.bm))
+        ok = True
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self._cpus)) as executor:
+            resf = {executor.submit(self._copy, *t): t for t in todo}
+            for f in concurrent.futures.as_completed(resf):
+                b, rundir, _ = resf[f]
+                try:
+                    f.result()
+                except (OSError, shutil.Error) as e:
+                    ename = type(e).__name__
+                    self._log.error(f'ERROR: Unable to copy {rundir} for '
+                                    f'{b.label}: {ename}.')
+                    ok = False
+        return ok
+
+    def _plugin_args(self, b, icf):
+        """The QEMU arguments for the plugins of a run, counting
+           instructions into icf if the build has a plugin."""
+        if b.plugin:
+            return f' -plugin {b.plugin},inline=on -d plugin -D {icf}'
+        return ''
+
+    def _qemu_line(self, b, line, icf):
+        """A qemu-riscv64 command line, with the QEMU of the build and the
+           plugins of a run if icf is given."""
+        args = line[len('qemu-riscv64'):]
+        qemuargs, sep, cmd = args.partition(' -- ')
+        if sep:
+            qemuargs = Rerunner._CLASH.sub('', qemuargs)
+        plgargs = self._plugin_args(b, icf) if icf else ''
+        return f'{b.qemu}{plgargs}{qemuargs}{sep}{cmd}'
+
+    def script(self, b, wl):
+        """The script of a workload for a build, as a tuple of the text and
+           the instruction count files it writes."""
+        lines = []
+        icfs = []
+        for line in wl.script:
+            if line.startswith('cd '):
+                line = f'cd {self._copydir(b, line[3:].strip(), wl.bm)}'
+            elif line.startswith('qemu-riscv64 '):
+                if wl.kind == 'run':
+                    icf = os.path.join(self.builddir(b, 'icount'),
+                                       f'{wl.name}.{len(icfs)}.icount')
+                    icfs.append(icf)
+                else:
+                    icf = None
+                line = self._qemu_line(b, line, icf)
+            lines.append(line)
+        return '\n'.join(lines) + '\n', icfs
+
+    def _start(self, b, wl, cpu):
+        """Start a run of a workload for a build, pinned to a CPU.  Return
+           the process and the instruction count files it writes."""
+        text, icfs = self.script(b, wl)
+        logf = os.path.join(self.builddir(b, 'logs'), f'{wl.name}.log')
+        if self._pin:
+            def pin():
+                os.sched_setaffinity(0, {cpu})
+        else:
+            pin = None
+        with open(logf, 'w', encoding='utf-8') as fh:
+            proc = subprocess.Popen(
+                ['/bin/bash', '-c', text],
+                stdin=subprocess.DEVNULL,
+                stdout=fh,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+                preexec_fn=pin,
+            )
+        self._log.debug(f'DEBUG: Started {wl.name} for {b.label} on CPU '
+                        f'{cpu}')
+        return proc, icfs
+
+    def _finish(self, b, wl, proc, icfs, status, ru, real, timedout):
+        """Record a finished run."""
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        res = {'real': real, 'user': ru.ru_utime, 'sys': ru.ru_stime,
+               'insns': None, 'status': None}
+        if timedout:
+            res['status'] = 'timeout'
+            self._log.warning(f'Warning: {wl.name} for {b.label} timed out.')
+        elif proc.returncode != 0:
+            res['status'] = 'failed'
+            self._log.warning(f'Warning: {wl.name} for {b.label} failed.')
+        if self.COUNTS and b.plugin and not timedout:
+            try:
+                res['insns'] = sum(IcountScanner.read(f) for f in icfs)
+            except (OSError, ValueError) as e:
+                ename = type(e).__name__
+                self._log.warning(f'Warning: No instruction count for '
+                                  f'{wl.name} for {b.label}: {ename}.')
+        self._icfs[b.label][wl.name] = icfs
+        self.results[b.label][wl.name] = res
+
+    def icounts(self, b):
+        """The instruction count files of the runs of a build which neither
+           failed nor timed out, so can be scored."""
+        return set(icf for name, icfs in self._icfs[b.label].items()
+                   if self.results[b.label][name]['status']
+                   not in ('failed', 'timeout')
+                   for icf in icfs)
+
+    def run(self):
+        """Run every workload under every build, as many at once as we have
+           CPUs."""
+        runs = sorted(self._runs, key=lambda w: -(w.expected or 0.0))
+        todo = [(b, wl) for wl in runs for b in self._builds]
+        total = len(todo)
+        todo.reverse()
+        free = list(reversed(self._cpus))
+        running = {}
+        start = time.monotonic()
+        while todo or running:
+            while todo and free:
+                b, wl = todo.pop()
+                cpu = free.pop()
+                proc, icfs = self._start(b, wl, cpu)
+                running[proc.pid] = (b, wl, cpu, proc, icfs, time.monotonic(),
+                                     False)
+            reaped = False
+            for pid, job in list(running.items()):
+                b, wl, cpu, proc, icfs, started, timedout = job
+                wpid, status, ru = os.wait4(pid, os.WNOHANG)
+                now = time.monotonic()
+                if wpid == 0:
+                    if self._timeout and not timedout \
+                       and now - started > self._timeout:
+                        os.killpg(pid, signal.SIGKILL)
+                        running[pid] = job[:-1] + (True,)
+                    continue
+                del running[pid]
+                free.append(cpu)
+                reaped = True
+                self._finish(b, wl, proc, icfs, status, ru, now - started,
+                             timedout)
+                ndone = total - len(todo) - len(running)
+                self._log.info(f'{wl.name} for {b.label}: '
+                               f'{ru.ru_utime + ru.ru_stime:.2f}s '
+                               f'({ndone}/{total})')
+            if not reaped:
+                time.sleep(Rerunner.POLL_INTERVAL)
+        self._log.info(f'Ran {total} workloads in '
+                       f'{time.monotonic() - start:.1f}s')
+
+    def _check_one(self, b, wl):
+        """Run a check script for a build.  Return true if it passed."""
+        text, _ = self.script(b, wl)
+        logf = os.path.join(self.builddir(b, 'logs'), f'{wl.name}.log')
+        try:
+            with open(logf, 'w', encoding='utf-8') as fh:
+                subprocess.run(
+                    ['/bin/bash', '-c', text],
+                    stdin=subprocess.DEVNULL,
+                    stdout=fh,
+                    stderr=subprocess.STDOUT,
+                    timeout=self._timeout,
+                    check=True,
+                )
+        except (subprocess.SubprocessError, OSError):
+            self._log.warning(f'Warning: {wl.name} for {b.label} failed '
+                              'check.')
+            return False
+        return True
+
+    def check(self):
+        """Run the check scripts of every benchmark that was run, under
+           every build.  A run has the status of the check with the same
+           number, or if there is none, of all the checks of its
+           benchmark."""
+        bms = set(wl.bm for wl in self._runs)
+        todo = [(b, wl) for b in self._builds for wl in self._checks
+                if wl.bm in bms]
+        passed = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(self._cpus)) as executor:
+            resf = {executor.submit(self._check_one, *t): t for t in todo}
+            for f in concurrent.futures.as_completed(resf):
+                b, wl = resf[f]
+                passed[(b.label, wl.bm, wl.num)] = f.result()
+        for b in self._builds:
+            for wl in self._runs:
+                res = self.results[b.label].get(wl.name)
+                if not res or res['status']:
+                    continue
+                if (b.label, wl.bm, wl.num) in passed:
+                    ok = passed[(b.label, wl.bm, wl.num)]
+                else:
+                    bmchecks = [v for (l, bm, _), v in passed.items()
+                                if l == b.label and bm == wl.bm]
+                    if not bmchecks:
+                        continue
+                    ok = all(bmchecks)
+                res['status'] = 'passed' if ok else 'failed'
+
+    def save(self):
+        """Write the results of each build as times.csv in its directory.
+           Return the list of files written."""
+        written = []
+        for b in self._builds:
+            csvfile = os.path.join(self._outdir, b.label, 'times.csv')
+            with open(csvfile, 'w', newline='', encoding='utf-8') as csvf:
+                csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+                csvwriter.writerow(['Workload', 'Real', 'User', 'Sys',
+                                    'QEMU insns', 'Status'])
+                for name, res in sorted(self.results[b.label].items()):
+                    csvwriter.writerow(
+                        [name, f'{res["real"]:.3f}', f'{res["user"]:.3f}',
+                         f'{res["sys"]:.3f}',
+                         '' if res['insns'] is None else res['insns'],
+                         res['status'] or ''])
+            written.append(csvfile)
+        return written
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+
+# SPEC CPU 2017 scores from QEMU instruction counts
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to compute SPEC CPU 2017 scores from runs under QEMU.
+
+Each workload run under QEMU with the libinsn plugin leaves an instruction
+count file, <benchmark>-*.icount, somewhere in the SPEC tree, with a line
+"total insns: N".  The instructions of all the workloads of each benchmark
+are totalled and converted to a nominal time, on the basis of QEMU executing
+10^9 instructions per second.  The ratio of a benchmark is its base time
+divided by this time, and the SPEC ratio is the geometric mean of the ratios
+of all the benchmarks.
+
+Finding the files is the slow part, since a SPEC tree is large.  Directories
+are scanned in parallel, and the listing of each directory and the total of
+each file are cached by modification time, so scanning again only reads what
+has changed.
+"""
+
+import concurrent.futures
+import csv
+import io
+import json
+import math
+import os
+import os.path
+import re
+
+# What we export
+
+__all__ = [
+    'BaseData',
+    'IcountScanner',
+    'SpecRun',
+    'SpecScores',
+]
+
+
+class BaseData:
+    """A class for the SPEC base times of each benchmark for a data size."""
+
+    # Nominal instructions per second of QEMU
+    INSNS_PER_SEC = 1000000000
+
+    @staticmethod
+    def filename(tooldir, size):
+        """The file of base times for a data size, or None if there is
+           none."""
+        basefile = os.path.join(tooldir, f'specbasedata-{size}.txt')
+        return basefile if os.path.isfile(basefile) else None
+
+    @staticmethod
+    def load(basefile):
+        """The base times in a file, as a dictionary of seconds indexed by
+           benchmark."""
+        base = {}
+        with open(basefile, 'r', encoding='utf-8') as fh:
+            for line in fh:
+                fields = line.split()
+                if len(fields) >= 2:
+                    base[fields[0]] = int(fields[1])
+        return base
+
+
+class IcountScanner:
+    """A class to find and total all the instruction count files in SPEC
+       trees.
+
+       The cache is a JSON file with the listing of each directory (its
+       subdirectories and instruction count files) and the total of each
+       instruction count file, each with the modification time it was read
+       at."""
+
+    SUFFIX = '.icount'
+
+    # Trees are split into at least this many subtrees to walk concurrently,
+    # looking no deeper than this.
+    MIN_SUBTREES = 64
+    MAX_SPLIT_DEPTH = 4
+
+    def __init__(self, cachefile, jobs=None):
+        """Constructor loads the cache, if we have one."""
+        self._cachefile = cachefile
+        self._jobs = jobs
+        self._dirs = {}
+        self._files = {}
+        self.warnings = []
+        if cachefile:
+            try:
+                with open(cachefile, 'r', encoding='utf-8') as fh:
+                    cache = json.load(fh)
+                self._dirs = cache['dirs']
+                self._files = cache['files']
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def save(self):
+        """Save the cache, replacing it atomically.  Return true on
+           success."""
+        if not self._cachefile:
+            return True
+        tmpf = self._cachefile + '.tmp'
+        try:
+            with open(tmpf, 'w', encoding='utf-8') as fh:
+                json.dump({'dirs': self._dirs, 'files': self._files}, fh)
+            os.replace(tmpf, self._cachefile)
+        except OSError:
+            return False
+        return True
+
+    def _listdir(self, path):
+        """The subdirectories and instruction count files of a directory, as
+           a tuple of two lists of names, from the cache if the directory has
+           not changed."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._dirs.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+        subdirs = []
+        files = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.endswith(IcountScanner.SUFFIX):
+                    files.append(entry.name)
+        self._dirs[path] = [mtime, subdirs, files]
+        return subdirs, files
+
+    def _icount(self, path):
+        """The total instructions in an instruction count file, from the
+           cache if the file has not changed."""
+        st = os.stat(path)
+        cached = self._files.get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        total = IcountScanner.read(path)
+        self._files[path] = [st.st_mtime_ns, st.st_size, total]
+        return total
+
+    @staticmethod
+    def read(path):
+        """The total instructions in an instruction count file."""
+        total = 0
+        with open(path, 'r', encoding='utf-8', errors='replace') as fh:
+            for line in fh:
+                if line.startswith('total insns:'):
+                    total += int(line.split(':', 1)[1])
+        return total
+
+    def _forget(self, tops, seen):
+        """Drop anything in the cache under the scanned directories which
+           we did not see, since it no longer exists."""
+        prefixes = tuple(os.path.join(t, '') for t in tops)
+        for table in [self._dirs, self._files]:
+            for path in [p for p in table
+                         if p.startswith(prefixes) and p not in seen]:
+                del table[path]
+
+    def _walk(self, path):
+        """Walk the tree beneath a directory.  Return a tuple of a
+           dictionary of the total instructions in each instruction count
+           file, indexed by filename, the paths seen and any warnings."""
+        icounts = {}
+        seen = set()
+        warnings = []
+        todo = [path]
+        while todo:
+            path = todo.pop()
+            seen.add(path)
+            try:
+                subdirs, files = self._listdir(path)
+            except OSError as e:
+                warnings.append(f'Warning: Unable to read {path}: '
+                                f'{type(e).__name__}')
+                continue
+            todo += [os.path.join(path, d) for d in subdirs]
+            for name in files:
+                icf = os.path.join(path, name)
+                seen.add(icf)
+                try:
+                    icounts[icf] = self._icount(icf)
+                except (OSError, ValueError) as e:
+                    warnings.append(f'Warning: Unable to read {icf}: '
+                                    f'{type(e).__name__}')
+        return icounts, seen, warnings
+
+    def _frontier(self, tops):
+        """Split the trees into subtrees to walk concurrently, by expanding
+           breadth first until there are enough of them.  Return a tuple of
+           a list of tuples of the top of the tree and the subtree, and the
+           directories expanded, with their instruction count files, as for
+           _walk."""
+        frontier = [(t, t) for t in tops]
+        expanded = ({}, set(), [])
+        for _ in range(IcountScanner.MAX_SPLIT_DEPTH):
+            if len(frontier) >= IcountScanner.MIN_SUBTREES:
+                break
+            nxt = []
+            for top, path in frontier:
+                try:
+                    subdirs, files = self._listdir(path)
+                except OSError as e:
+                    expanded[2].append(f'Warning: Unable to read {path}: '
+                                       f'{type(e).__name__}')
+                    continue
+                expanded[1].add(path)
+                nxt += [(top, os.path.join(path, d)) for d in subdirs]
+                for name in files:
+                    icf = os.path.join(path, name)
+                    expanded[1].add(icf)
+                    try:
+                        expanded[0][(top, icf)] = self._icount(icf)
+                    except (OSError, ValueError) as e:
+                        expanded[2].append(f'Warning: Unable to read {icf}: '
+                                           f'{type(e).__name__}')
+            frontier = nxt
+        return frontier, expanded
+
+    def scan(self, tops):
+        """Scan the directories concurrently.  Return a dictionary indexed
+           by directory of dictionaries of the total instructions in each
+           instruction count file beneath it, indexed by filename."""
+        tops = sorted(set(os.path.realpath(t) for t in tops))
+        res = {t: {} for t in tops}
+        frontier, (icounts, seen, warnings) = self._frontier(tops)
+        for (top, icf), insns in icounts.items():
+            res[top][icf] = insns
+        self.warnings += warnings
+        with concurrent.futures.ThreadPoolExecutor(self._jobs) as executor:
+            resf = {executor.submit(self._walk, path): top
+                    for top, path in frontier}
+            for f in concurrent.futures.as_completed(resf):
+                icounts, walked, warnings = f.result()
+                res[resf[f]].update(icounts)
+                seen |= walked
+                self.warnings += warnings
+        self._forget(tops, seen)
+        return res
+
+
+class SpecRun:
+    """A class for one run of SPEC CPU 2017 under QEMU, which is a SPEC tree
+       and the data size that was run, with a label (typically the QEMU
+       commit)."""
+
+    # A SPEC run directory, run_<tune>_<size>[speed|rate]_<label>.NNNN
+    _RUNDIR = re.compile(r'^run_[^_]+_([a-z]+?)(speed|rate)?_')
+
+    # The instruction count file a QEMU command line writes
+    _ICF = re.compile(r'\s-D\s+(\S+)')
+
+    def __init__(self, label, specdir, size):
+        """Constructor just records the run."""
+        self.label = label
+        self.specdir = os.path.realpath(specdir)
+        self.size = size
+        self.totals = {}
+        self._rundirs = None
+        self._icfs = None
+
+    @staticmethod
+    def from_log(logfile, label=None):
+        """The run recorded in a log from runspec-qemu.sh.  Only the
+           parameters at the start of the log are read, however large it is.
+           Return None if the log does not name a SPEC tree and size."""
+        params = {}
+        with open(logfile, 'r', encoding='utf-8', errors='replace') as fh:
+            for line in fh:
+                key, sep, val = line.partition(':')
+                if sep and key in ('specdir', 'size') and key not in params:
+                    params[key] = val.strip()
+                if len(params) == 2:
+                    break
+        if len(params) != 2:
+            return None
+        if not label:
+            label = os.path.splitext(os.path.basename(logfile))[0]
+        return SpecRun(label, params['specdir'], params['size'])
+
+    @staticmethod
+    def benchmark(path):
+        """The benchmark of an instruction count file."""
+        return os.path.basename(path).split('-', 1)[0]
+
+    def _insize(self, path):
+        """Is an instruction count file for our data size?  Files in a SPEC
+           run directory for another size are not, anything else is."""
+        for part in os.path.relpath(path, self.specdir).split(os.sep):
+            m = SpecRun._RUNDIR.match(part)
+            if m:
+                return m.group(1) == self.size
+        return True
+
+    def own(self, workloads):
+        """Count only the instruction count files of our own workloads, from
+           the index of our log, for when other runs share our SPEC tree.
+           These are the files in the run directories of the workloads and
+           any written elsewhere by their QEMU command lines."""
+        self._rundirs = set()
+        self._icfs = set()
+        for wl in workloads:
+            if not wl['dir']:
+                continue
+            rundir = os.path.realpath(wl['dir'])
+            self._rundirs.add(os.path.join(rundir, ''))
+            m = SpecRun._ICF.search(wl['cmd'])
+            if m:
+                self._icfs.add(os.path.realpath(os.path.join(rundir,
+                                                             m.group(1))))
+
+    def _ours(self, path):
+        """Is an instruction count file one of our own workloads?  Any is,
+           unless we have been told which are our own."""
+        if self._rundirs is None:
+            return True
+        return path in self._icfs or path.startswith(tuple(self._rundirs))
+
+    def total(self, icounts):
+        """Total the instructions of each benchmark, given the totals of all
+           the instruction count files in our tree."""
+        self.totals = {}
+        for path, insns in icounts.items():
+            if self._insize(path) and self._ours(path):
+                bm = SpecRun.benchmark(path)
+                self.totals[bm] = self.totals.get(bm, 0) + insns
+        return self.totals
+
+
+class SpecScores:
+    """A class for the SPEC ratios of any number of runs.
+
+       The ratio of each benchmark is computed for each run with a nonzero
+       total, and the SPEC ratio of each run is the geometric mean of those
+       ratios.  Benchmarks with no base time are listed as unknown, except
+       for specrand, which is never scored."""
+
+    def __init__(self, base, runs):
+        """Constructor computes the ratios of the runs, each a SpecRun with
+           its totals."""
+        self._base = base
+        self._runs = runs
+        bms = sorted(set(bm for r in runs for bm in r.totals))
+        self.benchmarks = [bm for bm in bms if bm in base]
+        self.unknown = [bm for bm in bms
+                        if bm not in base and 'specrand' not in bm]
+        self.ratios = {}
+        self.specratio = {}
+        for r in runs:
+            ratios = {}
+            for bm in self.benchmarks:
+                insns = r.totals.get(bm)
+                if insns:
+                    ratios[bm] = base[bm] * BaseData.INSNS_PER_SEC \
+                        / float(insns)
+            self.ratios[r.label] = ratios
+            if ratios:
+                self.specratio[r.label] = math.exp(
+                    sum(math.log(v) for v in ratios.values()) / len(ratios))
+            else:
+                self.specratio[r.label] = None
+
+    def _header(self):
+        """The column headings.  With one run these are the headings we
+           have always used."""
+        hdr = ['Benchmark', 'Base (s)']
+        if len(self._runs) == 1:
+            return hdr + ['QEMU insns', 'Ratio']
+        for r in self._runs:
+            hdr += [f'{r.label} insns', f'{r.label} ratio']
+        return hdr
+
+    def _rows(self):
+        """The rows of the table, as strings, with a ratio of "-" if there
+           is none and no instructions if the benchmark was not run."""
+        rows = []
+        for bm in self.benchmarks:
+            row = [bm, str(self._base[bm])]
+            for r in self._runs:
+                insns = r.totals.get(bm)
+                ratio = self.ratios[r.label].get(bm)
+                row.append('-' if insns is None else str(insns))
+                row.append('-' if ratio is None else f'{ratio:.3f}')
+            rows.append(row)
+        return rows
+
+    def _specrow(self, label):
+        """The row of SPEC ratios, with the given label."""
+        row = [label, '']
+        for r in self._runs:
+            ratio = self.specratio[r.label]
+            row += ['', '-' if ratio is None else f'{ratio:.3f}']
+        return row
+
+    def text(self):
+        """The table as plain text."""
+        hdr = self._header()
+        rows = self._rows()
+        mins = [15, 9] + [15, 7] * len(self._runs)
+        widths = [max([m, len(h)] + [len(r[i]) for r in rows])
+                  for i, (m, h) in enumerate(zip(mins, hdr))]
+        def line(fields):
+            cols = [f'{fields[0]:<{widths[0]}s}']
+            cols += [f'{f:>{w}s}' for f, w in zip(fields[1:], widths[1:])]
+            return ' '.join(cols).rstrip() + '\n'
+        out = line(hdr)
+        out += line(['-' * len(h) for h in hdr])
+        for row in rows:
+            out += line(row)
+        if len(self._runs) == 1:
+            ratio = self.specratio[self._runs[0].label]
+            if ratio is not None:
+                out += f'\nSPEC ratio: {ratio:7.3f}\n'
+        else:
+            out += '\n' + line(self._specrow('SPEC ratio'))
+        if self.unknown:
+            out += f'\nUnknown benchmarks: {", ".join(self.unknown)}\n'
+        return out
+
+    def csv(self):
+        """The table as CSV."""
+        buf = io.StringIO()
+        writer = csv.writer(buf, dialect=csv.unix_dialect)
+        writer.writerow(self._header())
+        writer.writerows(self._rows())
+        writer.writerow(self._specrow('SPEC ratio'))
+        if self.unknown:
+            writer.writerow(['Unknown benchmarks', ', '.join(self.unknown)])
+        return buf.getvalue()
+
+    def markdown(self):
+        """The table as Markdown."""
+        hdr = self._header()
+        out = '| ' + ' | '.join(hdr) + ' |\n'
+        out += '|:--' + '|--:' * (len(hdr) - 1) + '|\n'
+        for row in self._rows():
+            out += '| ' + ' | '.join(row) + ' |\n'
+        out += '| ' + ' | '.join(self._specrow('SPEC ratio')) + ' |\n'
+        if self.unknown:
+            out += f'\nUnknown benchmarks: {", ".join(self.unknown)}\n'
+        return out
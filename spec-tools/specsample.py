@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+
+# Sampled runs of SPEC CPU 2017 workloads by phase analysis
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to estimate the time QEMU takes to run SPEC CPU 2017 workloads from
+the time it takes to run a few representative intervals of each, in the
+manner of SimPoint.
+
+Each program (each qemu-riscv64 command of a workload) is profiled once,
+with QEMU's bbv plugin giving the basic block vector of every interval of a
+fixed number of instructions.  The vectors are normalized, randomly projected
+to a few dimensions and clustered by k-means, choosing the number of clusters
+as the fewest scoring close to the best by the Bayesian information
+criterion.  Each cluster is a phase of the program, and its earliest
+intervals close to its centre represent it, so runs can stop soon after every
+phase has been seen.  These are only chosen from intervals which follow an
+interval of the same phase, so the code of the phase has already been
+translated and the representatives are not slowed by translating it for the
+first time, which would be wrongly applied to the whole phase.
+
+Each new QEMU build then runs the programs with the interval-timer plugin,
+which records the CPU time at the instruction counts where the
+representative intervals start and end, and stops the program after the
+last one.  The time per instruction of each phase is the mean over its
+representatives, and the estimate of the time of the program is the sum
+over phases of their instructions times their time per instruction.  Treating
+the phases as strata, the variance of the estimate comes from the variation
+between the representatives of each phase, pooled across phases for phases
+with only one, giving a 95% bound on the estimate.
+"""
+
+import math
+import os
+import os.path
+
+import numpy as np
+
+from specrerun import Rerunner
+from specresults import IcountScanner
+
+# What we export
+
+__all__ = [
+    'BbvProfiler',
+    'IntervalTimer',
+    'PhaseAnalysis',
+    'PhaseEstimate',
+]
+
+
+class BbvProfiler(Rerunner):
+    """A class to profile workloads with QEMU's bbv plugin, as well as
+       counting all their instructions if the build has libinsn.  Programs
+       are assumed to be single threaded, so only the vectors of the first
+       vCPU are used."""
+
+    DIRS = Rerunner.DIRS + ['bbv']
+
+    def __init__(self, build, bbvplugin, interval, runs, outdir, cpus, pin,
+                 timeout, log):
+        """Constructor records the plugin and interval."""
+        super().__init__([build], runs, [], outdir, cpus, pin, timeout, log)
+        self._bbvplugin = os.path.realpath(bbvplugin)
+        self._interval = interval
+
+    @staticmethod
+    def program(icf):
+        """The name of the program of an instruction count file, which is
+           the workload and the number of its qemu-riscv64 command."""
+        return os.path.basename(icf)[:-len('.icount')]
+
+    def bbvfile(self, b, prog):
+        """The basic block vector file of a program."""
+        return os.path.join(self.builddir(b, 'bbv'), f'{prog}.0.bb')
+
+    def _plugin_args(self, b, icf):
+        """The QEMU arguments for the plugins of a run."""
+        stem = os.path.join(self.builddir(b, 'bbv'), self.program(icf))
+        return super()._plugin_args(b, icf) \
+            + f' -plugin {self._bbvplugin},interval={self._interval},' \
+            f'outfile={stem}'
+
+    def programs(self):
+        """The programs of every workload, as a dictionary indexed by
+           program name of dictionaries of the benchmark, workload,
+           instructions (None if not counted) and basic block vector file."""
+        b = self._builds[0]
+        progs = {}
+        for wl in self._runs:
+            _, icfs = self.script(b, wl)
+            res = self.results[b.label].get(wl.name, {})
+            for icf in icfs:
+                prog = self.program(icf)
+                insns = None
+                if b.plugin and res.get('insns') is not None:
+                    try:
+                        insns = IcountScanner.read(icf)
+                    except (OSError, ValueError):
+                        pass
+                progs[prog] = {'bm': wl.bm, 'workload': wl.name,
+                               'insns': insns,
+                               'bbv': self.bbvfile(b, prog)}
+        return progs
+
+
+class PhaseAnalysis:
+    """A class to find the phases of programs from their basic block
+       vectors.
+
+       The phases of a program are a dictionary with the instructions in
+       each interval, the total instructions of the program, the clusters
+       and the marks at which to time the representative intervals.  Each
+       cluster is a dictionary of its size in intervals, its instructions,
+       its weight (fraction of instructions) and its representatives, each
+       a tuple of the interval and the numbers of the marks at its start and
+       end."""
+
+    # Lloyd iterations at most, for each k-means clustering
+    MAX_ITERS = 100
+
+    # Least variance of the clusters, as a fraction of the mean variance of
+    # the points
+    MIN_VAR = 1.0e-9
+
+    # The variances of each cluster are shrunk towards those of all the
+    # clusters, as if it had this many more points
+    SHRINK = 15
+
+    # As SimPoint does, the fewest clusters scoring at least this fraction
+    # of the way from the worst BIC to the best are used
+    BIC_FRACTION = 0.9
+
+    def __init__(self, maxk=30, dims=15, seeds=5, samples=2, tolerance=1.0,
+                 seed=0):
+        """Constructor just records the parameters."""
+        self._maxk = maxk
+        self._dims = dims
+        self._seeds = seeds
+        self._samples = samples
+        self._tolerance = tolerance
+        self._seed = seed
+
+    @staticmethod
+    def read(bbfile):
+        """The basic block vectors of a file from the bbv plugin, as a list
+           of dictionaries of the instructions executed in each block,
+           indexed by block number, one per interval."""
+        rows = []
+        with open(bbfile, 'r', encoding='utf-8') as fh:
+            for line in fh:
+                if not line.startswith('T'):
+                    continue
+                row = {}
+                for field in line[1:].split():
+                    _, blk, cnt = field.split(':')
+                    row[int(blk)] = row.get(int(blk), 0) + int(cnt)
+                rows.append(row)
+        return rows
+
+    def _project(self, rows, rng):
+        """The basic block vectors, normalized and projected to a few
+           dimensions."""
+        nblocks = 1 + max((max(r) for r in rows if r), default=0)
+        proj = rng.uniform(-1.0, 1.0, size=(nblocks, self._dims))
+        x = np.zeros((len(rows), self._dims))
+        for i, row in enumerate(rows):
+            if not row:
+                continue
+            blks = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+            cnts = np.fromiter(row.values(), dtype=np.float64,
+                               count=len(row))
+            x[i] = (cnts / cnts.sum()) @ proj[blks]
+        return x
+
+    @staticmethod
+    def _kmeans(x, k, rng):
+        """Cluster points by k-means from a k-means++ start.  Return a tuple
+           of the cluster of each point, the centres and the sum of squared
+           distances to them."""
+        n = len(x)
+        centres = [x[rng.integers(n)]]
+        d2 = ((x - centres[0]) ** 2).sum(axis=1)
+        for _ in range(1, k):
+            tot = d2.sum()
+            i = rng.choice(n, p=d2 / tot) if tot > 0.0 else rng.integers(n)
+            centres.append(x[i])
+            d2 = np.minimum(d2, ((x - x[i]) ** 2).sum(axis=1))
+        centres = np.array(centres)
+        labels = None
+        for _ in range(PhaseAnalysis.MAX_ITERS):
+            dist = ((x[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+            new = dist.argmin(axis=1)
+            if labels is not None and np.array_equal(new, labels):
+                break
+            labels = new
+            for c in range(k):
+                members = x[labels == c]
+                if len(members):
+                    centres[c] = members.mean(axis=0)
+                else:
+                    # Restart an empty cluster at the worst placed point
+                    far = dist[np.arange(n), labels].argmax()
+                    centres[c] = x[far]
+                    labels[far] = c
+        sse = float(((x - centres[labels]) ** 2).sum())
+        return labels, centres, sse
+
+    @staticmethod
+    def _bic(x, labels, centres, floor):
+        """The Bayesian information criterion of a clustering, for Gaussian
+           clusters each with its own variances along the axes of their
+           pooled covariance, no less than the floor.  The projected vectors
+           of a program lie in fewer dimensions than they have, scattered
+           differently about each centre, which a spherical model shared by
+           all clusters takes for more phases.  The variances of each
+           cluster are shrunk towards the pooled ones, so small clusters are
+           not taken to have almost none."""
+        n, dims = x.shape
+        k = len(centres)
+        if n <= k:
+            return -math.inf
+        resid = x - centres[labels]
+        eigen, axes = np.linalg.eigh(resid.T @ resid / (n - k))
+        eigen = np.maximum(eigen, floor)
+        z = resid @ axes
+        loglik = 0.0
+        for c in range(k):
+            zc = z[labels == c]
+            nc = len(zc)
+            if nc == 0:
+                continue
+            ss = (zc ** 2).sum(axis=0)
+            var = np.maximum((ss + PhaseAnalysis.SHRINK * eigen)
+                             / (nc + PhaseAnalysis.SHRINK), floor)
+            loglik += nc * math.log(nc / n) \
+                - nc / 2.0 * (dims * math.log(2.0 * math.pi)
+                              + float(np.log(var).sum())) \
+                - float((ss / var).sum()) / 2.0
+        params = (k - 1) + 2 * k * dims + dims * (dims - 1) / 2.0
+        return loglik - params / 2.0 * math.log(n)
+
+    def _cluster(self, x, rng):
+        """The best clustering of the points, which is the one with the
+           fewest clusters whose BIC is close to the best.  Phases whose
+           intervals vary in different directions still score a little
+           better when split, so the best BIC alone gives too many."""
+        n = len(x)
+        floor = max(PhaseAnalysis.MIN_VAR * float(x.var(axis=0).mean()),
+                    np.finfo(float).tiny)
+        found = []
+        for k in range(1, min(self._maxk, n) + 1):
+            best = min((self._kmeans(x, k, rng) for _ in range(self._seeds)),
+                       key=lambda r: r[2])
+            found.append((self._bic(x, best[0], best[1], floor), best))
+        worst = min(f[0] for f in found)
+        good = worst + PhaseAnalysis.BIC_FRACTION \
+            * (max(f[0] for f in found) - worst)
+        return next(f[1] for f in found if f[0] >= good)
+
+    def _representatives(self, x, labels, c, centre):
+        """The representatives of cluster c, which are its earliest members
+           no further from its centre than the tolerance times their RMS
+           distance from it, or if there are too few of those, its nearest
+           members.  Members which follow a member are warm, and only they
+           are used if there are any."""
+        members = np.flatnonzero(labels == c)
+        warm = members[members > 0]
+        warm = warm[labels[warm - 1] == c]
+        if len(warm):
+            members = warm
+        dist = ((x[members] - centre) ** 2).sum(axis=1)
+        m = min(self._samples, len(members))
+        close = members[dist <= self._tolerance ** 2 * dist.mean()]
+        if len(close) < m:
+            close = np.sort(members[np.argsort(dist, kind='stable')[:m]])
+        return [int(i) for i in close[:m]]
+
+    def analyze(self, rows, total=None):
+        """The phases of a program from its basic block vectors, and its
+           total instructions, if known, which may include a final partial
+           interval the vectors do not."""
+        insns = [sum(r.values()) for r in rows]
+        phases = {'intervals': insns, 'total': total or sum(insns),
+                  'clusters': [], 'marks': []}
+        if not rows:
+            return phases
+        rng = np.random.default_rng(self._seed)
+        x = self._project(rows, rng)
+        labels, centres, _ = self._cluster(x, rng)
+        starts = np.concatenate(([0], np.cumsum(insns)))
+        clusters = []
+        for c in range(len(centres)):
+            members = np.flatnonzero(labels == c)
+            if not len(members):
+                continue
+            reps = self._representatives(x, labels, c, centres[c])
+            cinsns = int(sum(insns[i] for i in members))
+            clusters.append({'size': len(members), 'insns': cinsns,
+                             'weight': cinsns / float(sum(insns) or 1),
+                             'reps': reps})
+        marks = sorted(set(int(starts[i]) for c in clusters
+                           for r in c['reps'] for i in (r, r + 1)))
+        where = {m: i for i, m in enumerate(marks)}
+        for c in clusters:
+            c['reps'] = [(r, where[int(starts[r])], where[int(starts[r + 1])])
+                         for r in c['reps']]
+        phases['clusters'] = clusters
+        phases['marks'] = marks
+        return phases
+
+
+class IntervalTimer(Rerunner):
+    """A class to time the representative intervals of workloads with the
+       interval-timer plugin, which is the plugin of each build."""
+
+    DIRS = Rerunner.DIRS + ['marks', 'times']
+    COUNTS = False
+
+    def __init__(self, builds, phases, runs, outdir, cpus, pin, timeout,
+                 log):
+        """Constructor records the phases of each program."""
+        super().__init__(builds, runs, [], outdir, cpus, pin, timeout, log)
+        self._phases = phases
+
+    def _files(self, b, icf):
+        """The marks and times files of the program of an instruction count
+           file."""
+        prog = BbvProfiler.program(icf)
+        return (os.path.join(self.builddir(b, 'marks'), f'{prog}.marks'),
+                os.path.join(self.builddir(b, 'times'), f'{prog}.times'))
+
+    def prepare(self):
+        """Copy the run directories and write the marks of every program for
+           every build.  Return true on success."""
+        if not super().prepare():
+            return False
+        for b in self._builds:
+            for wl in self._runs:
+                for icf in self.script(b, wl)[1]:
+                    marksf, _ = self._files(b, icf)
+                    prog = BbvProfiler.program(icf)
+                    marks = self._phases.get(prog, {}).get('marks', [])
+                    with open(marksf, 'w', encoding='utf-8') as fh:
+                        fh.write(''.join(f'{m}\n' for m in marks))
+        return True
+
+    def _plugin_args(self, b, icf):
+        """The QEMU arguments for the timing plugin of a run."""
+        marksf, timesf = self._files(b, icf)
+        return f' -plugin {b.plugin},marks={marksf},outfile={timesf}'
+
+    def times(self, b):
+        """The times recorded for each program for a build, as a dictionary
+           indexed by program of dictionaries of the instructions and CPU
+           time in seconds at each mark, indexed by mark number or "end"."""
+        res = {}
+        for wl in self._runs:
+            for icf in self.script(b, wl)[1]:
+                _, timesf = self._files(b, icf)
+                recs = {}
+                try:
+                    with open(timesf, 'r', encoding='utf-8') as fh:
+                        for line in fh:
+                            fields = line.split()
+                            if len(fields) < 3:
+                                continue
+                            key = fields[0] if fields[0] == 'end' \
+                                else int(fields[0])
+                            recs[key] = (int(fields[1]),
+                                         int(fields[2]) / 1.0e9)
+                except (OSError, ValueError) as e:
+                    ename = type(e).__name__
+                    self._log.warning(f'Warning: No times for {timesf}: '
+                                      f'{ename}.')
+                res[BbvProfiler.program(icf)] = recs
+        return res
+
+
+class PhaseEstimate:
+    """A class to estimate the time of programs from the times of their
+       representative intervals.
+
+       Each estimate is a tuple of the time in seconds and its 95% bound,
+       which is None if there is no way to know it."""
+
+    # Two sided 95% point of the normal distribution
+    Z95 = 1.96
+
+    @staticmethod
+    def program(phases, recs):
+        """The estimated time of a program from its phases and the times at
+           its marks, as a tuple of the estimate and the variance of the
+           estimate (None if unknown), or None if there are too few times."""
+        if not phases['clusters']:
+            # Too short to have intervals, so we ran it all
+            if 'end' not in recs:
+                return None
+            return recs['end'][1], 0.0
+        means = []
+        for c in phases['clusters']:
+            rates = []
+            for _, start, end in c['reps']:
+                if start in recs and end in recs \
+                   and recs[end][0] > recs[start][0]:
+                    rates.append((recs[end][1] - recs[start][1])
+                                 / (recs[end][0] - recs[start][0]))
+            if not rates:
+                return None
+            mean = sum(rates) / len(rates)
+            var = None
+            if len(rates) > 1:
+                var = sum((r - mean) ** 2 for r in rates) / (len(rates) - 1)
+            means.append((c, mean, var, len(rates)))
+
+        # Relative variance pooled over the phases where we can measure it,
+        # for those where we cannot.
+        rel = [v / (m * m) for _, m, v, _ in means if v is not None and m]
+        pooled = sum(rel) / len(rel) if rel else None
+        scale = phases['total'] / float(sum(phases['intervals']) or 1)
+        est = 0.0
+        var = 0.0
+        for c, mean, cvar, nrates in means:
+            est += c['insns'] * mean
+            if cvar is None:
+                if pooled is None:
+                    var = None
+                    continue
+                cvar = pooled * mean * mean
+            if var is not None:
+                fpc = max(0.0, 1.0 - nrates / float(c['size']))
+                var += c['insns'] ** 2 * cvar / nrates * fpc
+        return est * scale, None if var is None else var * scale * scale
+
+    @staticmethod
+    def combine(parts):
+        """The sum of estimates, each a tuple of time and variance, as a
+           tuple of time and 95% bound."""
+        est = sum(p[0] for p in parts)
+        if any(p[1] is None for p in parts):
+            return est, None
+        return est, PhaseEstimate.Z95 * math.sqrt(sum(p[1] for p in parts))
+
+    @staticmethod
+    def ratios(base, estimates):
+        """The SPEC ratio of each benchmark with an estimated time and base
+           time, as a dictionary of tuples of ratio and 95% bound, and the
+           overall SPEC ratio as a tuple likewise.  Bounds come from the
+           relative bound of each time, to first order."""
+        ratios = {}
+        for bm, (est, bound) in estimates.items():
+            if bm in base and est > 0.0:
+                ratio = base[bm] / est
+                rbound = None if bound is None else ratio * bound / est
+                ratios[bm] = (ratio, rbound)
+        if not ratios:
+            return ratios, (None, None)
+        logs = [math.log(r) for r, _ in ratios.values()]
+        spec = math.exp(sum(logs) / len(logs))
+        if any(b is None for _, b in ratios.values()):
+            return ratios, (spec, None)
+        lvar = sum((b / r / PhaseEstimate.Z95) ** 2
+                   for r, b in ratios.values()) / len(logs) ** 2
+        return ratios, (spec, spec * PhaseEstimate.Z95 * math.sqrt(lvar))
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+# Tests of running SPEC CPU 2017 workloads again under other QEMU builds
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Tests of rerun_spec.py and specrerun.py, with stand in QEMU builds and
+workloads, so no RISC-V tool chain, QEMU or SPEC tree is needed.
+
+Each stand in qemu-riscv64 uses a known CPU time and writes a known
+instruction count for every run, then runs the command after --.  There are
+workloads which pass, fail and time out, and two builds, one twice as slow
+as the other.  Run with
+
+    python3 -m unittest discover -s spec-tools/tests
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import os.path
+import stat
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+# pylint: disable=wrong-import-position
+from rerun_spec import score
+from specrerun import QemuBuild
+from specrerun import Rerunner
+from specrerun import Workload
+from support import Log
+
+# The stand in QEMU.  @PYTHON@, @CPU@ and @INSNS@ are replaced when it is
+# created.
+_QEMU_SRC = '''#!@PYTHON@
+
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+icf = args[args.index('-D') + 1] if '-D' in args else None
+cmd = args[args.index('--') + 1:]
+end = time.process_time() + @CPU@
+while time.process_time() < end:
+    pass
+if icf:
+    with open(icf, 'w', encoding='utf-8') as fh:
+        fh.write('total insns: @INSNS@\\n')
+os.execvp(cmd[0], cmd)
+'''
+
+# The CPU seconds and instructions of each QEMU run of each build
+BUILDS = {
+    'fast' : (0.1, 1000000000),
+    'slow' : (0.2, 2000000000),
+}
+
+# The base time of each benchmark
+BASE = {
+    '500.perlbench_r' : 100,
+    '505.mcf_r' : 200,
+    '508.namd_r' : 400,
+    '557.xz_r' : 300,
+}
+
+# The commands run under QEMU by the run of each benchmark, and the status
+# it should end with
+WORKLOADS = {
+    '500.perlbench_r' : (['/bin/true'], 'passed'),
+    '505.mcf_r' : (['/bin/false'], 'failed'),
+    '508.namd_r' : (['/bin/true', '/bin/true'], 'passed'),
+    '557.xz_r' : (['/bin/sleep 60'], 'timeout'),
+}
+
+# The timeout of each run in seconds
+TIMEOUT = 5
+
+
+class TestRerun(unittest.TestCase):
+    """Run the workloads under both builds once, and check the times,
+       statuses and scores."""
+
+    @classmethod
+    def _write(cls, filename, text, exe=False):
+        """Write text to filename, making it executable if asked."""
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+        if exe:
+            os.chmod(filename, os.stat(filename).st_mode | stat.S_IXUSR)
+
+    @classmethod
+    def _builds(cls):
+        """Create the stand in QEMU builds, sharing one plugin."""
+        plugin = os.path.join(cls.tmpdir, 'libinsn.so')
+        cls._write(plugin, 'stub\n')
+        builds = []
+        for label, (cpu, insns) in BUILDS.items():
+            installdir = os.path.join(cls.tmpdir, 'qemu', label)
+            src = _QEMU_SRC.replace('@PYTHON@', sys.executable)
+            src = src.replace('@CPU@', str(cpu))
+            src = src.replace('@INSNS@', str(insns))
+            cls._write(os.path.join(installdir, 'bin', 'qemu-riscv64'), src,
+                       exe=True)
+            builds.append(QemuBuild.parse(f'{label}={installdir}', plugin))
+        return builds
+
+    @classmethod
+    def _workloads(cls):
+        """Create the run directories and the run and check scripts of the
+           workloads."""
+        scriptdir = os.path.join(cls.tmpdir, 'scripts')
+        for bm, (cmds, _) in WORKLOADS.items():
+            rundir = os.path.join(cls.tmpdir, 'spec', 'benchspec', 'CPU', bm,
+                                  'run', 'run_base_test_m64.0000')
+            cls._write(os.path.join(rundir, 'input.txt'), f'{bm}\n')
+            run = [f'cd {rundir}']
+            run += [f'qemu-riscv64 -cpu rv64 -- {c}' for c in cmds]
+            cls._write(os.path.join(scriptdir, f'{bm}-run-0.sh'),
+                       '\n'.join(run) + '\n')
+            cls._write(os.path.join(scriptdir, f'{bm}-check-0.sh'),
+                       f'cd {rundir}\nqemu-riscv64 -- /bin/true\n')
+        workloads = [Workload.from_script(os.path.join(scriptdir, f))
+                     for f in sorted(os.listdir(scriptdir))]
+        return ([w for w in workloads if w.kind == 'run'],
+                [w for w in workloads if w.kind == 'check'])
+
+    @classmethod
+    def setUpClass(cls):
+        """Run everything once, for all the tests."""
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmpdir = cls._tmp.name
+        cls._write(os.path.join(cls.tmpdir, 'specbasedata-test.txt'),
+                   ''.join(f'{bm} {t}\n' for bm, t in BASE.items()))
+        cls.builds = cls._builds()
+        runs, checks = cls._workloads()
+        cpu = sorted(os.sched_getaffinity(0))[0]
+        cls.rerunner = Rerunner(cls.builds, runs, checks,
+                                os.path.join(cls.tmpdir, 'out'),
+                                [cpu] * len(runs), True, TIMEOUT, Log())
+        assert cls.rerunner.prepare()
+        cls.rerunner.run()
+        cls.rerunner.check()
+        cls.csvfiles = cls.rerunner.save()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove everything we created."""
+        cls._tmp.cleanup()
+
+    def test_status(self):
+        """Each run has the status it should."""
+        for b in self.builds:
+            for bm, (_, status) in WORKLOADS.items():
+                res = self.rerunner.results[b.label][f'{bm}-run-0']
+                self.assertEqual(res['status'], status, f'{bm} {b.label}')
+
+    def test_times(self):
+        """Each run takes at least the CPU time of its QEMU runs, and no
+           more than the timeout if it timed out."""
+        for b in self.builds:
+            cpu, _ = BUILDS[b.label]
+            for bm, (cmds, status) in WORKLOADS.items():
+                res = self.rerunner.results[b.label][f'{bm}-run-0']
+                self.assertGreaterEqual(res['user'] + res['sys'],
+                                        cpu * len(cmds), f'{bm} {b.label}')
+                self.assertGreaterEqual(res['real'], res['user'])
+                if status == 'timeout':
+                    self.assertGreaterEqual(res['real'], TIMEOUT)
+                    self.assertLess(res['real'], 60)
+
+    def test_insns(self):
+        """Each run that finished counts the instructions of all its QEMU
+           runs, and one that timed out counts none."""
+        for b in self.builds:
+            _, insns = BUILDS[b.label]
+            for bm, (cmds, status) in WORKLOADS.items():
+                res = self.rerunner.results[b.label][f'{bm}-run-0']
+                if status == 'timeout':
+                    self.assertIsNone(res['insns'])
+                else:
+                    self.assertEqual(res['insns'], insns * len(cmds))
+
+    def test_csv(self):
+        """The times.csv of each build matches its results."""
+        self.assertEqual(len(self.csvfiles), len(self.builds))
+        for b, csvfile in zip(self.builds, self.csvfiles):
+            with open(csvfile, 'r', encoding='utf-8') as fh:
+                rows = list(csv.DictReader(fh))
+            self.assertEqual([r['Workload'] for r in rows],
+                             sorted(f'{bm}-run-0' for bm in WORKLOADS))
+            for row in rows:
+                res = self.rerunner.results[b.label][row['Workload']]
+                self.assertEqual(row['Status'], res['status'])
+                self.assertAlmostEqual(float(row['User']), res['user'],
+                                       places=3)
+
+    def test_icounts(self):
+        """Only the instruction count files of runs that neither failed nor
+           timed out are scored."""
+        for b in self.builds:
+            bms = set(os.path.basename(f).split('-', 1)[0]
+                      for f in self.rerunner.icounts(b))
+            self.assertEqual(bms, set(bm for bm, (_, s) in WORKLOADS.items()
+                                      if s == 'passed'))
+
+    def test_score(self):
+        """The scores leave out the runs that failed or timed out."""
+        args = argparse.Namespace(tooldir=self.tmpdir, pformat='csv')
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            score(self.builds, self.rerunner, 'test', args, Log())
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['Benchmark', 'Base (s)',
+                                   'fast insns', 'fast ratio',
+                                   'slow insns', 'slow ratio'])
+        self.assertEqual(rows[1:], [
+            ['500.perlbench_r', '100', '1000000000', '100.000',
+             '2000000000', '50.000'],
+            ['508.namd_r', '400', '2000000000', '200.000',
+             '4000000000', '100.000'],
+            ['SPEC ratio', '', '', '141.421', '', '70.711'],
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
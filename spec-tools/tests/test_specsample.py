@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+# Tests of sampled runs of SPEC CPU 2017 workloads by phase analysis
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Tests of specsample.py, with stand in basic block vectors and times, so
+no RISC-V tool chain, QEMU or SPEC tree is needed.
+
+The basic block vectors are of programs with phases of known blocks, which
+take turns in runs of intervals.  The times are of phases with known times
+per instruction, varying from interval to interval.  Run with
+
+    python3 -m unittest discover -s spec-tools/tests
+"""
+
+import math
+import os
+import os.path
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+# pylint: disable=wrong-import-position
+import _paths  # pylint: disable=unused-import
+from specrerun import QemuBuild
+from specrerun import Workload
+from specsample import BbvProfiler
+from specsample import IntervalTimer
+from specsample import PhaseAnalysis
+from specsample import PhaseEstimate
+from support import Log
+
+# Instructions in each interval of the basic block vectors
+INTERVAL = 100000
+
+# Intervals in each program, and in each run of intervals of one phase
+INTERVALS = 300
+RUN = 10
+
+# Blocks executed by each phase, which are not shared with other phases
+BLOCKS = 10
+
+# The seconds per instruction of each phase of the times, with the number of
+# its intervals, and the relative standard deviation of the time of each
+# interval
+RATES = [(1.0e-9, 100), (2.0e-9, 60), (5.0e-10, 40)]
+SPREAD = 0.1
+
+# Estimates made to find how often the 95% bound covers the true time
+TRIALS = 500
+
+
+def _phase_of(i, nphases):
+    """The phase of interval i of a program of nphases phases."""
+    return (i // RUN) % nphases
+
+
+def _bbv(nphases, seed=0):
+    """The text of a bbv plugin file of a program of nphases phases, each
+       with its own blocks executed in the same proportions, give or take
+       2%, in every one of its intervals."""
+    rng = random.Random(seed)
+    weights = [[rng.uniform(1.0, 10.0) for _ in range(BLOCKS)]
+               for _ in range(nphases)]
+    lines = []
+    for i in range(INTERVALS):
+        p = _phase_of(i, nphases)
+        tot = sum(weights[p])
+        cnts = [int(INTERVAL * w / tot * (1.0 + 0.02 * rng.gauss(0.0, 1.0)))
+                for w in weights[p]]
+        lines.append('T' + ''.join(f':{p * BLOCKS + b + 1}:{c} '
+                                   for b, c in enumerate(cnts)))
+    return '\n'.join(lines) + '\n'
+
+
+class TestPhaseAnalysis(unittest.TestCase):
+    """Find the phases of stand in basic block vectors."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Write the basic block vectors of programs with one and three
+           phases."""
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.bbfiles = {}
+        for nphases in (1, 3):
+            bbfile = os.path.join(cls._tmp.name, f'{nphases}.0_bbv.bb')
+            with open(bbfile, 'w', encoding='utf-8') as fh:
+                fh.write(_bbv(nphases))
+            cls.bbfiles[nphases] = bbfile
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove everything we created."""
+        cls._tmp.cleanup()
+
+    def test_read(self):
+        """Only interval lines are read, adding up the counts of blocks
+           which appear more than once."""
+        bbfile = os.path.join(self._tmp.name, 'read.bb')
+        with open(bbfile, 'w', encoding='utf-8') as fh:
+            fh.write('# a comment\nT:1:10 :2:20 :1:5 \nT:3:7 \n\n')
+        self.assertEqual(PhaseAnalysis.read(bbfile),
+                         [{1: 15, 2: 20}, {3: 7}])
+
+    def test_intervals(self):
+        """Every interval is read, with all its instructions."""
+        rows = PhaseAnalysis.read(self.bbfiles[3])
+        self.assertEqual(len(rows), INTERVALS)
+        phases = PhaseAnalysis().analyze(rows)
+        self.assertEqual(phases['intervals'], [sum(r.values()) for r in rows])
+        self.assertEqual(phases['total'], sum(phases['intervals']))
+
+    def test_count(self):
+        """There are as many clusters as phases, each of one phase."""
+        for nphases, bbfile in self.bbfiles.items():
+            phases = PhaseAnalysis().analyze(PhaseAnalysis.read(bbfile))
+            clusters = phases['clusters']
+            self.assertEqual(len(clusters), nphases)
+            self.assertEqual([c['size'] for c in clusters],
+                             [INTERVALS // nphases] * nphases)
+            self.assertAlmostEqual(sum(c['weight'] for c in clusters), 1.0)
+            seen = set(_phase_of(r, nphases) for c in clusters
+                       for r, _, _ in c['reps'])
+            self.assertEqual(seen, set(range(nphases)))
+
+    def test_representatives(self):
+        """The representatives of each phase follow an interval of the same
+           phase, and come from when the phase is first met."""
+        phases = PhaseAnalysis().analyze(PhaseAnalysis.read(self.bbfiles[3]))
+        for c in phases['clusters']:
+            self.assertEqual(len(c['reps']), 2)
+            p = _phase_of(c['reps'][0][0], 3)
+            for r, _, _ in c['reps']:
+                self.assertEqual(_phase_of(r, 3), p)
+                self.assertEqual(_phase_of(r - 1, 3), p)
+                self.assertLess(r, 3 * RUN)
+
+    def test_tolerance(self):
+        """With a large enough tolerance, the representatives of each phase
+           are the earliest intervals which follow one of the same phase."""
+        rows = PhaseAnalysis.read(self.bbfiles[3])
+        phases = PhaseAnalysis(tolerance=100.0).analyze(rows)
+        reps = sorted([r for r, _, _ in c['reps']]
+                      for c in phases['clusters'])
+        self.assertEqual(reps, [[p * RUN + 1, p * RUN + 2] for p in range(3)])
+
+    def test_marks(self):
+        """The marks are the instruction counts at the start and end of the
+           representatives, numbered in order."""
+        rows = PhaseAnalysis.read(self.bbfiles[3])
+        phases = PhaseAnalysis().analyze(rows)
+        starts = [0]
+        for insns in phases['intervals']:
+            starts.append(starts[-1] + insns)
+        self.assertEqual(phases['marks'], sorted(phases['marks']))
+        for c in phases['clusters']:
+            for r, start, end in c['reps']:
+                self.assertEqual(phases['marks'][start], starts[r])
+                self.assertEqual(phases['marks'][end], starts[r + 1])
+
+
+class TestPhaseEstimate(unittest.TestCase):
+    """Estimate times from the times of stand in representatives of phases
+       with known times per instruction."""
+
+    @staticmethod
+    def _trial(rng, nreps):
+        """Time nreps random intervals of each phase.  Return a tuple of the
+           phases, the times at the marks and the true time of the
+           program."""
+        clusters = []
+        recs = {}
+        truth = 0.0
+        now = 0.0
+        for rate, size in RATES:
+            times = [INTERVAL * rate * (1.0 + SPREAD * rng.gauss(0.0, 1.0))
+                     for _ in range(size)]
+            truth += sum(times)
+            reps = []
+            for i in rng.sample(range(size), nreps):
+                mark = len(recs)
+                recs[mark] = (mark * INTERVAL, now)
+                now += times[i]
+                recs[mark + 1] = ((mark + 1) * INTERVAL, now)
+                reps.append((i, mark, mark + 1))
+            clusters.append({'size': size, 'insns': size * INTERVAL,
+                             'weight': 0.0, 'reps': reps})
+        intervals = [INTERVAL] * sum(size for _, size in RATES)
+        phases = {'intervals': intervals, 'total': sum(intervals),
+                  'clusters': clusters, 'marks': []}
+        return phases, recs, truth
+
+    def _coverage(self, nreps):
+        """How often the 95% bound covers the true time."""
+        rng = random.Random(0)
+        covered = 0
+        for _ in range(TRIALS):
+            phases, recs, truth = self._trial(rng, nreps)
+            est, bound = PhaseEstimate.combine(
+                [PhaseEstimate.program(phases, recs)])
+            covered += abs(est - truth) <= bound
+        return covered / TRIALS
+
+    def test_exact(self):
+        """Representatives which all take the time of their phase give the
+           exact time, with no variance, scaled up to the total
+           instructions."""
+        clusters = []
+        recs = {}
+        for rate, size in RATES:
+            mark = len(recs)
+            recs[mark] = (0, 0.0)
+            recs[mark + 1] = (INTERVAL, INTERVAL * rate)
+            recs[mark + 2] = (2 * INTERVAL, 2 * INTERVAL * rate)
+            clusters.append({'size': size, 'insns': size * INTERVAL,
+                             'weight': 0.0,
+                             'reps': [(0, mark, mark + 1),
+                                      (1, mark + 1, mark + 2)]})
+        intervals = [INTERVAL] * sum(size for _, size in RATES)
+        phases = {'intervals': intervals, 'total': 2 * sum(intervals),
+                  'clusters': clusters, 'marks': []}
+        est, var = PhaseEstimate.program(phases, recs)
+        self.assertAlmostEqual(est, 2 * sum(INTERVAL * rate * size
+                                            for rate, size in RATES))
+        self.assertAlmostEqual(var, 0.0)
+
+    def test_missing(self):
+        """A phase without times gives no estimate, and a program too short
+           for phases takes the time it ended at."""
+        phases = {'intervals': [INTERVAL], 'total': INTERVAL,
+                  'clusters': [{'size': 1, 'insns': INTERVAL, 'weight': 1.0,
+                                'reps': [(0, 0, 1)]}], 'marks': [0, INTERVAL]}
+        self.assertIsNone(PhaseEstimate.program(phases, {0: (0, 0.0)}))
+        short = {'intervals': [], 'total': 10, 'clusters': [], 'marks': []}
+        self.assertEqual(PhaseEstimate.program(short, {'end': (10, 1.5)}),
+                         (1.5, 0.0))
+        self.assertIsNone(PhaseEstimate.program(short, {}))
+
+    def test_pooled(self):
+        """A phase with one representative has the relative variance of the
+           phases with more, and there is no bound if none has more."""
+        phases, recs, _ = self._trial(random.Random(0), 2)
+        _, var = PhaseEstimate.program(phases, recs)
+        single = phases['clusters'][0]
+        single['reps'] = single['reps'][:1]
+        _, pooled = PhaseEstimate.program(phases, recs)
+        self.assertIsNotNone(pooled)
+        self.assertNotEqual(pooled, var)
+        for c in phases['clusters']:
+            c['reps'] = c['reps'][:1]
+        self.assertIsNone(PhaseEstimate.program(phases, recs)[1])
+
+    def test_coverage(self):
+        """The 95% bound covers the true time about 95% of the time with
+           many representatives.  With the default two it covers it less
+           often, as the variance is then known so poorly."""
+        self.assertGreaterEqual(self._coverage(20), 0.92)
+        self.assertLessEqual(self._coverage(20), 0.98)
+        self.assertGreaterEqual(self._coverage(2), 0.75)
+
+    def test_combine(self):
+        """Combined estimates add their times and variances."""
+        self.assertEqual(PhaseEstimate.combine([(10.0, 4.0), (20.0, 5.0)]),
+                         (30.0, PhaseEstimate.Z95 * 3.0))
+        self.assertEqual(PhaseEstimate.combine([(10.0, 4.0), (20.0, None)]),
+                         (30.0, None))
+
+    def test_ratios(self):
+        """Each ratio is the base time over the estimate, with the same
+           relative bound, and the SPEC ratio is their geometric mean."""
+        base = {'a': 100.0, 'b': 400.0}
+        ratios, (spec, bound) = PhaseEstimate.ratios(
+            base, {'a': (50.0, 5.0), 'b': (100.0, 20.0), 'c': (1.0, 0.1)})
+        self.assertEqual(set(ratios), {'a', 'b'})
+        self.assertAlmostEqual(ratios['a'][0], 2.0)
+        self.assertAlmostEqual(ratios['a'][1], 0.2)
+        self.assertAlmostEqual(ratios['b'][0], 4.0)
+        self.assertAlmostEqual(ratios['b'][1], 0.8)
+        self.assertAlmostEqual(spec, math.sqrt(8.0))
+        self.assertAlmostEqual(bound, spec * math.sqrt(0.1 ** 2 + 0.2 ** 2)
+                               / 2.0)
+        _, (spec, bound) = PhaseEstimate.ratios(
+            base, {'a': (50.0, 5.0), 'b': (100.0, None)})
+        self.assertAlmostEqual(spec, math.sqrt(8.0))
+        self.assertIsNone(bound)
+        self.assertEqual(PhaseEstimate.ratios(base, {}), ({}, (None, None)))
+
+
+class TestIntervalTimer(unittest.TestCase):
+    """Read stand in times files from the interval-timer plugin."""
+
+    def test_times(self):
+        """Marks are read by number and the end as "end", with instructions
+           and CPU seconds.  Short lines are skipped, and a program without
+           a times file has none."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            script = os.path.join(tmpdir, 'scripts',
+                                  '500.perlbench_r-run-0.sh')
+            os.makedirs(os.path.dirname(script))
+            with open(script, 'w', encoding='utf-8') as fh:
+                fh.write(f'cd {tmpdir}\nqemu-riscv64 -- /bin/true\n'
+                         'qemu-riscv64 -- /bin/true\n')
+            wl = Workload.from_script(script)
+            b = QemuBuild.parse(f'new={tmpdir}', '/nonexistent/plugin.so')
+            timer = IntervalTimer([b], {}, [wl], os.path.join(tmpdir, 'out'),
+                                  [0], False, 1, Log())
+            progs = [BbvProfiler.program(icf)
+                     for icf in timer.script(b, wl)[1]]
+            self.assertEqual(progs, ['500.perlbench_r-run-0.0',
+                                     '500.perlbench_r-run-0.1'])
+            timesdir = timer.builddir(b, 'times')
+            os.makedirs(timesdir)
+            with open(os.path.join(timesdir, f'{progs[0]}.times'), 'w',
+                      encoding='utf-8') as fh:
+                fh.write('0 100000 2000000 2500000\n'
+                         '1 200050 4500000 5000000\n'
+                         '2\n'
+                         'end 250000 5000000 5600000\n')
+            self.assertEqual(timer.times(b), {
+                progs[0]: {0: (100000, 0.002), 1: (200050, 0.0045),
+                           'end': (250000, 0.005)},
+                progs[1]: {},
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+# Cost model analysis of results
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to fit cost models to the results.
+
+For each combination of commit, benchmark and configuration, we fit the time
+per call as a piecewise linear function of size
+
+    t(size) = a + b * size
+
+with a single automatically detected breakpoint, where the data justifies it.
+This gives us the fixed per-call overhead and the marginal cost per byte.  We
+also find the size at which the vector code beats the standard library.
+
+All results are loaded into NumPy arrays and the fitting is done for all
+configurations and all candidate breakpoints at once.
+"""
+
+import csv
+import os
+import os.path
+import re
+
+import numpy as np
+
+from implementations import ImplRegistry
+
+# What we export
+
+__all__ = [
+    'CostModel',
+]
+
+
+class CostModel:
+    """A class to fit cost models to all the results we have.
+
+       Results are held in arrays with one row per (commit, benchmark,
+       configuration) and one column per size, with NaN where there is no
+       result."""
+
+    # Minimum number of points in each segment of a piecewise fit.
+    MIN_SEG_POINTS = 3
+
+    # Name of the configuration used for the scalar comparison.
+    SCALAR_CONF = 'stdlib'
+
+    # Columns of the results
+    HEADER = ['Commit', 'Benchmark', 'Config', 'Points', 'Break',
+              'Overhead (ns)', 'ns/byte', 'Large overhead (ns)',
+              'Large ns/byte', 'Crossover']
+
+    def __init__(self, conflist, args, log):
+        """Constructor loads all the results and fits the models."""
+        self._args = args
+        self._log = log
+        self._conflist = conflist
+        self._implnames = ImplRegistry(args).names()
+        self.keys = []
+        self.sizes = None
+        self.times = None
+        self.npts = None
+        self.brk = None
+        self.a_small = None
+        self.b_small = None
+        self.a_large = None
+        self.b_large = None
+        self.crossover = None
+        self._load()
+        self._fit()
+        self._crossover()
+
+    def _load(self):
+        """Load all the CSV files into arrays in a single pass.  Time is
+           converted to nanoseconds per call."""
+        resdir = self._args.get('resdir')
+        rows = []
+        sizes = set()
+        for cmt in self._args.get('qemulist'):
+            for bm in self._args.get('bmlist'):
+                for conf in self._conflist:
+                    resfile = os.path.join(resdir, f'{cmt}-{bm}-{conf}.csv')
+                    if not os.path.exists(resfile):
+                        continue
+                    pts = {}
+                    try:
+                        with open(resfile, 'r', newline='',
+                                  encoding='utf-8') as csvf:
+                            for row in csv.DictReader(
+                                    csvf, dialect=csv.unix_dialect):
+                                pts[int(row['Size'])] = \
+                                    float(row['s/Miter']) * 1000.0
+                    except Exception as e:
+                        ename = type(e).__name__
+                        self._log.warning(
+                            f'Warning: Unable to read {resfile}: {ename}')
+                        continue
+                    if pts:
+                        self.keys.append((cmt, bm, conf))
+                        rows.append(pts)
+                        sizes.update(pts)
+
+        self.sizes = np.array(sorted(sizes), dtype=np.float64)
+        self.times = np.full((len(rows), len(self.sizes)), np.nan)
+        col = {sz: i for i, sz in enumerate(sorted(sizes))}
+        for r, pts in enumerate(rows):
+            for sz, t in pts.items():
+                self.times[r, col[sz]] = t
+
+    @staticmethod
+    def _lsq(sw, sx, sy, sxx, sxy, syy):
+        """Weighted least squares line fits from accumulated sums, for arrays
+           of any shape.  Return intercept, slope and residual sum of
+           squares.  Degenerate fits give NaN."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            det = sw * sxx - sx * sx
+            b = (sw * sxy - sx * sy) / det
+            a = (sy - b * sx) / sw
+            sse = syy - a * sy - b * sxy
+        return a, b, np.maximum(sse, 0.0)
+
+    def _fit(self):
+        """Fit the piecewise linear models for all rows at once.
+
+           We weight each point by the inverse square of its time, so we
+           minimize relative error, otherwise the large sizes would swamp the
+           per-call overhead.  For each row, and for every candidate
+           breakpoint, the fits for the left and right segments come from
+           cumulative sums along the size axis.  We choose the breakpoint
+           with the least error, and then use the Bayesian Information
+           Criterion to decide if two segments are better than one."""
+        if len(self.keys) == 0:
+            self.npts = np.zeros(0, dtype=int)
+            self.brk = self.a_small = self.b_small = np.zeros(0)
+            self.a_large = self.b_large = np.zeros(0)
+            return
+
+        y = self.times
+        valid = ~np.isnan(y)
+        x = np.broadcast_to(self.sizes, y.shape)
+        y0 = np.where(valid, y, 0.0)
+        with np.errstate(divide='ignore'):
+            w = np.where(valid & (y0 > 0.0), 1.0 / (y0 * y0), 0.0)
+        terms = [w, w * x, w * y0, w * x * x, w * x * y0, w * y0 * y0]
+        left = [np.cumsum(t, axis=1) for t in terms]
+        total = [s[:, -1:] for s in left]
+        right = [t - s for t, s in zip(total, left)]
+        nleft = np.cumsum(w > 0.0, axis=1)
+        npts = nleft[:, -1]
+        nright = npts[:, None] - nleft
+
+        # Single line fit
+        a1, b1, sse1 = self._lsq(*[t[:, 0] for t in total])
+
+        # All candidate two segment fits.  Breakpoint k means the left
+        # segment includes column k.
+        la, lb, lsse = self._lsq(*left)
+        ra, rb, rsse = self._lsq(*right)
+        ok = ((nleft >= self.MIN_SEG_POINTS)
+              & (nright >= self.MIN_SEG_POINTS)
+              & (w > 0.0))
+        sse2 = np.where(ok, lsse + rsse, np.inf)
+        k = np.argmin(sse2, axis=1)
+        rowidx = np.arange(len(k))
+        best2 = sse2[rowidx, k]
+
+        # BIC with 2 parameters for a line, 5 for two lines and a breakpoint.
+        n = np.maximum(npts, 1).astype(np.float64)
+        tiny = np.finfo(np.float64).tiny
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bic1 = n * np.log(np.maximum(sse1 / n, tiny)) + 2 * np.log(n)
+            bic2 = n * np.log(np.maximum(best2 / n, tiny)) + 5 * np.log(n)
+        split = np.isfinite(best2) & (bic2 < bic1)
+
+        self.npts = npts
+        self.brk = np.where(split, self.sizes[k], np.inf)
+        self.a_small = np.where(split, la[rowidx, k], a1)
+        self.b_small = np.where(split, lb[rowidx, k], b1)
+        self.a_large = np.where(split, ra[rowidx, k], a1)
+        self.b_large = np.where(split, rb[rowidx, k], b1)
+
+    def predict(self, sizes):
+        """Predicted time in ns per call for every row at each of the given
+           sizes.  Result has one row per model and one column per size."""
+        sz = np.asarray(sizes, dtype=np.float64)[None, :]
+        small = sz <= self.brk[:, None]
+        return np.where(small,
+                        self.a_small[:, None] + self.b_small[:, None] * sz,
+                        self.a_large[:, None] + self.b_large[:, None] * sz)
+
+    def _scalar_conf(self, conf):
+        """The standard library configuration to compare a vector
+           configuration with.  This has the same QEMU options, which follow
+           the VLEN and any LMUL and implementation in the configuration
+           name, but no LMUL or implementation."""
+        fields = conf.split('-')[1:]
+        if fields and re.fullmatch(r'm\d+', fields[0]):
+            fields = fields[1:]
+        if fields and fields[0] in self._implnames:
+            fields = fields[1:]
+        return '-'.join([self.SCALAR_CONF] + fields)
+
+    def _crossover(self):
+        """Find for each vector model the smallest size from which the
+           vector code is always predicted to be faster than the standard
+           library for the same commit, benchmark and QEMU options.  NaN if there is no
+           such size or no standard library results."""
+        self.crossover = np.full(len(self.keys), np.nan)
+        index = {key: i for i, key in enumerate(self.keys)}
+        vec = []
+        ref = []
+        for i, (cmt, bm, conf) in enumerate(self.keys):
+            scalar = (cmt, bm, self._scalar_conf(conf))
+            if scalar[2] != conf and scalar in index:
+                vec.append(i)
+                ref.append(index[scalar])
+        if not vec or len(self.sizes) == 0:
+            return
+
+        pred = self.predict(self.sizes)
+        faster = pred[vec] < pred[ref]
+        # For each column, is vector faster at this and all larger sizes?
+        always = np.flip(np.cumprod(np.flip(faster, axis=1), axis=1),
+                         axis=1).astype(bool)
+        first = np.argmax(always, axis=1)
+        found = always[np.arange(len(vec)), first]
+        self.crossover[vec] = np.where(found, self.sizes[first], np.nan)
+
+    def rows(self):
+        """The fitted models as a list of tuples of commit, benchmark,
+           configuration, points, breakpoint, small size overhead and cost
+           per byte, large size overhead and cost per byte and crossover.
+           Breakpoint and crossover are None if not present."""
+        res = []
+        for i, (cmt, bm, conf) in enumerate(self.keys):
+            brk = int(self.brk[i]) if np.isfinite(self.brk[i]) else None
+            xover = int(self.crossover[i]) \
+                if np.isfinite(self.crossover[i]) else None
+            res.append((cmt, bm, conf, int(self.npts[i]), brk,
+                        float(self.a_small[i]), float(self.b_small[i]),
+                        float(self.a_large[i]), float(self.b_large[i]),
+                        xover))
+        return res
+
+    def export_csv(self, csvfile):
+        """Export the fitted models to a CSV file."""
+        with open(csvfile, 'w', newline='', encoding="utf-8") as csvf:
+            csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+            csvwriter.writerow(CostModel.HEADER)
+            for row in self.rows():
+                csvwriter.writerow(['' if v is None else v for v in row])
+        self._log.info(f'Cost model in {csvfile}')
+
+    def write_markdown(self, fh):
+        """Write the fitted models as a Markdown table."""
+        fh.write('| ' + ' | '.join(CostModel.HEADER) + ' |\n')
+        fh.write('|:--|:--|:--|--:|--:|--:|--:|--:|--:|--:|\n')
+        for row in self.rows():
+            cmt, bm, conf, npts, brk, a_s, b_s, a_l, b_l, xover = row
+            brkstr = '-' if brk is None else str(brk)
+            xstr = '-' if xover is None else str(xover)
+            fh.write(f'| {cmt} | {bm} | {conf} | {npts} | {brkstr} | '
+                     f'{a_s:.2f} | {b_s:.4f} | {a_l:.2f} | {b_l:.4f} | '
+                     f'{xstr} |\n')
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+
+# Script to benchmark the benchmarking harness itself
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This measures the overhead of the benchmarking harness.
+
+The harness is run end to end, from building QEMU through to the report,
+with stand in versions of QEMU, make and all the other tools, which take a
+known synthetic time.  This is done for a range of sizes of the benchmarking
+matrix, measuring the overhead of the harness for each data point, the
+latency of each QEMU launch, the peak memory and how these scale with the
+size of the matrix.
+
+Any arguments not recognized are passed on to the harness.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from stubtools import StubTools
+from support import Log
+from support import check_python_version
+
+# The phases reported and the spans which time them
+PHASES = {
+    'QEMU' : 'QEMUBuilder.__init__',
+    'Setup' : 'ModelSet.__init__',
+    'Build' : 'ModelSet.build',
+    'Run' : 'ModelSet.run',
+    'CSV' : 'ModelSet.generate_csv',
+    'Report' : 'Reporter.gen_report',
+}
+
+HEADER = ['Matrix', 'Points', 'Failed', 'QEMU runs', 'Wall s',
+          'Harness CPU s', 'Stub CPU s', 'Overhead ms/point',
+          'Wall ms/point', 'Launch ms', 'Peak RSS MiB'] \
+    + [f'{p} s' for p in PHASES]
+
+
+class HarnessBench:
+    """A class to run the harness with stand in tools for each size of
+       matrix and measure it.
+
+       A matrix is given as <benchmarks>x<sizes>, the number of each to
+       use, which with the commits and VLENs gives the number of points."""
+
+    def __init__(self, args, harness_args, log):
+        """Constructor creates the stand in tools."""
+        self._args = args
+        self._harness_args = harness_args
+        self._log = log
+        self._workdir = os.path.abspath(args.workdir)
+        self._strmemdir = os.path.dirname(os.path.abspath(sys.argv[0]))
+        self._installdir = os.path.join(self._workdir, 'install')
+        self._stubs = StubTools(os.path.join(self._workdir, 'stubs'),
+                                args.cost)
+        self._stubs.create(args.commits, self._installdir)
+        self._bmlist = sorted(
+            os.path.basename(f)[:-len('-wrapper.c')] for f in glob.glob(
+                os.path.join(self._strmemdir, 'src', '*-wrapper.c')))
+        self.rows = []
+        self.floor = None
+
+    def _matrix(self, spec):
+        """The benchmarks and sizes for a matrix."""
+        try:
+            nbms, nsizes = [int(n) for n in spec.split('x')]
+        except ValueError:
+            self._log.error(f'ERROR: Bad matrix "{spec}"')
+            sys.exit(1)
+        if not 1 <= nbms <= len(self._bmlist) or nsizes < 1:
+            self._log.error(f'ERROR: Matrix "{spec}" must have 1 to '
+                            f'{len(self._bmlist)} benchmarks and some sizes')
+            sys.exit(1)
+        return self._bmlist[:nbms], [str(2 ** i) for i in range(nsizes)]
+
+    def _launch_floor(self, n=20):
+        """The time in ms to launch one of the tools through the shell, as
+           the harness does, excluding its own run time.  This is the part
+           of the launch latency due to the tools rather than the
+           harness."""
+        self._stubs.reset()
+        tool = os.path.join(self._stubs.bindir,
+                            'riscv64-unknown-linux-gnu-gcc')
+        walls = []
+        for _ in range(n):
+            start = time.time()
+            subprocess.run(tool, shell=True, executable='/bin/bash',
+                           stdout=subprocess.PIPE, check=True)
+            walls.append(time.time() - start)
+        own = [r['wall'] for r in self._stubs.records()]
+        return 1000.0 * (sum(walls) - sum(own)) / n
+
+    def _harness_cmd(self, mdir, bmlist, sizelist):
+        """The command to run the harness for a matrix in mdir."""
+        args = self._args
+        cmd = [sys.executable,
+               os.path.join(self._strmemdir, 'run_all_benchmarks.py'),
+               '--strmemdir', os.path.join(mdir, 'strmem'),
+               '--qemudir', self._stubs.qemudir,
+               '--installdir', self._installdir,
+               '--builddir', os.path.join(mdir, 'build'),
+               '--sifivesrcdir', os.path.join(mdir, 'sifive'),
+               '--resdir', os.path.join(mdir, 'results'),
+               '--logdir', os.path.join(mdir, 'logs'),
+               '--telemetry', os.path.join(mdir, 'events.jsonl'),
+               '--trace', os.path.join(mdir, 'trace.json'),
+               '--no-live',
+               '--qemulist'] + args.commits + \
+               ['--bmlist'] + bmlist + \
+               ['--vlenlist'] + args.vlenlist + \
+               ['--sizelist'] + sizelist
+        if args.iter_bytes:
+            cmd += ['--iter-bytes', str(args.iter_bytes)]
+        return cmd + self._harness_args
+
+    def _setup(self, mdir):
+        """A clean directory for a matrix, with the harness sources it
+           copies and reports from."""
+        shutil.rmtree(mdir, ignore_errors=True)
+        strmem = os.path.join(mdir, 'strmem')
+        shutil.copytree(os.path.join(self._strmemdir, 'src'),
+                        os.path.join(strmem, 'src'))
+        shutil.copy(os.path.join(self._strmemdir, 'report-header.md'), strmem)
+
+    @staticmethod
+    def _read_jsonl(filename):
+        """The records of a JSON lines file, or an empty list."""
+        res = []
+        try:
+            with open(filename, 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        res.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return res
+
+    @staticmethod
+    def _read_trace(filename):
+        """The complete spans of a trace, or an empty list."""
+        try:
+            with open(filename, 'r', encoding='utf-8') as fh:
+                events = json.load(fh)['traceEvents']
+        except (OSError, ValueError, KeyError):
+            return []
+        return [e for e in events if e.get('ph') == 'X']
+
+    def run_one(self, spec):
+        """Run the harness for one matrix.  Return the row of results."""
+        bmlist, sizelist = self._matrix(spec)
+        mdir = os.path.join(self._workdir, spec)
+        self._setup(mdir)
+        self._stubs.reset()
+        cmd = self._harness_cmd(mdir, bmlist, sizelist)
+        self._log.info(f'Running matrix {spec}')
+        self._log.debug(f'DEBUG: Harness command is {" ".join(cmd)}')
+        env = dict(os.environ)
+        env['PATH'] = self._stubs.path()
+        start = time.time()
+        with open(os.path.join(mdir, 'harness.out'), 'w',
+                  encoding='utf-8') as fh:
+            proc = subprocess.Popen(cmd, cwd=mdir, env=env, stdout=fh,
+                                    stderr=subprocess.STDOUT)
+            # Reap it ourselves, to get the usage of just this harness
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.time() - start
+        if proc.returncode != 0:
+            self._log.warning(f'Warning: Harness for matrix {spec} exited '
+                              f'with {proc.returncode}')
+
+        events = self._read_jsonl(os.path.join(mdir, 'events.jsonl'))
+        points = sum(1 for e in events
+                     if e['event'] == 'point' and e.get('phase') == 'run')
+        failed = sum(1 for e in events
+                     if e['event'] == 'point_failed'
+                     and e.get('phase') == 'run')
+        stubrecs = self._stubs.records()
+        qemurecs = [r for r in stubrecs if r['tool'] == 'qemu']
+        spans = self._read_trace(os.path.join(mdir, 'trace.json'))
+        qemuspans = [s['dur'] for s in spans if s['name'] == 'Model._run_qemu']
+
+        cpu = usage.ru_utime + usage.ru_stime
+        stubcpu = sum(r['cpu'] for r in stubrecs)
+        overhead = 1000.0 * (cpu - stubcpu) / points if points else None
+        perpoint = 1000.0 * wall / points if points else None
+        if qemurecs and qemuspans:
+            launch = (sum(qemuspans) / 1000.0
+                      - 1000.0 * sum(r['wall'] for r in qemurecs)) \
+                / len(qemurecs)
+        else:
+            launch = None
+        phases = [sum(s['dur'] for s in spans if s['name'] == name) / 1.0e6
+                  for name in PHASES.values()]
+        return [spec, points, failed, len(qemurecs), wall, cpu, stubcpu,
+                overhead, perpoint, launch, usage.ru_maxrss / 1024.0] \
+            + phases
+
+    def run(self):
+        """Run every matrix."""
+        self.floor = self._launch_floor()
+        for spec in self._args.matrix:
+            self.rows.append(self.run_one(spec))
+
+    def scaling(self, col):
+        """The exponent of the growth of column col with the number of
+           points, from a fit on a log-log scale, or None if we cannot
+           tell."""
+        pts = [(r[1], r[col]) for r in self.rows
+               if r[1] and r[col] and r[col] > 0.0]
+        if len(set(p[0] for p in pts)) < 2:
+            return None
+        x = np.log([p[0] for p in pts])
+        y = np.log([p[1] for p in pts])
+        return float(np.polyfit(x, y, 1)[0])
+
+    def export_csv(self, csvfile):
+        """Write the results to a CSV file."""
+        with open(csvfile, 'w', newline='', encoding='utf-8') as csvf:
+            csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+            csvwriter.writerow(HEADER)
+            for row in self.rows:
+                csvwriter.writerow(['' if v is None else v for v in row])
+        self._log.info(f'Harness benchmark results in {csvfile}')
+
+    def summary(self):
+        """Log a summary of the results."""
+        def fmt(v):
+            if v is None:
+                return '-'
+            if isinstance(v, float):
+                return f'{v:.2f}'
+            return str(v)
+        for row in self.rows:
+            self._log.info('')
+            for name, v in zip(HEADER, row):
+                self._log.info(f'  {name:<18s} : {fmt(v)}')
+        self._log.info('')
+        self._log.info(f'Tool launch floor: {fmt(self.floor)} ms')
+        for name, col in [('Wall time', HEADER.index('Wall s')),
+                          ('Harness CPU', HEADER.index('Harness CPU s')),
+                          ('Peak RSS', HEADER.index('Peak RSS MiB'))]:
+            exp = self.scaling(col)
+            if exp is not None:
+                self._log.info(f'{name} grows as points^{exp:.2f}')
+
+
+def parse_args():
+    """Parse the arguments.  Return the arguments and the list of those
+       not recognized, which are for the harness."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the benchmarking harness with stand in tools')
+    datestamp = time.strftime('%Y-%m-%d-%H-%M-%S')
+    parser.add_argument(
+        '--workdir',
+        type=str,
+        default=f'harness-bench-{datestamp}',
+        metavar='DIR',
+        help='Directory for the stand in tools and the runs ' \
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--matrix',
+        type=str,
+        nargs='+',
+        default=['1x4', '2x8', '4x16'],
+        metavar='BMSxSIZES',
+        help='Sizes of matrix to run, as the number of benchmarks and ' \
+             'sizes (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--commits',
+        type=str,
+        nargs='+',
+        default=['stub-a', 'stub-b'],
+        metavar='NAME',
+        help='Names of the stand in QEMU commits (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--vlenlist',
+        type=str,
+        nargs='+',
+        default=['stdlib', '128'],
+        metavar='VLEN',
+        help='VLENs for each matrix (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--iter-bytes',
+        type=int,
+        default=1000000,
+        metavar='BYTES',
+        help='Bytes per run passed to the harness, or 0 to calibrate ' \
+             '(default: %(default)s)',
+    )
+    parser.add_argument(
+        '--cost',
+        type=str,
+        action='append',
+        default=[],
+        metavar='NAME=VALUE',
+        help='Synthetic cost of the stand in tools, one of ' \
+             + ', '.join(StubTools.DEFAULTS) + ' (may be repeated)',
+    )
+    parser.add_argument(
+        '--csv',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help='CSV file for the results (default harness-bench.csv in the ' \
+             'work directory)',
+    )
+    parser.add_argument(
+        '--logdir',
+        type=str,
+        default='logs',
+        metavar='DIR',
+        help='Directory in which to store logs (default: %(default)s)',
+    )
+    args, harness_args = parser.parse_known_args()
+    args.datestamp = datestamp
+    costs = {}
+    for spec in args.cost:
+        name, sep, val = spec.partition('=')
+        try:
+            if not sep or name not in StubTools.DEFAULTS:
+                raise ValueError
+            costs[name] = float(val)
+        except ValueError:
+            print(f'ERROR: Bad cost "{spec}"', file=sys.stderr)
+            sys.exit(1)
+    args.cost = costs
+    if not args.csv:
+        args.csv = os.path.join(args.workdir, 'harness-bench.csv')
+    return args, harness_args
+
+
+def main():
+    """Main program benchmarking the harness"""
+    args, harness_args = parse_args()
+    log = Log()
+    log.setup(args.logdir, f'bench-harness-{args.datestamp}.log')
+    bench = HarnessBench(args, harness_args, log)
+    bench.run()
+    bench.export_csv(args.csv)
+    bench.summary()
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# Differential flame graphs
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to draw differential flame graphs as SVG from two sets of folded
+call stacks, without needing any external tools.
+
+Frame widths are from the new profile.  Frames which got more expensive are
+red, those which got cheaper are blue, with the depth of color showing the
+size of the change.
+"""
+
+from xml.sax.saxutils import escape
+
+# What we export
+
+__all__ = [
+    'DiffFlameGraph',
+]
+
+
+class DiffFlameGraph:
+    """A class for a differential flame graph.
+
+       The base and new stacks are dictionaries indexed by folded stack of
+       the cost of that stack, which the caller should already have
+       normalized so the two are comparable."""
+
+    WIDTH = 1200
+    FRAME_HEIGHT = 16
+    FONT_SIZE = 11
+    PAD = 10
+    TITLE_HEIGHT = 30
+
+    # Frames narrower than this many pixels are not drawn
+    MIN_WIDTH = 0.1
+
+    def __init__(self, title, base, new):
+        """Constructor builds the merged call tree."""
+        self._title = title
+        self._root = self._node('all')
+        for stacks, key in [(base, 'base'), (new, 'new')]:
+            for stack, cost in stacks.items():
+                node = self._root
+                node[key] += cost
+                for frame in stack.split(';'):
+                    node = node['children'].setdefault(frame,
+                                                       self._node(frame))
+                    node[key] += cost
+
+    @staticmethod
+    def _node(name):
+        """A new node of the call tree."""
+        return {'name': name, 'base': 0.0, 'new': 0.0, 'children': {}}
+
+    def _depth(self, node):
+        """Depth of the tree below node."""
+        if not node['children']:
+            return 1
+        return 1 + max(self._depth(c) for c in node['children'].values())
+
+    def _maxdelta(self, node):
+        """Largest absolute change of any node below node."""
+        res = abs(node['new'] - node['base'])
+        for c in node['children'].values():
+            res = max(res, self._maxdelta(c))
+        return res
+
+    @staticmethod
+    def _color(delta, maxdelta):
+        """Red for more expensive, blue for cheaper, white for no
+           change."""
+        if maxdelta <= 0.0:
+            return 'rgb(255,255,255)'
+        shade = int(255 * (1.0 - min(1.0, abs(delta) / maxdelta)))
+        if delta > 0.0:
+            return f'rgb(255,{shade},{shade})'
+        return f'rgb({shade},{shade},255)'
+
+    def _frames(self, node, x, depth, scale, maxdelta, height, out):
+        """Draw node and its children as SVG elements appended to out."""
+        width = node['new'] * scale
+        if width < self.MIN_WIDTH:
+            return
+        y = height - self.PAD - (depth + 1) * self.FRAME_HEIGHT
+        delta = node['new'] - node['base']
+        if node['base'] > 0.0:
+            change = f'{100.0 * delta / node["base"]:+.1f}%'
+        else:
+            change = 'new'
+        name = escape(node['name'])
+        out.append(
+            f'<g><title>{name} (base {node["base"]:.4g}, new '
+            f'{node["new"]:.4g}, {change})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" '
+            f'height="{self.FRAME_HEIGHT - 1}" '
+            f'fill="{self._color(delta, maxdelta)}" stroke="rgb(200,200,200)" '
+            f'stroke-width="0.5"/>')
+        nchars = int(width / (self.FONT_SIZE * 0.6))
+        if nchars >= 3:
+            label = node['name']
+            if len(label) > nchars:
+                label = label[:nchars - 2] + '..'
+            ty = y + self.FRAME_HEIGHT - 4
+            out.append(
+                f'<text x="{x + 3:.1f}" y="{ty}">{escape(label)}</text>')
+        out.append('</g>')
+        for c in sorted(node['children'].values(), key=lambda n: n['name']):
+            self._frames(c, x, depth + 1, scale, maxdelta, height, out)
+            x += c['new'] * scale
+
+    def svg(self):
+        """The flame graph as an SVG string."""
+        height = self._depth(self._root) * self.FRAME_HEIGHT \
+            + 2 * self.PAD + self.TITLE_HEIGHT
+        if self._root['new'] > 0.0:
+            scale = (self.WIDTH - 2 * self.PAD) / self._root['new']
+        else:
+            scale = 0.0
+        out = [
+            '<?xml version="1.0" standalone="no"?>',
+            f'<svg version="1.1" width="{self.WIDTH}" height="{height}" '
+            f'viewBox="0 0 {self.WIDTH} {height}" '
+            'xmlns="http://www.w3.org/2000/svg">',
+            f'<style>text {{ font-family: Verdana, sans-serif; '
+            f'font-size: {self.FONT_SIZE}px; fill: rgb(0,0,0); }}</style>',
+            f'<rect x="0" y="0" width="{self.WIDTH}" height="{height}" '
+            'fill="rgb(248,248,248)"/>',
+            f'<text x="{self.WIDTH / 2}" y="{self.PAD + self.FONT_SIZE + 4}" '
+            f'text-anchor="middle" style="font-size: {self.FONT_SIZE + 4}px">'
+            f'{escape(self._title)}</text>',
+        ]
+        self._frames(self._root, float(self.PAD), 0, scale,
+                     self._maxdelta(self._root), height, out)
+        out.append('</svg>')
+        return '\n'.join(out) + '\n'
+
+    def write(self, filename):
+        """Write the flame graph to an SVG file."""
+        with open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(self.svg())
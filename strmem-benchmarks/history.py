@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+# Historical tracking of results across campaigns
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to track results across many campaigns and QEMU commits, and to find
+the commits where performance changed.
+
+Campaigns are ingested into a SQLite database.  Every point of the default
+configuration of each VLEN (no LMUL, implementation, placement or option
+variants) is kept, with the QEMU commit it measured, which is ordered by its
+commit date.  Points a campaign reused from an earlier one are not, as they
+are kept when the campaign that measured them is ingested.  Commits are
+identified by their hash, as recorded by the campaign, so a branch measured
+at different times is a different commit each time.  For each benchmark,
+VLEN and size class (sizes within a power of four) there is then a series of
+one value per commit, which is the geometric mean over the sizes in the class
+of ns/inst, taking the median if a commit was measured more than once.  The
+series are kept up to date as campaigns are ingested and indexed by date, so
+queries stay fast however many commits there are.
+
+Change points in each series are found by binary segmentation of the log of
+the values.  A change is accepted if it reduces the squared error by more
+than a penalty, in proportion to the noise of the series and the log of its
+length, and is larger than a minimum relative change.
+"""
+
+import csv
+import glob
+import math
+import os
+import os.path
+import sqlite3
+import statistics
+import subprocess
+import time
+
+import numpy as np
+
+from provenance import Provenance
+
+# What we export
+
+__all__ = [
+    'ChangePoints',
+    'History',
+]
+
+
+class History:
+    """A class for the database of results of all campaigns."""
+
+    # Version 1 identifies commits by hash, rather than by name
+    VERSION = 1
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS commits (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            hash TEXT UNIQUE,
+            date REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS campaigns (
+            id INTEGER PRIMARY KEY,
+            resdir TEXT UNIQUE NOT NULL,
+            datestamp TEXT,
+            host TEXT,
+            ingested REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS points (
+            campaign INTEGER NOT NULL,
+            cmt INTEGER NOT NULL,
+            bm TEXT NOT NULL,
+            vlen TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            sizeclass INTEGER NOT NULL,
+            nsinst REAL NOT NULL,
+            smiter REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS points_key
+            ON points (bm, vlen, sizeclass, cmt);
+        CREATE TABLE IF NOT EXISTS series (
+            bm TEXT NOT NULL,
+            vlen TEXT NOT NULL,
+            sizeclass INTEGER NOT NULL,
+            cmt INTEGER NOT NULL,
+            date REAL NOT NULL,
+            value REAL NOT NULL,
+            npoints INTEGER NOT NULL,
+            PRIMARY KEY (bm, vlen, sizeclass, cmt));
+        CREATE INDEX IF NOT EXISTS series_date
+            ON series (bm, vlen, sizeclass, date);
+    '''
+
+    def __init__(self, dbfile, log):
+        """Constructor opens the database, creating it if need be."""
+        self._log = log
+        self._db = sqlite3.connect(dbfile)
+        self._migrate()
+        self._db.executescript(History.SCHEMA)
+        self._db.execute(f'PRAGMA user_version = {History.VERSION}')
+
+    def _migrate(self):
+        """Bring the commits table of an older database up to date.  Points
+           already ingested under a commit name stay with it.  Names which
+           were recorded with the same hash become one commit, the first of
+           them, and its series are recomputed.  The update is one
+           transaction, so on error the database is left as it was and the
+           error is raised."""
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version >= History.VERSION or not self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'commits'"
+                ).fetchone():
+            return
+        self._log.info('Updating the history database')
+        try:
+            self._db.execute('BEGIN')
+            self._db.execute('ALTER TABLE commits RENAME TO old_commits')
+            self._db.execute('''
+                CREATE TABLE commits (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    hash TEXT UNIQUE,
+                    date REAL NOT NULL)''')
+            self._db.execute('''
+                INSERT INTO commits SELECT id, name, hash, date
+                FROM old_commits WHERE hash IS NULL OR id IN
+                    (SELECT MIN(id) FROM old_commits GROUP BY hash)''')
+            self._db.execute('''
+                UPDATE points SET cmt = (
+                    SELECT MIN(o.id) FROM old_commits o
+                    JOIN old_commits p ON p.hash = o.hash
+                    WHERE p.id = points.cmt)
+                WHERE cmt NOT IN (SELECT id FROM commits)''')
+            keys = self._db.execute('''
+                SELECT DISTINCT bm, vlen, sizeclass, cmt FROM points
+                WHERE cmt IN (SELECT MIN(id) FROM old_commits
+                              WHERE hash IS NOT NULL GROUP BY hash
+                              HAVING COUNT(*) > 1)''').fetchall()
+            self._db.execute(
+                'DELETE FROM series WHERE cmt NOT IN (SELECT id FROM commits)')
+            self._db.execute('DROP TABLE old_commits')
+            for key in keys:
+                self._update_series(*key)
+            self._db.commit()
+        except sqlite3.Error as e:
+            self._db.rollback()
+            ename = type(e).__name__
+            self._log.error('ERROR: Unable to update the history database: '
+                            f'{ename}: {e}')
+            raise
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    @staticmethod
+    def sizeclass(sz):
+        """The size class of a size, which is the power of 4 it is in."""
+        return int(math.log(max(1, sz), 4) + 1.0e-9)
+
+    @staticmethod
+    def classname(cls):
+        """The range of sizes in a size class."""
+        return f'{4 ** cls}-{4 ** (cls + 1) - 1}'
+
+    def _git_show(self, rev, qemudir):
+        """The full hash and commit date of a revision in the QEMU
+           repository, or None if we cannot get them."""
+        if not qemudir:
+            return None
+        try:
+            res = subprocess.run(
+                f'git show -s --format="%H %ct" {rev}',
+                shell=True,
+                executable='/bin/bash',
+                cwd=qemudir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=60,
+                check=True,
+            )
+            cmthash, ctime = res.stdout.decode('utf-8').split()[:2]
+            return cmthash, float(ctime)
+        except (subprocess.SubprocessError, OSError, ValueError):
+            return None
+
+    def _commit(self, name, cmthash, qemudir, fallback):
+        """The id of a commit, adding it if new.  The commit is identified
+           by the hash the campaign recorded for its name, otherwise what the
+           name resolves to in the QEMU repository now, otherwise just the
+           name.  The date is the commit date from the QEMU repository, or
+           the fallback if we cannot get it."""
+        found = self._git_show(cmthash or name, qemudir)
+        date = fallback
+        if found and (not cmthash or found[0].startswith(cmthash)):
+            cmthash, date = found
+        elif qemudir:
+            self._log.warning(f'Warning: No commit date for {name}, '
+                              'using the campaign date')
+        if cmthash:
+            row = self._db.execute('SELECT id FROM commits WHERE hash = ?',
+                                   (cmthash,)).fetchone()
+        else:
+            row = self._db.execute('SELECT id FROM commits WHERE name = ? '
+                                   'AND hash IS NULL', (name,)).fetchone()
+        if row:
+            return row[0]
+        cur = self._db.execute(
+            'INSERT INTO commits (name, hash, date) VALUES (?, ?, ?)',
+            (name, cmthash, date))
+        return cur.lastrowid
+
+    @staticmethod
+    def _points(csvfile):
+        """The commit and points of the default configuration in a results
+           CSV file, or None if it has none.  The points are a list of tuples
+           of benchmark, VLEN, size, ns/inst and s/Miter."""
+        points = []
+        cmt = None
+        with open(csvfile, 'r', newline='', encoding='utf-8') as csvf:
+            for row in csv.DictReader(csvf, dialect=csv.unix_dialect):
+                bm = row['Benchmark']
+                vlen = row['VLEN']
+                tail = f'-{bm}-{vlen}.csv'
+                if not os.path.basename(csvfile).endswith(tail) \
+                   or not row['ns/inst']:
+                    return None
+                cmt = os.path.basename(csvfile)[:-len(tail)]
+                points.append((bm, vlen, int(row['Size']),
+                               float(row['ns/inst']), float(row['s/Miter'])))
+        return (cmt, points) if points else None
+
+    def ingest(self, resdir, qemudir):
+        """Ingest the results of a campaign, except points it reused from
+           an earlier campaign.  Return the number of points ingested, or
+           None if the campaign was already ingested."""
+        resdir = os.path.realpath(resdir)
+        if self._db.execute('SELECT 1 FROM campaigns WHERE resdir = ?',
+                            (resdir,)).fetchone():
+            return None
+        prov = Provenance.load(resdir) or {}
+        when = prov.get('time', os.path.getmtime(resdir))
+        hashes = prov.get('commits', {})
+        models = prov.get('models', {})
+        cur = self._db.execute(
+            'INSERT INTO campaigns (resdir, datestamp, host, ingested) '
+            'VALUES (?, ?, ?, ?)',
+            (resdir, prov.get('datestamp'), prov.get('host'), time.time()))
+        campaign = cur.lastrowid
+
+        keys = set()
+        npoints = 0
+        nreused = 0
+        for csvfile in sorted(glob.glob(os.path.join(resdir, '*.csv'))):
+            try:
+                found = self._points(csvfile)
+            except (OSError, KeyError, ValueError):
+                found = None
+            if not found:
+                continue
+            cmt, points = found
+            suffix = os.path.basename(csvfile)[:-len('.csv')]
+            reused = models.get(suffix, {}).get('reused', {})
+            nreused += sum(1 for p in points if str(p[2]) in reused)
+            points = [p for p in points if str(p[2]) not in reused]
+            if not points:
+                continue
+            cmtid = self._commit(cmt, hashes.get(cmt), qemudir, when)
+            rows = []
+            for bm, vlen, sz, nsinst, smiter in points:
+                cls = History.sizeclass(sz)
+                rows.append((campaign, cmtid, bm, vlen, sz, cls, nsinst,
+                             smiter))
+                keys.add((bm, vlen, cls, cmtid))
+            self._db.executemany(
+                'INSERT INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            npoints += len(rows)
+        for key in keys:
+            self._update_series(*key)
+        self._db.commit()
+        self._log.info(f'Ingested {npoints} points from {resdir}')
+        if nreused:
+            self._log.info(f'{nreused} points reused from earlier campaigns '
+                           'were not ingested again')
+        return npoints
+
+    def _update_series(self, bm, vlen, cls, cmtid):
+        """Recompute the value of a series for a commit.  This is the
+           geometric mean over sizes of the median over campaigns of
+           ns/inst."""
+        bysize = {}
+        for sz, nsinst in self._db.execute(
+                'SELECT size, nsinst FROM points WHERE bm = ? AND vlen = ? '
+                'AND sizeclass = ? AND cmt = ?', (bm, vlen, cls, cmtid)):
+            bysize.setdefault(sz, []).append(nsinst)
+        vals = [statistics.median(v) for v in bysize.values()]
+        vals = [v for v in vals if v > 0.0]
+        if not vals:
+            return
+        value = math.exp(sum(math.log(v) for v in vals) / len(vals))
+        date = self._db.execute('SELECT date FROM commits WHERE id = ?',
+                                (cmtid,)).fetchone()[0]
+        self._db.execute(
+            'INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (bm, vlen, cls, cmtid, date, value, len(vals)))
+
+    def keys(self, bmlist=None):
+        """The benchmark, VLEN and size class of every series, optionally
+           just for the listed benchmarks."""
+        rows = self._db.execute(
+            'SELECT DISTINCT bm, vlen, sizeclass FROM series '
+            'ORDER BY bm, vlen, sizeclass').fetchall()
+        return [r for r in rows if not bmlist or r[0] in bmlist]
+
+    def series(self, bm, vlen, cls):
+        """A series in commit date order, as a list of tuples of commit
+           name, date and value.  Where several commits have the same name,
+           such as a branch, the name is followed by the start of the
+           hash."""
+        rows = self._db.execute(
+            'SELECT c.name, c.hash, s.date, s.value FROM series s '
+            'JOIN commits c ON c.id = s.cmt WHERE s.bm = ? AND s.vlen = ? '
+            'AND s.sizeclass = ? ORDER BY s.date, c.id',
+            (bm, vlen, cls)).fetchall()
+        names = [r[0] for r in rows]
+        return [(f'{name}@{cmthash[:12]}'
+                 if cmthash and names.count(name) > 1 else name, date, value)
+                for name, cmthash, date, value in rows]
+
+    def stats(self):
+        """The number of commits, campaigns and points."""
+        return tuple(self._db.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                     for t in ['commits', 'campaigns', 'points'])
+
+
+class ChangePoints:
+    """A class to find the change points of a series by binary
+       segmentation.
+
+       Each change is a tuple of the index of the first value after the
+       change and the relative change from the segment before to the
+       segment after, which is positive if the value went up."""
+
+    # The fewest values either side of a change
+    MIN_SEGMENT = 2
+
+    def __init__(self, min_change, penalty):
+        """Constructor just records the thresholds."""
+        self._min_change = min_change
+        self._penalty = penalty
+
+    @staticmethod
+    def _noise(y):
+        """A robust estimate of the standard deviation of the noise, from
+           the median absolute deviation of successive differences, so it is
+           not inflated by the changes themselves."""
+        if len(y) < 3:
+            return 0.0
+        d = np.diff(y)
+        return 1.4826 * float(np.median(np.abs(d - np.median(d)))) \
+            / math.sqrt(2.0)
+
+    def _best_split(self, cs, lo, hi):
+        """The best split of the segment from lo to hi, as a tuple of the
+           index and the reduction in squared error, or None if it is too
+           short to split."""
+        minseg = ChangePoints.MIN_SEGMENT
+        if hi - lo < 2 * minseg:
+            return None
+        k = np.arange(lo + minseg, hi - minseg + 1)
+        left = cs[k] - cs[lo]
+        right = cs[hi] - cs[k]
+        total = cs[hi] - cs[lo]
+        gain = left ** 2 / (k - lo) + right ** 2 / (hi - k) \
+            - total ** 2 / (hi - lo)
+        i = int(np.argmax(gain))
+        return int(k[i]), float(gain[i])
+
+    def detect(self, values):
+        """The changes in a list of values."""
+        y = np.log(np.array(values, dtype=np.float64))
+        n = len(y)
+        if n < 2 * ChangePoints.MIN_SEGMENT:
+            return []
+        cs = np.concatenate(([0.0], np.cumsum(y)))
+        sigma = max(self._noise(y), 1.0e-6)
+        threshold = self._penalty * sigma ** 2 * math.log(n)
+
+        splits = []
+        todo = [(0, n)]
+        while todo:
+            lo, hi = todo.pop()
+            best = self._best_split(cs, lo, hi)
+            if not best or best[1] <= threshold:
+                continue
+            k = best[0]
+            before = (cs[k] - cs[lo]) / (k - lo)
+            after = (cs[hi] - cs[k]) / (hi - k)
+            if abs(math.exp(after - before) - 1.0) < self._min_change:
+                continue
+            splits.append(k)
+            todo += [(lo, k), (k, hi)]
+
+        # The size of each change is between the final segments either
+        # side of it.
+        bounds = [0] + sorted(splits) + [n]
+        res = []
+        for i in range(1, len(bounds) - 1):
+            lo, k, hi = bounds[i - 1], bounds[i], bounds[i + 1]
+            before = (cs[k] - cs[lo]) / (k - lo)
+            after = (cs[hi] - cs[k]) / (hi - k)
+            res.append((k, math.exp(after - before) - 1.0))
+        return res
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+# The host environment of a benchmarking campaign
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to record the state of the host, and to detect when its performance
+drifts during a campaign.
+
+The fingerprint is what we can read of the CPU governor, frequency limits,
+turbo, SMT, kernel and microcode, together with the load and any thermal
+throttling.  Only the settings are used to identify the host, since the load
+and frequency change from moment to moment.
+
+The sentinel runs a fixed benchmark at intervals throughout the run, in a
+thread of the main process.  Each point is then given the drift of the
+sentinel while it was being measured, relative to the median of the sentinel
+over the whole campaign, so points measured while the host was faster or
+slower than usual can be flagged and measured again.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import os.path
+import statistics
+import threading
+import time
+
+from profiling import HostProfile
+
+# What we export
+
+__all__ = [
+    'HostFingerprint',
+    'Sentinel',
+]
+
+
+class HostFingerprint:
+    """A class to capture the state of the host.
+
+       The fingerprint is a dictionary.  Anything we cannot read is None, so
+       fingerprints from different hosts always have the same fields."""
+
+    # The fields which identify how the host is set up
+    STABLE = ['kernel', 'machine', 'cpu_model', 'microcode', 'cpus', 'smt',
+              'governor', 'min_freq_khz', 'max_freq_khz', 'turbo',
+              'energy_perf']
+
+    _CPUDIR = '/sys/devices/system/cpu'
+
+    @staticmethod
+    def _read(filename):
+        """The stripped contents of a file, or None if it cannot be read."""
+        try:
+            with open(filename, 'r', encoding='utf-8') as fh:
+                return fh.read().strip()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _percpu(name):
+        """The distinct values of a cpufreq setting across all CPUs, joined
+           with commas, or None if not available."""
+        vals = []
+        for f in sorted(glob.glob(os.path.join(
+                HostFingerprint._CPUDIR, 'cpu[0-9]*', 'cpufreq', name))):
+            v = HostFingerprint._read(f)
+            if v is not None and v not in vals:
+                vals.append(v)
+        return ','.join(vals) if vals else None
+
+    @staticmethod
+    def _cpuinfo():
+        """The model name and microcode of the first CPU."""
+        res = {'model name': None, 'microcode': None}
+        try:
+            with open('/proc/cpuinfo', 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    if not line.strip():
+                        break
+                    key, _, val = line.partition(':')
+                    if key.strip() in res:
+                        res[key.strip()] = val.strip()
+        except OSError:
+            pass
+        return res
+
+    @staticmethod
+    def _turbo():
+        """Whether turbo or boost is enabled, from whichever driver is in
+           use, or None if we cannot tell."""
+        no_turbo = HostFingerprint._read(os.path.join(
+            HostFingerprint._CPUDIR, 'intel_pstate', 'no_turbo'))
+        if no_turbo is not None:
+            return no_turbo == '0'
+        boost = HostFingerprint._read(os.path.join(
+            HostFingerprint._CPUDIR, 'cpufreq', 'boost'))
+        if boost is not None:
+            return boost == '1'
+        return None
+
+    @staticmethod
+    def _throttles():
+        """The total count of thermal throttling events on all CPUs, or None
+           if not available."""
+        counts = []
+        for f in glob.glob(os.path.join(HostFingerprint._CPUDIR, 'cpu[0-9]*',
+                                        'thermal_throttle', '*_count')):
+            v = HostFingerprint._read(f)
+            if v is not None and v.isdigit():
+                counts.append(int(v))
+        return sum(counts) if counts else None
+
+    @staticmethod
+    def capture():
+        """Capture the fingerprint of the host now."""
+        cpuinfo = HostFingerprint._cpuinfo()
+        uname = os.uname()
+        curfreqs = HostFingerprint._percpu('scaling_cur_freq')
+        if curfreqs:
+            curfreq = statistics.mean(int(f) for f in curfreqs.split(','))
+        else:
+            curfreq = None
+        return {
+            'time' : time.time(),
+            'hostname' : uname.nodename,
+            'kernel' : uname.release,
+            'machine' : uname.machine,
+            'cpu_model' : cpuinfo['model name'],
+            'microcode' : cpuinfo['microcode'],
+            'cpus' : os.cpu_count(),
+            'smt' : HostFingerprint._read(
+                os.path.join(HostFingerprint._CPUDIR, 'smt', 'active')),
+            'governor' : HostFingerprint._percpu('scaling_governor'),
+            'min_freq_khz' : HostFingerprint._percpu('scaling_min_freq'),
+            'max_freq_khz' : HostFingerprint._percpu('scaling_max_freq'),
+            'turbo' : HostFingerprint._turbo(),
+            'energy_perf' : HostFingerprint._percpu(
+                'energy_performance_preference'),
+            'loadavg' : list(os.getloadavg()),
+            'cur_freq_khz' : curfreq,
+            'throttles' : HostFingerprint._throttles(),
+        }
+
+    @staticmethod
+    def digest(fp):
+        """A short hash identifying how the host is set up."""
+        stable = {k: fp.get(k) for k in HostFingerprint.STABLE}
+        return hashlib.sha256(json.dumps(stable, sort_keys=True)
+                              .encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def changes(before, after):
+        """A list of descriptions of how the host changed between two
+           fingerprints, in its settings or by being throttled."""
+        res = []
+        for k in HostFingerprint.STABLE:
+            if before.get(k) != after.get(k):
+                res.append(f'{k} {before.get(k)} -> {after.get(k)}')
+        if before.get('throttles') is not None \
+           and after.get('throttles') is not None \
+           and after['throttles'] > before['throttles']:
+            res.append(f'{after["throttles"] - before["throttles"]} '
+                       'thermal throttling events')
+        return res
+
+    @staticmethod
+    def hostfile(resdir):
+        """The file holding the fingerprint of a campaign."""
+        return os.path.join(resdir, 'host.json')
+
+    @staticmethod
+    def save(filename, fp):
+        """Save a fingerprint, with its digest."""
+        rec = dict(fp)
+        rec['digest'] = HostFingerprint.digest(fp)
+        with open(filename, 'w', encoding='utf-8') as fh:
+            json.dump(rec, fh, indent=2)
+
+    @staticmethod
+    def load(filename):
+        """Load a fingerprint, or None if there is none."""
+        try:
+            with open(filename, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def logall(fp, log):
+        """Dump the fingerprint to the log file."""
+        log.debug('Host fingerprint:')
+        for k, v in fp.items():
+            log.debug(f'  {k:<12s} : {v}')
+        log.debug(f'  {"digest":<12s} : {HostFingerprint.digest(fp)}')
+        log.debug('')
+
+
+class Sentinel:
+    """A class to run a fixed benchmark at intervals in the background, and
+       work out the drift of the host from it.
+
+       The sentinel is a model, run for a fixed size and number of
+       iterations.  If we may use more than one CPU, the last is reserved
+       for the sentinel, and the models measured run on the others
+       (self.cpus).  The sentinel is only sampled while all the workers
+       running models are busy, so the host is under the same load.  Each
+       sample is the time at which it completed, the time per iteration and
+       the number of busy workers.  The drift at any time is the ratio of
+       the sentinel then to its median under the same load, so 1.0 is no
+       drift and greater than 1.0 is slower."""
+
+    SIZE = 1024
+    BYTES = 100000000
+
+    def __init__(self, model, args, log):
+        """Constructor just records the model, when to run it and the CPUs
+           to use."""
+        self._model = model
+        self._log = log
+        self._interval = args.get('sentinel_interval')
+        self.threshold = args.get('sentinel_threshold')
+        self._iters = HostProfile.iterations(Sentinel.SIZE, Sentinel.BYTES)
+        self._stop = threading.Event()
+        self._thread = None
+        self._load = 0
+        self._remaining = 0
+        self.samples = []
+        allowed = sorted(os.sched_getaffinity(0))
+        if len(allowed) > 1:
+            self._cpu = allowed[-1]
+            self.cpus = allowed[:-1]
+        else:
+            self._cpu = None
+            self.cpus = None
+        self.workers = len(self.cpus or allowed)
+
+    def _sample(self):
+        """Run the sentinel once, recording the time per iteration, unless
+           we were stopped meanwhile, when the load has changed."""
+        res = self._model._run_one(Sentinel.SIZE, self._iters, 'no-plugin')
+        if self._stop.is_set():
+            return
+        if not res or res[1] <= 0.0:
+            self._log.debug(f'DEBUG: Sentinel {self._model.suffix} failed')
+            return
+        self.samples.append((time.time(), res[1] / float(res[0]),
+                             self._load))
+        if self._model.telemetry:
+            self._model.telemetry.emit('sentinel', config=self._model.suffix,
+                                       time_per_iter=self.samples[-1][1])
+
+    def _loop(self):
+        """Sample the sentinel on its own CPU until stopped.  The affinity
+           of this thread is inherited by the QEMU it runs."""
+        if self._cpu is not None:
+            os.sched_setaffinity(0, [self._cpu])
+        while True:
+            self._sample()
+            if self._stop.wait(self._interval):
+                break
+
+    def start(self, ntasks):
+        """Start sampling in the background, while a pool runs ntasks."""
+        if not self.samples:
+            where = '' if self._cpu is None else f' on CPU {self._cpu}'
+            self._log.info(f'Sentinel {self._model.suffix} every '
+                           f'{self._interval}s{where}')
+        self._load = min(ntasks, self.workers)
+        self._remaining = ntasks
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def task_done(self):
+        """A task of the pool has completed.  Stop sampling once too few
+           remain to keep the same number of workers busy."""
+        self._remaining -= 1
+        if self._remaining < self._load:
+            self.stop()
+
+    def stop(self):
+        """Stop sampling, discarding any sample still running.  Does
+           nothing if we are not sampling."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def drift(self, start, end):
+        """The drift while a point was measured from start to end.  This is
+           the mean of any samples completing in that time, otherwise the
+           sample nearest to it, each relative to the median of the samples
+           under the same load.  None if we have no samples."""
+        if not self.samples:
+            return None
+        during = [s for s in self.samples if start <= s[0] <= end]
+        if not during:
+            mid = (start + end) / 2.0
+            during = [min(self.samples, key=lambda s: abs(s[0] - mid))]
+        ratios = []
+        for _, tpi, load in during:
+            median = statistics.median(s[1] for s in self.samples
+                                       if s[2] == load)
+            ratios.append(tpi / median)
+        return statistics.mean(ratios)
+
+    def drifted(self, drift):
+        """Has a point with this drift drifted beyond the threshold?"""
+        return drift is not None and abs(drift - 1.0) > self.threshold
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Registry of implementations of the benchmarked functions
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to record the implementations of each benchmarked function which we
+can compare.
+
+The default implementation is the SiFive vector code generated by gensrc.sh.
+Any other implementation is a single assembly or C source file defining a
+function with the same interface as the standard library function.  It is
+built against the common benchmark-main.c and wrapper by renaming its
+function to the one the wrapper calls, so no driver of its own is needed.
+
+This replaces the separate drivers and shell scripts of memcpy-benchmarks.
+"""
+
+import os.path
+
+# What we export
+
+__all__ = [
+    'Implementation',
+    'ImplRegistry',
+]
+
+
+class Implementation:
+    """A class for a single implementation of one or more benchmarked
+       functions.
+
+       The source is None for the default SiFive implementation.  If lmul is
+       true the source uses the LMUL macro, so is built for each LMUL."""
+
+    def __init__(self, name, bmlist, source, func, lmul):
+        """Constructor just records the details."""
+        self.name = name
+        self.bmlist = bmlist
+        self.source = source
+        self.func = func
+        self.lmul = lmul
+
+    def supports(self, bm):
+        """Does this implement the benchmark?  The default implementation
+           covers every benchmark."""
+        return self.bmlist is None or bm in self.bmlist
+
+    def make_args(self):
+        """The arguments to make to build with this implementation."""
+        if self.source is None:
+            return ''
+        return f'IMPLSRC={self.source} IMPLFUNC={self.func}'
+
+
+class ImplRegistry:
+    """A class for all the known implementations.
+
+       The built in implementations are those of memcpy-benchmarks, with
+       sources relative to the tooling directory.  Users may register more
+       with --impl-def."""
+
+    DEFAULT = 'sifive'
+
+    # Name : (benchmarks, source, function, uses LMUL)
+    BUILTIN = {
+        'smemcpy' : (['memcpy'], 'memcpy-benchmarks/smemcpy.c', 'smemcpy',
+                     False),
+        'vmemcpy' : (['memcpy'], 'memcpy-benchmarks/vmemcpy.S', 'vmemcpy',
+                     True),
+        'bionic'  : (['memcpy'], 'memcpy-benchmarks/bionic_memcpy.S',
+                     'bionic_memcpy', True),
+    }
+
+    def __init__(self, args):
+        """Constructor registers the default, built in and user defined
+           implementations."""
+        self._impls = {
+            ImplRegistry.DEFAULT : Implementation(ImplRegistry.DEFAULT, None,
+                                                  None, None, True)}
+        tooldir = args.get('tooldir')
+        for name, (bmlist, src, func, lmul) in ImplRegistry.BUILTIN.items():
+            self._impls[name] = Implementation(
+                name, bmlist, os.path.join(tooldir, src), func, lmul)
+        for name, (bmlist, src, func, lmul) in args.get('impl_defs').items():
+            self._impls[name] = Implementation(
+                name, bmlist, os.path.abspath(src), func, lmul)
+
+    def get(self, name):
+        """The implementation with the given name."""
+        return self._impls[name]
+
+    def names(self):
+        """The names of all the implementations."""
+        return list(self._impls)
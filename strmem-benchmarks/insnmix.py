@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# Guest instruction mix
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to count the guest instructions executed in each class, and to
+attribute the time taken to each class.
+
+We do not need a special plugin.  QEMU's "in_asm" log gives the instructions
+in each translation block, and its "exec" log, with chaining of blocks
+disabled, records every block executed.  Together they give the dynamic count
+of every instruction.  This is slow, so is only done for a few iterations.
+
+The mix for each model is stored as NumPy arrays in
+mix/<commit>-<benchmark>-<configuration>.npz in the results directory, with
+the sizes, the class names and the instructions in each class per iteration
+for each size.
+
+The cost of each class is then found by least squares regression of the time
+per iteration against the instructions per iteration in each class, across
+all the sizes and configurations with the same VLEN.
+"""
+
+import csv
+import os
+import os.path
+import re
+
+import numpy as np
+
+# What we export
+
+__all__ = [
+    'InsnMix',
+    'MixAttribution',
+]
+
+
+class InsnMix:
+    """A class to classify RISC-V instructions and count them from QEMU
+       logs."""
+
+    CLASSES = ['vsetvl', 'vector load/store', 'vector arith', 'branch',
+               'scalar']
+
+    # The QEMU debug options to log translation and execution of every block
+    QEMU_LOG = 'in_asm,exec,nochain'
+
+    # Vector unit stride, strided, indexed, whole register, mask and segment
+    # loads and stores
+    _VLDST_RE = re.compile(
+        r'^v[ls](s?seg\d+e\d+|[uo]xseg\d+ei\d+|s?e\d+|[uo]xei\d+|\d+re?\d*'
+        r'|m)(ff)?\.v$')
+    _BRANCHES = {'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu', 'beqz', 'bnez',
+                 'blez', 'bgez', 'bltz', 'bgtz', 'bgt', 'ble', 'bgtu', 'bleu',
+                 'j', 'jal', 'jr', 'jalr', 'ret'}
+
+    # Regular expressions for parsing the QEMU log
+    _INSN_RE = re.compile(r'^0x([0-9a-f]+):\s+[0-9a-f]+\s+(\S+)')
+    _EXEC_RE = re.compile(r'^Trace \d+: \S+ \[[0-9a-f]+/([0-9a-f]+)/')
+
+    @staticmethod
+    def classify(mnemonic):
+        """The index of the class of an instruction."""
+        mnemonic = mnemonic.lower()
+        if mnemonic.startswith('c.'):
+            mnemonic = mnemonic[2:]
+        if mnemonic in ('vsetvli', 'vsetivli', 'vsetvl'):
+            cls = 'vsetvl'
+        elif InsnMix._VLDST_RE.match(mnemonic):
+            cls = 'vector load/store'
+        elif mnemonic.startswith('v'):
+            cls = 'vector arith'
+        elif mnemonic in InsnMix._BRANCHES:
+            cls = 'branch'
+        else:
+            cls = 'scalar'
+        return InsnMix.CLASSES.index(cls)
+
+    @staticmethod
+    def count(lines):
+        """Count the instructions executed in each class from the lines of a
+           QEMU log.  Return an array of the count for each class."""
+        blocks = {}
+        execs = {}
+        tbpc = None
+        for line in lines:
+            if line.startswith('Trace '):
+                m = InsnMix._EXEC_RE.match(line)
+                if m:
+                    pc = int(m.group(1), 16)
+                    execs[pc] = execs.get(pc, 0) + 1
+                tbpc = None
+                continue
+            if line.startswith('IN:'):
+                tbpc = None
+                continue
+            m = InsnMix._INSN_RE.match(line)
+            if not m:
+                continue
+            pc = int(m.group(1), 16)
+            if tbpc is None:
+                tbpc = pc
+                # A block may be retranslated.  The instructions are the
+                # same, so we just keep the first.
+                if tbpc in blocks:
+                    tbpc = -1
+                else:
+                    blocks[tbpc] = np.zeros(len(InsnMix.CLASSES))
+            if tbpc >= 0:
+                blocks[tbpc][InsnMix.classify(m.group(2))] += 1
+
+        res = np.zeros(len(InsnMix.CLASSES))
+        for pc, n in execs.items():
+            if pc in blocks:
+                res += n * blocks[pc]
+        return res
+
+    @staticmethod
+    def read(filename):
+        """Count the instructions in each class from a QEMU log file."""
+        with open(filename, 'r', encoding='utf-8', errors='replace') as fh:
+            return InsnMix.count(fh)
+
+    @staticmethod
+    def mixfile(resdir, suffix):
+        """The file holding the mix for a model."""
+        return os.path.join(resdir, 'mix', suffix + '.npz')
+
+    @staticmethod
+    def save(filename, mix):
+        """Save the mix, a dictionary indexed by size of the array of
+           instructions per iteration in each class."""
+        sizes = sorted(mix)
+        counts = np.array([mix[sz] for sz in sizes], dtype=np.float64)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        np.savez_compressed(filename, sizes=np.array(sizes, dtype=np.int64),
+                            classes=np.array(InsnMix.CLASSES),
+                            counts=counts.reshape(len(sizes),
+                                                  len(InsnMix.CLASSES)))
+
+    @staticmethod
+    def load(filename):
+        """Load a mix.  Return a dictionary indexed by size of the array of
+           instructions per iteration in each class."""
+        with np.load(filename) as data:
+            if list(data['classes']) != InsnMix.CLASSES:
+                raise ValueError('instruction classes do not match')
+            return {int(sz): row
+                    for sz, row in zip(data['sizes'], data['counts'])}
+
+
+class MixAttribution:
+    """A class to attribute the time per iteration to each instruction
+       class.
+
+       For each commit, benchmark and VLEN we fit the time per iteration as
+       the sum over classes of the instructions per iteration in that class
+       times a cost per instruction for that class.  Every size and every
+       configuration with that VLEN is a point.  Classes never executed are
+       left out of the fit."""
+
+    HEADER = ['Commit', 'Benchmark', 'VLEN', 'Points', 'R2'] \
+        + [f'{c} ns/insn' for c in InsnMix.CLASSES]
+
+    def __init__(self, conflist, args, log):
+        """Constructor loads the mixes and times and does the fits."""
+        self._args = args
+        self._log = log
+        self._conflist = conflist
+        self.fits = {}
+        self._points = {}
+        self._load()
+        self._fit()
+
+    def _times(self, resfile):
+        """The time per iteration in ns for each size from a results
+           file."""
+        res = {}
+        with open(resfile, 'r', newline='', encoding='utf-8') as csvf:
+            for row in csv.DictReader(csvf, dialect=csv.unix_dialect):
+                res[int(row['Size'])] = float(row['s/Miter']) * 1000.0
+        return res
+
+    def _load(self):
+        """Load the mix and time for every point, grouped by commit,
+           benchmark and VLEN."""
+        resdir = self._args.get('resdir')
+        for cmt in self._args.get('qemulist'):
+            for bm in self._args.get('bmlist'):
+                for conf in self._conflist:
+                    suffix = f'{cmt}-{bm}-{conf}'
+                    mixf = InsnMix.mixfile(resdir, suffix)
+                    if not os.path.exists(mixf):
+                        continue
+                    try:
+                        mix = InsnMix.load(mixf)
+                        times = self._times(
+                            os.path.join(resdir, suffix + '.csv'))
+                    except Exception as e:
+                        ename = type(e).__name__
+                        self._log.warning(
+                            f'Warning: Unable to read mix for {suffix}: '
+                            f'{ename}')
+                        continue
+                    key = (cmt, bm, conf.split('-')[0])
+                    pts = self._points.setdefault(key, ([], []))
+                    for sz, counts in mix.items():
+                        if sz in times:
+                            pts[0].append(counts)
+                            pts[1].append(times[sz])
+
+    def _fit(self):
+        """Least squares fit of the cost per instruction of each class for
+           each group of points.  Costs of classes not executed are NaN."""
+        for key, (counts, times) in self._points.items():
+            x = np.array(counts)
+            y = np.array(times)
+            used = np.any(x > 0.0, axis=0)
+            if len(y) < np.count_nonzero(used) or not np.any(used):
+                continue
+            coef = np.full(len(InsnMix.CLASSES), np.nan)
+            coef[used] = np.linalg.lstsq(x[:, used], y, rcond=None)[0]
+            pred = x[:, used] @ coef[used]
+            sst = float(np.sum((y - np.mean(y)) ** 2))
+            sse = float(np.sum((y - pred) ** 2))
+            r2 = 1.0 - sse / sst if sst > 0.0 else None
+            self.fits[key] = (len(y), r2, coef, np.mean(x, axis=0))
+
+    def rows(self):
+        """The fits as a list of tuples of commit, benchmark, VLEN, points,
+           R2 and the cost of each class in ns per instruction, None if not
+           known."""
+        res = []
+        for (cmt, bm, vlen), (npts, r2, coef, _) in self.fits.items():
+            res.append((cmt, bm, vlen, npts, r2)
+                       + tuple(None if np.isnan(c) else float(c)
+                               for c in coef))
+        return res
+
+    def changes(self, base, cmt, bm, vlen):
+        """The change in time per iteration versus the base commit
+           attributed to each class, at the mean instructions per iteration
+           of the commit.  None if we cannot tell."""
+        if (base, bm, vlen) not in self.fits \
+           or (cmt, bm, vlen) not in self.fits:
+            return None
+        base_coef = self.fits[(base, bm, vlen)][2]
+        _, _, coef, mean = self.fits[(cmt, bm, vlen)]
+        return [None if np.isnan(c) or np.isnan(b) else float((c - b) * m)
+                for c, b, m in zip(coef, base_coef, mean)]
+
+    def export_csv(self, csvfile):
+        """Export the fits to a CSV file."""
+        with open(csvfile, 'w', newline='', encoding="utf-8") as csvf:
+            csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+            csvwriter.writerow(MixAttribution.HEADER)
+            for row in self.rows():
+                csvwriter.writerow(['' if v is None else v for v in row])
+        self._log.info(f'Instruction mix costs in {csvfile}')
+
+    def write_markdown(self, fh):
+        """Write the costs of each class, and the change versus the baseline
+           commit attributed to each class, as Markdown tables."""
+        classes = InsnMix.CLASSES
+        fh.write('| Commit | Benchmark | VLEN | Points | R2 | '
+                 + ' | '.join(classes) + ' |\n')
+        fh.write('|:--|:--|:--|--:|--:|' + '--:|' * len(classes) + '\n')
+        for row in self.rows():
+            cmt, bm, vlen, npts, r2 = row[:5]
+            r2str = '-' if r2 is None else f'{r2:.3f}'
+            cols = ['-' if c is None else f'{c:.3f}' for c in row[5:]]
+            fh.write(f'| {cmt} | {bm} | {vlen} | {npts} | {r2str} | '
+                     + ' | '.join(cols) + ' |\n')
+        fh.write('\n')
+
+        cmtlist = self._args.get('qemulist')
+        lines = []
+        for cmt in cmtlist[1:]:
+            for (c, bm, vlen) in self.fits:
+                if c != cmt:
+                    continue
+                delta = self.changes(cmtlist[0], cmt, bm, vlen)
+                if delta is None:
+                    continue
+                cols = ['-' if d is None else f'{d:+.2f}' for d in delta]
+                lines.append(f'| {cmt} | {bm} | {vlen} | '
+                             + ' | '.join(cols) + ' |\n')
+        if not lines:
+            return
+        fh.write(f'Change in ns per iteration versus {cmtlist[0]} '
+                 'attributed to each class.\n\n')
+        fh.write('| Commit | Benchmark | VLEN | ' + ' | '.join(classes)
+                 + ' |\n')
+        fh.write('|:--|:--|:--|' + '--:|' * len(classes) + '\n')
+        for line in lines:
+            fh.write(line)
+        fh.write('\n')
@@ -15,6 +15,7 @@ the results.
 
 import concurrent.futures
 import csv
+import fnmatch
 import os
 import os.path
 import re
@@ -23,12 +24,26 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
+
+from hostenv import HostFingerprint
+from hostenv import Sentinel
+from implementations import ImplRegistry
+from insnmix import InsnMix
+from perfstat import PerfStat
+from profiling import HostProfile
+from provenance import Provenance
+from provenance import ResultsArchive
+from telemetry import Telemetry
+from tracing import Tracer
+from tracing import traced
 
 # What we export
 
 __all__ = [
     'Model',
     'ModelSet',
+    'NativeModel',
 ]
 
 class Model:
@@ -37,19 +52,20 @@ class Model:
        The configuration is defined by a tuple of the following
        - the QEMU commit being used
        - the benchmark
-       - the configuration (VLEN or stdlib)
+       - the configuration (VLEN or stdlib, the LMUL of the vector code, the
+         implementation of the vector code, the placement of the data
+         buffers and optionally a named set of QEMU runtime options)
 
        That configuration is then run as a single job for all the data sizes
        specified.  The point being that the benchmark must be built for the
-       configuration and stdlib, but the size (and the VLEN if given) is a
-       dynamic argument to the program, not requiring a rebuild of the
-       benchmark.
+       configuration and stdlib, but the size (and the VLEN, buffer placement
+       and QEMU options if given) is a dynamic argument to the program, not
+       requiring a rebuild of the benchmark.
 
-       Note however that because we treat QEMU commit and VLEN as part of the
-       conf, we potentially may build multiple benchmark identical
-       executables, if we have different VLENs.  We consider this to be mostly
-       not the case, and if it does, the time taken to build a configuration
-       is very small, so the duplication is not expensive."""
+       So models which differ only in QEMU commit, VLEN or QEMU options share
+       a build directory and executable, identified by the build key, and
+       ModelSet builds each only once.  LMUL and implementation are part of
+       the build key, since they determine the vector code linked."""
 
     # Tables of baseline iterations
     BASELINE_ITERS = { 'memchr'  :   300000,
@@ -81,27 +97,93 @@ class Model:
                              'strncpy' :  400000,
                              'strnlen' :  500000, }
 
-    def __init__(self, qb, bm, vlen, args, log):
+    @staticmethod
+    def confname(vlen, lmul, optname, placement='', impl=''):
+        """The name of a configuration.  The LMUL is only included if it is
+           not the default of 1 and the vector code is used, and the
+           implementation, placement and option set names only if they are
+           not the default, so existing configuration names are
+           unchanged."""
+        conf = vlen
+        if vlen != 'stdlib' and lmul != '1':
+            conf += '-m' + lmul
+        if vlen != 'stdlib' and impl:
+            conf += '-' + impl
+        if placement:
+            conf += '-' + placement
+        if optname:
+            conf += '-' + optname
+        return conf
+
+    def __init__(self, qb, bm, vlen, args, log, lmul='1', optset=None,
+                 placement=None, impl=None, fresh=True):
         """Constructor for the builder, which just records the configuration
-           and creates the various files and directories."""
+           and creates the various files and directories.  If given, optset
+           is a tuple of the name, additional CPU properties and additional
+           arguments for QEMU, placement is a tuple of the name, the
+           placement of the buffers and the source and destination offsets,
+           and impl is the Implementation of the vector code.  Unless fresh,
+           the existing build and results directories are used as they
+           are."""
         self._qb = qb
-        self._cmt = qb.cmt
-        self._qemuplugin = qb.qemuplugin
+        if qb:
+            self._cmt = qb.cmt
+            self._qemuplugin = qb.qemuplugin
+        else:
+            self._cmt = NativeModel.CMT
+            self._qemuplugin = None
         self._bm = bm
+        self.bm = bm
         self._args = args
         self._log = log
+        self._tracer = Tracer(args)
         self._vlen = vlen
-        self.suffix = self._cmt + '-' + bm + '-' + vlen
+        self._lmul = lmul
+        if optset:
+            self._optname, self._cpuprops, self._qemuargs = optset
+        else:
+            self._optname, self._cpuprops, self._qemuargs = ('', '', '')
+        if placement:
+            self._placename, place, src_off, dst_off = placement
+            self._bmargs = f' {place} {src_off} {dst_off}'
+        else:
+            self._placename = ''
+            self._bmargs = ''
+        if impl and impl.name != ImplRegistry.DEFAULT:
+            self._impl = impl
+        else:
+            self._impl = None
+        self._implname = self._impl.name if self._impl else ''
+        self.conf = Model.confname(vlen, lmul, self._optname,
+                                   self._placename, self._implname)
+        self.suffix = self._cmt + '-' + bm + '-' + self.conf
+        self.buildkey = self._buildkey()
         self.builddir = os.path.join(args.get('strmemdir'), 'build',
-                                     'bd-' + self.suffix)
+                                     'bd-' + self.buildkey)
         self._bmexe = os.path.join(
             self.builddir, 'benchmark-' + self._bm + '.exe')
         self._resdir = self._args.get('resdir')
         self._resfile = os.path.join(self._resdir, self.suffix + '.csv')
         self.buildok = False
         self.results = {}
-        self._setup()
+        self.reused = {}
+        self.mix = {}
+        self.perfstat = None
+        self.telemetry = None
+        if fresh:
+            self._setup()
+
+    def _buildkey(self):
+        """The name identifying the executable for this model, which may be
+           shared with other models."""
+        if self._vlen == 'stdlib':
+            return self._bm + '-stdlib'
+        key = self._bm + '-vector-m' + self._lmul
+        if self._impl:
+            key += '-' + self._impl.name
+        return key
 
+    @traced('setup')
     def _setup(self):
         """Ensure we have clean build and results directories for this
            configuration.  Delete the directory and then make a copy of the
@@ -137,22 +219,38 @@ class Model:
                 f'ERROR: Unable to create {self.builddir}: {ename}')
             sys.exit(1)
 
+    def _build_cmd(self, verify_flag):
+        """The command to build the executable for this configuration."""
+        sfsrc=self._args.get('sifivesrcdir')
+        if self._vlen == 'stdlib':
+            stdlibflag = '-DSTANDARD_LIB'
+        else:
+            stdlibflag = ''
+        implargs = self._impl.make_args() + ' ' if self._impl else ''
+        return f'make SIFIVESRCDIR={sfsrc} BENCHMARK={self._bm} ' + \
+            f'LMUL={self._lmul} {implargs}' + \
+            f'EXTRA_DEFS="{stdlibflag} {verify_flag}"'
+
+    def _emit(self, phase, ok, start, **fields):
+        """Emit a telemetry event for a point completing or failing, if we
+           have telemetry."""
+        if self.telemetry:
+            self.telemetry.emit('point' if ok else 'point_failed',
+                                phase=phase, config=self.suffix,
+                                duration=time.time() - start, **fields)
+
+    @traced('task')
     def build(self):
         """Build the executables for this configuration.  Return true on
            success."""
         self._log.debug(f'DEBUG: Building {self.suffix}')
+        start = time.time()
         if self._args.get('verify'):
             verify_flag='-DVERIF'
         else:
             verify_flag=''
 
-        sfsrc=self._args.get('sifivesrcdir')
-        if self._vlen == 'stdlib':
-            stdlibflag = '-DSTANDARD_LIB'
-        else:
-            stdlibflag = ''
-        cmd = f'make SIFIVESRCDIR={sfsrc} BENCHMARK={self._bm} ' + \
-                  f'EXTRA_DEFS="{stdlibflag} {verify_flag}"'
+        cmd = self._build_cmd(verify_flag)
         self._log.debug(f'DEBUG: Build command for {self.suffix} is {cmd}')
         try:
             res = subprocess.run(
@@ -183,6 +281,7 @@ class Model:
             self._log.debug(res.stdout.decode('utf-8'))
             self.buildok = True
 
+        self._emit('build', self.buildok, start, buildkey=self.buildkey)
         return self.buildok
 
     def _read_icount(self, filename):
@@ -206,37 +305,42 @@ class Model:
 
         return icnt
 
-    def _qemu_res (self, usage_start, usage_end, cntf):
-        """Compute the result tuple from a usage run."""
+    def _qemu_res (self, usage_start, usage_end, cntf, perff):
+        """Compute the result tuple from a usage run.  The last element is a
+           dictionary of any additional results, such as host counters from
+           perff if that is not None."""
         usr_time = usage_end.ru_utime - usage_start.ru_utime
         sys_time = usage_end.ru_stime - usage_start.ru_stime
         tot_time = usr_time + sys_time
-        return (tot_time, self._read_icount(cntf))
-
-    def _run_qemu(self, sz, iters, plt):
-        """Run a single QEMU execution of the executable benchmark. Arguments
-           are data size for the run, interations and plugin type.  Result on
-           success is a tuple (time, icount), where "time" is the sum of user
-           and system time for the child process and icount may be None if
-           plugins are not enabled.  Results on failure is None."""
-        if plt == 'plugin':
+        extra = {}
+        if perff:
             try:
-                tmpf = tempfile.NamedTemporaryFile(
-                    mode='w', prefix='icount-', dir=self._args.get('strmemdir'),
-                    delete=False).name
+                extra.update(PerfStat.read(perff))
             except Exception as e:
-                estr= 'Unable to create temporary file'
                 ename = type(e).__name__
-                confstr = f'self._prefix, size={sz}, iters={iters}'
-                self._log.error(f'ERROR: {estr} for {confstr}: {ename}.')
-                return None
-        else:
-            tmpf = None
+                dmess = f'DEBUG: Unable to read counters for {self.suffix}'
+                self._log.debug(f'{dmess}: {ename}')
+        return (tot_time, self._read_icount(cntf), extra)
 
-        # Add QEMU to path
-        currpath=os.environ['PATH']
-        os.environ['PATH'] = f'{self._qb.installdir[plt]}/bin:{currpath}'
-        usage_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+    def _tmpfile(self, prefix, sz, iters):
+        """Create a temporary file for results of a run.  Return its name, or
+           None on failure."""
+        try:
+            return tempfile.NamedTemporaryFile(
+                mode='w', prefix=prefix, dir=self._args.get('strmemdir'),
+                delete=False).name
+        except Exception as e:
+            estr= 'Unable to create temporary file'
+            ename = type(e).__name__
+            confstr = f'{self.suffix}, size={sz}, iters={iters}'
+            self._log.error(f'ERROR: {estr} for {confstr}: {ename}.')
+            return None
+
+    def _run_cmd(self, sz, iters, plt, tmpf, qemuargs=''):
+        """The command to run the benchmark under QEMU for the given size,
+           iterations and plugin type.  The instruction count is written to
+           tmpf if plugins are used.  Any additional QEMU arguments are given
+           by qemuargs."""
         if self._vlen == 'stdlib':
             vlenarg = '128'
         else:
@@ -246,8 +350,76 @@ class Model:
                 f'--d plugin -plugin {self._qemuplugin},inline=on -D {tmpf}'
         else:
             plgargs = ''
-        cmd = f'qemu-riscv64 -cpu rv64,v=true,vlen={vlenarg} ' + \
-	      f'{plgargs} {self._bmexe} {sz} {iters}'
+        if self._cpuprops:
+            cpuprops = ',' + self._cpuprops
+        else:
+            cpuprops = ''
+        return f'qemu-riscv64 -cpu rv64,v=true,vlen={vlenarg}{cpuprops} ' + \
+            f'{self._qemuargs} {plgargs} {qemuargs} ' + \
+            f'{self._bmexe} {sz} {iters}{self._bmargs}'
+
+    def _read_tbcount(self, filename):
+        """Count the translation blocks in a QEMU in_asm log file."""
+        ntbs = 0
+        with open(filename, 'r', encoding="utf-8", errors='replace') as file:
+            for line in file:
+                if line.startswith('IN:'):
+                    ntbs += 1
+        return ntbs
+
+    @traced('subprocess')
+    def _run_qemu(self, sz, iters, plt, tblog=False, mixlog=False):
+        """Run a single QEMU execution of the executable benchmark. Arguments
+           are data size for the run, interations and plugin type.  Result on
+           success is a tuple (time, icount, extra), where "time" is the sum
+           of user and system time for the child process, icount may be None
+           if plugins are not enabled and extra is a dictionary of any
+           additional results.  Results on failure is None.
+
+           If we are collecting host counters, the timing (no plugin) run is
+           wrapped with perf stat.  The small overhead of perf itself is
+           removed by the warmup subtraction.
+
+           If tblog is True, QEMU logs every block it translates, and the
+           number of translation blocks is in extra as "TBs".
+
+           If mixlog is True, QEMU logs every block it translates and
+           executes, and the array of instructions executed in each class is
+           in extra as "Mix"."""
+        if plt == 'plugin':
+            tmpf = self._tmpfile('icount-', sz, iters)
+            if not tmpf:
+                return None
+        else:
+            tmpf = None
+        if tblog:
+            tblogf = self._tmpfile('tblog-', sz, iters)
+            if not tblogf:
+                return None
+            qemuargs = f'-d in_asm -D {tblogf}'
+        elif mixlog:
+            tblogf = self._tmpfile('mixlog-', sz, iters)
+            if not tblogf:
+                return None
+            qemuargs = f'-d {InsnMix.QEMU_LOG} -D {tblogf}'
+        else:
+            tblogf = None
+            qemuargs = ''
+        if plt == 'no-plugin' and self.perfstat and not tblogf:
+            perff = self._tmpfile('perf-', sz, iters)
+            if not perff:
+                return None
+        else:
+            perff = None
+
+        # Add QEMU to path
+        currpath=os.environ['PATH']
+        if self._qb:
+            os.environ['PATH'] = f'{self._qb.installdir[plt]}/bin:{currpath}'
+        usage_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cmd = self._run_cmd(sz, iters, plt, tmpf, qemuargs)
+        if perff:
+            cmd = self.perfstat.wrap(cmd, perff)
         try:
             subprocess.run(
                 cmd,
@@ -277,124 +449,630 @@ class Model:
             return None
         else:
             usage_end = resource.getrusage(resource.RUSAGE_CHILDREN)
-            return self._qemu_res(usage_start, usage_end, tmpf)
+            res = self._qemu_res(usage_start, usage_end, tmpf, perff)
+            if tblog:
+                res[2]['TBs'] = self._read_tbcount(tblogf)
+            elif mixlog:
+                res[2]['Mix'] = InsnMix.read(tblogf)
+            return res
         finally:
-            if tmpf:
-                try:
-                    os.environ['PATH'] = f'{currpath}'
-                    os.remove(tmpf)
-                except Exception as e:
-                    self._log.debug('Debug: Unable to delete temporary {tmpf}')
+            os.environ['PATH'] = f'{currpath}'
+            for f in [tmpf, perff, tblogf]:
+                if f:
+                    try:
+                        os.remove(f)
+                    except Exception as e:
+                        self._log.debug(
+                            f'Debug: Unable to delete temporary {f}')
 
     def _run_one(self, sz, iters, plt):
         """Run the benchmark under QEMU for a single size.  The plt argument
            indicates whether to use QEMU with plugins enabled. We do a warmup
            run and then a full run, and subtract the two to remove overhead.
-           Return a tuple of (iters, time, icount) on success, or None on
-           failure. icount will be None if we do not have plugins"""
+           Return a tuple of (iters, time, icount, extra) on success, or None
+           on failure. icount will be None if we do not have plugins.  Any
+           numeric additional results in extra are also subtracted."""
         warmup_iters = self._args.get('warmup')
         tot_iters = warmup_iters + iters
         res_warmup = self._run_qemu(sz, warmup_iters, plt)
         if not res_warmup:
             return None
 
-        t_warmup, icnt_warmup = res_warmup
+        t_warmup, icnt_warmup, extra_warmup = res_warmup
         res_tot = self._run_qemu(sz, tot_iters, plt)
         if not res_tot:
             return None
 
-        t_tot, icnt_tot = res_tot
+        t_tot, icnt_tot, extra_tot = res_tot
 
         if plt == 'plugin':
             icnt_res = icnt_tot - icnt_warmup
         else:
             icnt_res = None
-        return (iters, t_tot - t_warmup, icnt_res)
+        extra = {}
+        for k, v in extra_tot.items():
+            if v is None or extra_warmup.get(k) is None:
+                extra[k] = None
+            else:
+                extra[k] = v - extra_warmup[k]
+        return (iters, t_tot - t_warmup, icnt_res, extra)
 
     def _run_one_full(self, sz, iters):
         """Run the benchmark under QEMU for a single size, obtaining iteration
            count using the plugin and timing using no plugin.  Return a tuple
-           of iterations, time and icount or None on failure."""
+           of iterations, time, icount and a dictionary of additional results
+           or None on failure."""
         res = self._run_one(sz, iters, 'plugin')
         if not res:
             return None
 
         iters = res[0]
         icnt = res[2]
+        extra = dict(res[3])
 
         res = self._run_one(sz, iters, 'no-plugin')
         if not res:
             return None
 
         time = res[1]
-        return (iters, time, icnt)
+        extra.update(res[3])
+        return (iters, time, icnt, extra)
+
+    def _translation(self, sz, res):
+        """Separate the cost of translation from the cost of execution for a
+           single size, given the result of the main run for that size.
+
+           We time a run with no iterations, which is QEMU startup and the
+           translation of the wrapper setup code, and a run with one
+           iteration, which also translates the code for the function.  Taking
+           the steady state execution time of one iteration from the
+           difference leaves the translation time.  Each is the fastest of
+           several runs to reduce noise.  The translation blocks involved come
+           from QEMU's in_asm log for the same two runs.  Return a dictionary
+           of the additional results, or None on failure."""
+        t_start = None
+        t_cold = None
+        for _ in range(self._args.get('xlate_repeats')):
+            res_start = self._run_qemu(sz, 0, 'no-plugin')
+            res_cold = self._run_qemu(sz, 1, 'no-plugin')
+            if not res_start or not res_cold:
+                return None
+            if t_start is None or res_start[0] < t_start:
+                t_start = res_start[0]
+            if t_cold is None or res_cold[0] < t_cold:
+                t_cold = res_cold[0]
+
+        res_start = self._run_qemu(sz, 0, 'no-plugin', tblog=True)
+        res_cold = self._run_qemu(sz, 1, 'no-plugin', tblog=True)
+        if not res_start or not res_cold:
+            return None
+
+        ntbs = res_cold[2]['TBs'] - res_start[2]['TBs']
+        t_exec = float(res[1]) / float(res[0])
+        t_xlate = max(0.0, t_cold - t_start - t_exec)
+        if ntbs > 0:
+            nspt = t_xlate * 1000000000.0 / float(ntbs)
+        else:
+            nspt = None
+        return {'Startup time' : t_start, 'TBs' : ntbs,
+                'Xlate time' : t_xlate, 'ns/TB' : nspt}
 
+    def _insn_mix(self, sz):
+        """The instructions per iteration in each class for a single size.
+           Logging every block executed is slow, so we use just a few
+           iterations, and subtract a warmup run as for timing.  Return an
+           array of the count for each class, or None on failure."""
+        warmup_iters = self._args.get('warmup')
+        iters = self._args.get('insn_mix_iters')
+        res_warmup = self._run_qemu(sz, warmup_iters, 'no-plugin',
+                                    mixlog=True)
+        if not res_warmup:
+            return None
+        res_tot = self._run_qemu(sz, warmup_iters + iters, 'no-plugin',
+                                 mixlog=True)
+        if not res_tot:
+            return None
+        return (res_tot[2]['Mix'] - res_warmup[2]['Mix']) / float(iters)
+
+    def _save_mix(self):
+        """Save the instruction mix for all sizes, if we have it."""
+        if not self.mix:
+            return
+        mixf = InsnMix.mixfile(self._resdir, self.suffix)
+        try:
+            InsnMix.save(mixf, self.mix)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to save {mixf}: {ename}')
+
+    @traced('task')
     def run(self):
         """Run the models for all the different sizes.  Return the list of
            results on success, None on failure."""
         self._log.debug(f'DEBUG: Running {self.suffix}: {self.buildok}')
+        if self.telemetry:
+            self.telemetry.emit('task_start', phase='run', config=self.suffix)
         if not self.buildok:
             self._log.debug(f'DEBUG: No build to run {self.suffix}')
             return None
 
-        # Mark progress as successful and get the baseline icount and timing
+        # With a fixed byte budget there is no calibration.
         sizelist = self._args.get('sizelist')
+        nbytes = self._args.get('iter_bytes')
+        if nbytes:
+            for sz in sizelist:
+                if sz in self.reused:
+                    self._reuse_size(sz)
+                    continue
+                iters = HostProfile.iterations(sz, nbytes)
+                if not self._run_size(sz, iters):
+                    return None
+            self._save_mix()
+            return self.results
+
+        # Mark progress as successful and get the baseline icount and
+        # timing.  A reused point calibrates just as well as a new one.
         prev_sz = sizelist[0]
-        if self._args.get('verify'):
-            iters = Model.BASELINE_ITERS[self._bm]
+        if prev_sz in self.reused:
+            res = self.reused[prev_sz]
         else:
-            iters = Model.BASELINE_VERIF_ITERS[self._bm]
-        res = self._run_one_full(prev_sz, iters)
-        if not res:
-            return None
+            if self._args.get('verify'):
+                iters = Model.BASELINE_ITERS[self._bm]
+            else:
+                iters = Model.BASELINE_VERIF_ITERS[self._bm]
+            res = self._run_one_full(prev_sz, iters)
+            if not res:
+                return None
 
         target_t = float(self._args.get('target_time'))
+        iters = res[0]
         prev_t = res[1]
 
         for sz in sizelist:
-            iters = int(float(iters) * prev_sz / float(sz) * target_t / prev_t)
-            res = self._run_one_full(sz, iters)
-            if not res:
-                return None
-            self.results[sz] = res
+            if sz in self.reused:
+                res = self._reuse_size(sz)
+            else:
+                iters = int(float(iters) * prev_sz / float(sz) * target_t
+                            / prev_t)
+                res = self._run_size(sz, iters)
+                if not res:
+                    return None
+            iters = res[0]
             prev_t = res[1]
             prev_sz = float(sz)
 
+        self._save_mix()
         return self.results
 
+    @traced('point')
+    def _run_size(self, sz, iters, phase='run'):
+        """Run a single size for the given iterations, adding it to the
+           results.  Return the result or None on failure.  When a point is
+           measured again, the phase is "requeue", and the instruction mix,
+           which does not depend on the host, is not measured again."""
+        start = time.time()
+        res = self._run_one_full(sz, iters)
+        if not res:
+            self._emit(phase, False, start, size=sz, iters=iters)
+            return None
+        if self._args.get('xlate'):
+            xlate = self._translation(sz, res)
+            if xlate:
+                res[3].update(xlate)
+        if self._args.get('insn_mix') and phase == 'run':
+            mix = self._insn_mix(sz)
+            if mix is not None:
+                self.mix[sz] = mix
+        self.results[sz] = res
+        self._emit(phase, True, start, size=sz, iters=res[0], time=res[1],
+                   icount=res[2])
+        return res
+
+    def _reuse_size(self, sz):
+        """Use the result reused from an earlier campaign for a single size.
+           Return the result."""
+        res = self.reused[sz]
+        self.results[sz] = res
+        if self.telemetry:
+            self.telemetry.emit('point_reused', phase='run',
+                                config=self.suffix, size=sz)
+        return res
+
+    def prov_key(self, host_digest):
+        """The key identifying what was measured for this model, for
+           deciding if results can be reused.  This is the hash of the
+           executable, the QEMU build fingerprint, the host fingerprint
+           digest and a digest of the parameters of the run."""
+        params = {k: self._args.get(k) for k in Provenance.PARAMS}
+        params['cpuprops'] = self._cpuprops
+        params['qemuargs'] = self._qemuargs
+        params['bmargs'] = self._bmargs
+        return {'exe' : Provenance.file_digest(self._bmexe),
+                'qemu' : self._qb.fingerprint() if self._qb else None,
+                'host' : host_digest,
+                'params' : Provenance.digest(params)}
+
+    def load_csv(self):
+        """Load our results from an earlier run from our CSV file.  Return
+           true if there were any."""
+        try:
+            self.results = ResultsArchive.read(self._resfile)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(
+                f'Warning: Unable to read {self._resfile}: {ename}')
+            return False
+        self.buildok = os.path.exists(self._bmexe)
+        return bool(self.results)
+
+    @traced('task')
+    def rerun(self, sizes, repeats):
+        """Measure the given sizes again, with the iterations of their
+           existing results, repeating each measurement and taking the one
+           with the median time.  Return a dictionary indexed by size of the
+           new results, with the number of repetitions and the spread of
+           their times relative to the median as additional results."""
+        if self.telemetry:
+            self.telemetry.emit('task_start', phase='rerun',
+                                config=self.suffix)
+        res = {}
+        for sz in sizes:
+            runs = []
+            for _ in range(repeats):
+                r = self._run_size(sz, self.results[sz][0], 'rerun')
+                if r:
+                    runs.append(r)
+            if not runs:
+                continue
+            runs.sort(key=lambda r: r[1])
+            median = runs[len(runs) // 2]
+            median[3]['Repeats'] = len(runs)
+            if median[1] > 0.0:
+                median[3]['Spread'] = (runs[-1][1] - runs[0][1]) / median[1]
+            res[sz] = median
+        return res
+
+    @traced('task')
+    def remeasure(self, sizes):
+        """Measure the given sizes again, with the same iterations as before.
+           Return a dictionary indexed by size of the new results."""
+        if self.telemetry:
+            self.telemetry.emit('task_start', phase='requeue',
+                                config=self.suffix)
+        res = {}
+        for sz in sizes:
+            r = self._run_size(sz, self.results[sz][0], 'requeue')
+            if r:
+                res[sz] = r
+        return res
+
+    @traced('subprocess')
+    def _run_profile_cmd(self, cmd, what, timeout):
+        """Run one of the perf commands for profiling.  Return the result on
+           success or None on failure."""
+        try:
+            res = subprocess.run(
+                cmd,
+                shell=True,
+                executable='/bin/bash',
+                cwd=self.builddir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+                check=True,
+                )
+        except subprocess.TimeoutExpired as e:
+            self._log.warning(f'Warning: {what} timed out.')
+            self._log.debug(e.cmd)
+            self._log.debug(e.stderr)
+            return None
+        except subprocess.CalledProcessError as e:
+            self._log.warning(f'Warning: {what} failed.')
+            self._log.debug(e.cmd)
+            self._log.debug(e.stderr)
+            return None
+        return res
+
+    @traced('task')
+    def profile(self, sz):
+        """Profile the benchmark under QEMU for a single size.  Return the
+           name of the profile CSV file on success, None on failure."""
+        start = time.time()
+        res = self._profile(sz)
+        self._emit('profile', res is not None, start, size=sz)
+        return res
+
+    def _profile(self, sz):
+        """Profile the benchmark under QEMU for a single size with perf
+           record, and save the table of self and children cost for each host
+           symbol, and the folded call stacks.  The number of iterations is
+           set by the byte budget.  Return the name of the profile CSV file on
+           success, None on failure."""
+        if not self.buildok:
+            return None
+        mode = self._args.get('profile_mode')
+        timeout = self._args.get('profile_timeout')
+        iters = HostProfile.iterations(sz, self._args.get('profile_bytes'))
+        what = f'Profile of {self.suffix}, size={sz}, iters={iters}'
+        profdir = os.path.join(self._resdir, 'profiles')
+        csvfile = os.path.join(profdir, f'prof-{self.suffix}-{sz}.csv')
+        foldfile = os.path.join(profdir, f'prof-{self.suffix}-{sz}.folded')
+        try:
+            os.makedirs(profdir, exist_ok=True)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.error(f'ERROR: Unable to create {profdir}: {ename}')
+            return None
+        datafile = self._tmpfile('perfdata-', sz, iters)
+        if not datafile:
+            return None
+        scriptfile = self._tmpfile('perfscript-', sz, iters)
+        if not scriptfile:
+            os.remove(datafile)
+            return None
+
+        # Add QEMU to path
+        currpath=os.environ['PATH']
+        if self._qb:
+            os.environ['PATH'] = \
+                f'{self._qb.installdir["no-plugin"]}/bin:{currpath}'
+        try:
+            cmd = HostProfile.record_cmd(
+                self._run_cmd(sz, iters, 'no-plugin', None), datafile, mode)
+            self._log.debug(f'DEBUG: {what}: {cmd}')
+            if not self._run_profile_cmd(cmd, f'{what} record', timeout):
+                return None
+            res = self._run_profile_cmd(HostProfile.report_cmd(datafile),
+                                        f'{what} report', timeout)
+            if not res:
+                return None
+            event, rows = HostProfile.parse_report(
+                res.stdout.decode('utf-8', errors='replace'))
+            HostProfile.write_csv(csvfile,
+                                  (self._bm, self._vlen, sz, iters, mode),
+                                  event, rows)
+            # Folded stacks are a bonus, so failure is just a warning.
+            if self._run_profile_cmd(
+                    HostProfile.script_cmd(datafile, scriptfile),
+                    f'{what} script', timeout):
+                with open(scriptfile, 'r', encoding='utf-8',
+                          errors='replace') as fh:
+                    HostProfile.write_folded(foldfile, HostProfile.fold(fh))
+            return csvfile
+        finally:
+            os.environ['PATH'] = f'{currpath}'
+            for f in [datafile, scriptfile]:
+                try:
+                    os.remove(f)
+                except Exception as e:
+                    self._log.debug(f'Debug: Unable to delete temporary {f}')
+
+    def _extra_cols(self, icnt, extra):
+        """Any additional columns for a result, in a dictionary indexed by
+           column name."""
+        cols = dict(extra)
+        if self.perfstat:
+            cols.update(PerfStat.derived(extra, icnt))
+        return cols
+
     def export_csv(self):
-        """Export our results to a CSV file."""
+        """Export our results to a CSV file.  Any additional results follow
+           the standard columns, with missing values left empty."""
+        extra_hdr = []
+        for data in self.results.values():
+            for k in self._extra_cols(data[2], data[3]):
+                if k not in extra_hdr:
+                    extra_hdr.append(k)
         with open(self._resfile, 'w', newline='', encoding="utf-8") as csvf:
             csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
             # Write the header
-            csvwriter.writerow(['Benchmark', 'Iterations', 'VLEN', 'Size',
-                                'Icount', 'Time', 'Icnt/iter', 'ns/inst',
-                                's/Miter'])
+            csvwriter.writerow(['Benchmark', 'Iterations', 'VLEN', 'LMUL',
+                                'Implementation', 'Placement', 'Options',
+                                'Size', 'Icount',
+                                'Time', 'Icnt/iter', 'ns/inst', 's/Miter']
+                               + extra_hdr)
             # Write all the elements
             for sz, data in self.results.items():
-                iters, tim, icnt = data
-                icpi = float(icnt) / float(iters)
-                nspi = float(tim) * 1000000000.0 / float(icnt)
+                iters, tim, icnt, extra = data
+                cols = self._extra_cols(icnt, extra)
+                extra_vals = ['' if cols.get(k) is None else cols[k]
+                              for k in extra_hdr]
+                if icnt is None:
+                    icnt = ''
+                    icpi = ''
+                    nspi = ''
+                else:
+                    icpi = float(icnt) / float(iters)
+                    nspi = float(tim) * 1000000000.0 / float(icnt)
                 spmi = float(tim) * 1000000.0 / float(iters)
-                csvwriter.writerow([self._bm, iters, self._vlen, sz, icnt,
-                                    tim, icpi, nspi, spmi])
+                if self._vlen == 'stdlib':
+                    lmul = ''
+                else:
+                    lmul = self._lmul
+                csvwriter.writerow([self._bm, iters, self._vlen, lmul,
+                                    self._implname, self._placename,
+                                    self._optname, sz, icnt, tim, icpi, nspi,
+                                    spmi] + extra_vals)
+
+class NativeModel(Model):
+    """A class to run a single benchmark natively on the host.
+
+       This is the standard library configuration built with the host
+       compiler and run without QEMU, using the same iteration and
+       calibration logic.  It is the baseline against which we measure how
+       much slower QEMU is.  We use the pseudo-commit "native", so results
+       are in native-<benchmark>-stdlib.csv.  There are no instruction
+       counts."""
+
+    CMT = 'native'
+
+    def __init__(self, bm, args, log, fresh=True):
+        """Constructor for a native model of a benchmark."""
+        super().__init__(None, bm, 'stdlib', args, log, fresh=fresh)
+
+    def _buildkey(self):
+        """Native executables are never shared with QEMU models."""
+        return NativeModel.CMT + '-' + self._bm
+
+    def _build_cmd(self, verify_flag):
+        """The command to build the native executable."""
+        hostcc = self._args.get('native_cc')
+        return f'make NATIVE=1 HOSTCC={hostcc} BENCHMARK={self._bm} ' + \
+            f'EXTRA_DEFS="{verify_flag}"'
+
+    def _run_cmd(self, sz, iters, plt, tmpf, qemuargs=''):
+        """The command to run the benchmark natively."""
+        return f'{self._bmexe} {sz} {iters}{self._bmargs}'
+
+    def _translation(self, sz, res):
+        """There is no translation when running natively."""
+        return None
+
+    def _insn_mix(self, sz):
+        """There is no guest instruction mix when running natively."""
+        return None
+
+    def _run_one_full(self, sz, iters):
+        """Run the benchmark natively for a single size.  There is no
+           instruction count.  Return a tuple of iterations, time and None or
+           None on failure."""
+        res = self._run_one(sz, iters, 'no-plugin')
+        if not res:
+            return None
+
+        return (iters, res[1], None, res[3])
 
 class ModelSet:
     """A class for all the model configurations we have to run."""
-    def __init__(self, qemu_builds, args, log):
-        """Constructor just creates all the models"""
+
+    # How many times we measure points again if the host drifted
+    REQUEUES = 2
+
+    @staticmethod
+    def optsets(args):
+        """The QEMU option sets to run for each VLEN.  None is the default
+           set with no additional options."""
+        optsets = [None]
+        for name, opts in args.get('qemu_optsets').items():
+            optsets.append((name,) + tuple(opts))
+        return optsets
+
+    @staticmethod
+    def impls(args, vlen, bm=None):
+        """The implementations of the vector code to run for a VLEN, and if
+           given a benchmark, just those implementing it.  The standard
+           library has no vector code, so just has the default."""
+        registry = ImplRegistry(args)
+        if vlen == 'stdlib':
+            return [registry.get(ImplRegistry.DEFAULT)]
+        return [registry.get(name) for name in args.get('impls')
+                if bm is None or registry.get(name).supports(bm)]
+
+    @staticmethod
+    def lmuls(args, vlen, impl=None):
+        """The LMULs to run for a VLEN and implementation.  The standard
+           library and implementations not using LMUL have no choice of LMUL
+           so it is irrelevant."""
+        if vlen == 'stdlib' or (impl and not impl.lmul):
+            return ['1']
+        return list(args.get('lmullist'))
+
+    @staticmethod
+    def placements(args):
+        """The buffer placements to run.  None is the default of just using
+           malloc."""
+        return [p if p[0] else None for p in args.get('placement_sets')]
+
+    @staticmethod
+    def configs(args, bm=None):
+        """All the configurations to run, as tuples of VLEN, LMUL,
+           implementation, placement and option set.  If given a benchmark,
+           just those configurations which apply to it."""
+        configs = []
+        for vlen in args.get('vlenlist'):
+            for impl in ModelSet.impls(args, vlen, bm):
+                for lmul in ModelSet.lmuls(args, vlen, impl):
+                    for placement in ModelSet.placements(args):
+                        for optset in ModelSet.optsets(args):
+                            configs.append((vlen, lmul, impl, placement,
+                                            optset))
+        return configs
+
+    @staticmethod
+    def conflist(args, bm=None):
+        """The list of configuration names which, together with commit and
+           benchmark, identify each model (and hence each results file).  If
+           given a benchmark, just those which apply to it."""
+        conflist = []
+        for vlen, lmul, impl, placement, optset in ModelSet.configs(args, bm):
+            implname = '' if impl.name == ImplRegistry.DEFAULT else impl.name
+            placename = placement[0] if placement else ''
+            optname = optset[0] if optset else ''
+            conflist.append(Model.confname(vlen, lmul, optname, placename,
+                                           implname))
+        return conflist
+
+    @traced('phase')
+    def __init__(self, qemu_builds, args, log, fresh=True):
+        """Constructor just creates all the models.  Unless fresh, they use
+           the existing build and results directories, for measuring points
+           again."""
         self._qemu_builds = qemu_builds
         self._args = args
         self._log = log
+        self._tracer = Tracer(args)
         self._log.info('Creating all model configurations')
         self._model_list = []
         for qb in qemu_builds:
             for bm in args.get('bmlist'):
-                for vlen in args.get('vlenlist'):
-                    self._model_list.append(Model(qb, bm, vlen, args, log))
+                for vlen, lmul, impl, placement, optset in \
+                        ModelSet.configs(args, bm):
+                    self._model_list.append(
+                        Model(qb, bm, vlen, args, log, lmul=lmul,
+                              optset=optset, placement=placement, impl=impl,
+                              fresh=fresh))
+        if args.get('native'):
+            for bm in args.get('bmlist'):
+                self._model_list.append(NativeModel(bm, args, log,
+                                                    fresh=fresh))
+
+        self._telemetry = Telemetry(args)
+        for m in self._model_list:
+            m.telemetry = self._telemetry
+        self._start = time.time()
+        self._keys = {}
+        self._reused = {}
+
+        # Record the state of the host with the results, unless they were
+        # measured on an earlier run.
+        self.host = HostFingerprint.capture()
+        HostFingerprint.logall(self.host, log)
+        resdir = args.get('resdir')
+        try:
+            if fresh:
+                os.makedirs(resdir, exist_ok=True)
+                HostFingerprint.save(HostFingerprint.hostfile(resdir),
+                                     self.host)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(
+                f'Warning: Unable to save host fingerprint: {ename}')
 
+        # Host counters are optional, and we carry on without them if they
+        # are not available.
+        if args.get('perf_counters'):
+            perfstat = PerfStat(args.get('timeout'))
+            if perfstat.available(log):
+                for m in self._model_list:
+                    m.perfstat = perfstat
+
+    @traced('phase')
     def build(self):
-        """Build all the model configurations concurrently.
+        """Build all the model configurations concurrently.  Models sharing
+           a build key share an executable, so we only build the first of
+           them and copy the result to the others.
 
            An important point to remember is that we invoke these methods in
            their own process, so the model objects will be copied. Any  state
@@ -402,42 +1080,44 @@ class ModelSet:
            the run must return any state necessary and that explicitly placed
            in the model."""
         resf = {}
+        builders = {}
+        for m in self._model_list:
+            builders.setdefault(m.buildkey, m)
         # Launch all the builds
-        self._log.info('Building all model configurations')
+        self._log.info(f'Building {len(builders)} benchmark executables')
         with concurrent.futures.ProcessPoolExecutor() as executor:
-            for m in self._model_list:
+            for m in builders.values():
                 resf[m] = executor.submit (m.build)
 
-        # Collect the results.  We wait in the order that processes were
-        # created, but that should be just fine, since they should all take
-        # roughly the same time.
-        #
-        # Note we don't need to worry about giving a timeout, since that will
-        # be handled by the subprocess calls for each model.
-        successes = 0
-        failures = 0
-        for m, r in resf.items():
-            try:
-                m.buildok = r.result()
-                if m.buildok:
-                    successes += 1
-                else:
-                    failures +=1
-            except Exception as e:
-                emess = 'ERROR: Building model'
-                ename = type(e).__name__
-                self._log.error(f'{emess}: {ename}.')
-                failures += 1
-
-            print('.', end='', flush=True)
+            # Collect the results as they complete, showing progress.
+            #
+            # Note we don't need to worry about giving a timeout, since that
+            # will be handled by the subprocess calls for each model.
+            successes = 0
+            failures = 0
+            for m, r in self._telemetry.as_completed('build', resf,
+                                                     len(resf)):
+                try:
+                    m.buildok = r.result()
+                    if m.buildok:
+                        successes += 1
+                    else:
+                        failures +=1
+                except Exception as e:
+                    emess = 'ERROR: Building model'
+                    ename = type(e).__name__
+                    self._log.error(f'{emess}: {ename}.')
+                    failures += 1
 
-        print()
+        for m in self._model_list:
+            m.buildok = builders[m.buildkey].buildok
         if failures > 0:
             self._log.warning(
-                f'Warning: {failures} model configs failed to build.')
+                f'Warning: {failures} benchmark executables failed to build.')
 
-        self._log.info(f'{successes} model configs built.')
+        self._log.info(f'{successes} benchmark executables built.')
 
+    @traced('phase')
     def run(self):
         """Run all the model configurations concurrently.
 
@@ -449,43 +1129,452 @@ class ModelSet:
         # Launch all the builds
         self._log.info('Running all model configurations')
         resf = {}
-        with concurrent.futures.ProcessPoolExecutor() as executor:
+        self._start = time.time()
+        self._keys = {m.suffix: m.prov_key(HostFingerprint.digest(self.host))
+                      for m in self._model_list if m.buildok}
+        if self._args.get('reuse_baseline'):
+            self._reuse()
+        npoints = len(self._model_list) * len(self._args.get('sizelist')) \
+            - sum(len(m.reused) for m in self._model_list)
+        sentinel = self._sentinel()
+        start = self._start
+        with self._executor(sentinel) as executor:
             for m in self._model_list:
                 resf[m] = executor.submit (m.run)
 
-        # Collect the results.  We wait in the order that processes were
-        # created, but that should be just fine, since they should all take
-        # roughly the same time.
-        #
-        # Note we don't need to worry about giving a timeout, since that will
-        # be handled by the subprocess calls for each model.
-        successes = 0
-        failures = 0
-        for m, r in resf.items():
-            try:
-                m.results = r.result()
-                if m.results:
-                    successes += 1
-                else:
-                    failures +=1
-            except Exception as e:
-                emess = f'ERROR: running model config {m.suffix}'
-                ename = type(e).__name__
-                self._log.error(f'{emess}: {ename}.')
-                failures += 1
+            # Only once all the workers have started, since it changes the
+            # environment while running QEMU.
+            if sentinel:
+                sentinel.start(len(resf))
 
-            print('.', end='', flush=True)
+            # Collect the results as they complete, showing progress.
+            #
+            # Note we don't need to worry about giving a timeout, since that
+            # will be handled by the subprocess calls for each model.
+            successes = 0
+            failures = 0
+            for m, r in self._telemetry.as_completed('run', resf, npoints):
+                if sentinel:
+                    sentinel.task_done()
+                try:
+                    m.results = r.result()
+                    if m.results:
+                        successes += 1
+                    else:
+                        failures +=1
+                except Exception as e:
+                    emess = f'ERROR: running model config {m.suffix}'
+                    ename = type(e).__name__
+                    self._log.error(f'{emess}: {ename}.')
+                    failures += 1
 
-        print()
         if failures > 0:
             self._log.warning(
                 f'Warning: {failures} model configs failed to run.')
 
         self._log.info(f'{successes} model configs run.')
 
+        if sentinel:
+            self._requeue_drifted(sentinel, start)
+        changes = HostFingerprint.changes(self.host,
+                                          HostFingerprint.capture())
+        if changes:
+            self._log.warning('Warning: Host changed during the run: '
+                              + ', '.join(changes))
+
+    def _reuse(self):
+        """Reuse any points of the baseline commit measured by an earlier
+           campaign in the archive with the same executable, QEMU build,
+           host and parameters."""
+        archive = ResultsArchive(self._args, self._log)
+        baseline = self._args.get('qemulist')[0]
+        sizes = self._args.get('sizelist')
+        resdir = self._args.get('resdir')
+        nreused = 0
+        for m in self._model_list:
+            if m.suffix not in self._keys or not m._qb \
+               or m._qb.cmt != baseline:
+                continue
+            found = archive.find(m.suffix, self._keys[m.suffix])
+            if not found:
+                continue
+            cdir, entry = found
+            points = archive.points(cdir, m.suffix, entry, sizes)
+            m.reused = {sz: p[0] for sz, p in points.items()}
+            self._reused[m.suffix] = {sz: p[1:] for sz, p in points.items()}
+            if m.reused and self._args.get('insn_mix'):
+                try:
+                    mix = InsnMix.load(InsnMix.mixfile(cdir, m.suffix))
+                    m.mix = {sz: v for sz, v in mix.items() if sz in m.reused}
+                except Exception:
+                    # Points without a mix just lack it in the report
+                    pass
+            nreused += len(m.reused)
+            self._log.debug(f'DEBUG: Reusing {len(m.reused)} points of '
+                            f'{m.suffix} from {cdir}')
+        self._log.info(f'Reusing {nreused} baseline points from earlier '
+                       'campaigns')
+
+    def _sentinel(self):
+        """The sentinel for the run, which is the first model built for
+           QEMU, or None if we are not using a sentinel."""
+        if not self._args.get('sentinel_interval'):
+            return None
+        for m in self._model_list:
+            if m.buildok and not isinstance(m, NativeModel):
+                return Sentinel(m, self._args, self._log)
+        return None
+
+    @staticmethod
+    def _executor(sentinel):
+        """A pool of processes to run models, which leaves the CPU of the
+           sentinel, if any, to it."""
+        if sentinel and sentinel.cpus:
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=len(sentinel.cpus),
+                initializer=os.sched_setaffinity, initargs=(0, sentinel.cpus))
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=sentinel.workers if sentinel else None)
+
+    def _drift(self, sentinel, since):
+        """The drift of each point measured since the given time, in a
+           dictionary indexed by model and size.  A point measured again
+           takes the drift of its latest measurement."""
+        models = {m.suffix: m for m in self._model_list}
+        res = {}
+        for ev in self._telemetry.points(['run', 'requeue'], since):
+            m = models.get(ev['config'])
+            if m is None:
+                continue
+            res[(m, ev['size'])] = sentinel.drift(ev['ts'] - ev['duration'],
+                                                  ev['ts'])
+        return res
+
+    def _requeue(self, points, sentinel):
+        """Measure the given list of (model, size) points again
+           concurrently, replacing their results, with the sentinel
+           running."""
+        sizes = {}
+        for m, sz in points:
+            sizes.setdefault(m, []).append(sz)
+        self._log.info(f'Measuring {len(points)} drifted points again')
+        resf = {}
+        with self._executor(sentinel) as executor:
+            for m, szlist in sizes.items():
+                resf[m] = executor.submit (m.remeasure, szlist)
+            sentinel.start(len(resf))
+
+            for m, r in self._telemetry.as_completed('requeue', resf,
+                                                     len(points)):
+                sentinel.task_done()
+                try:
+                    m.results.update(r.result())
+                except Exception as e:
+                    emess = f'ERROR: measuring again model config {m.suffix}'
+                    ename = type(e).__name__
+                    self._log.error(f'{emess}: {ename}.')
+
+    def _requeue_drifted(self, sentinel, start):
+        """Measure again any points for which the host drifted, with the
+           sentinel running again, up to REQUEUES times.  Then record the
+           drift of every point as an additional result."""
+        since = start
+        for _ in range(ModelSet.REQUEUES):
+            points = [(m, sz) for (m, sz), d in
+                      self._drift(sentinel, since).items()
+                      if m.results and sz in m.results
+                      and sentinel.drifted(d)]
+            if not points:
+                break
+            since = time.time()
+            self._requeue(points, sentinel)
+
+        drifted = []
+        for (m, sz), d in self._drift(sentinel, start).items():
+            if m.results and sz in m.results:
+                m.results[sz][3]['Drift'] = d
+                if sentinel.drifted(d):
+                    drifted.append(f'{m.suffix}:{sz}')
+        if drifted:
+            self._log.warning(f'Warning: {len(drifted)} points drifted '
+                              'beyond the threshold: ' + ', '.join(drifted))
+
+    def _profile_points(self):
+        """The list of (model, size) pairs selected for profiling.  Each
+           selector is of the form BENCHMARK:VLEN:SIZE, where any field may be
+           "*" to match everything."""
+        points = []
+        for sel in self._args.get('profile_points'):
+            fields = sel.split(':')
+            if len(fields) != 3:
+                self._log.warning(
+                    f'Warning: Ignoring bad profile point "{sel}"')
+                continue
+            bm, conf, sz = fields
+            if sz == '*':
+                sizes = self._args.get('sizelist')
+            else:
+                try:
+                    sizes = [int(sz)]
+                except ValueError:
+                    self._log.warning(
+                        f'Warning: Ignoring bad profile point "{sel}"')
+                    continue
+            for m in self._model_list:
+                if bm not in ('*', m.bm) or conf not in ('*', m.conf):
+                    continue
+                for s in sizes:
+                    if (m, s) not in points:
+                        points.append((m, s))
+        return points
+
+    @staticmethod
+    def _number(val):
+        """A value as a number, or None if it is not one."""
+        try:
+            return float(val)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _select(field, values):
+        """The values in a list matching a field of a selector.  The field
+           is a comma separated list of globs and ranges LO..HI.  If both
+           ends are numbers (or empty), a range matches the numbers between
+           them, otherwise the values from LO to HI in the list.  Return
+           None if a range is bad."""
+        res = []
+        for item in field.split(','):
+            if '..' in item:
+                lo, hi = item.split('..', 1)
+                nlo = ModelSet._number(lo) if lo else float('-inf')
+                nhi = ModelSet._number(hi) if hi else float('inf')
+                if nlo is not None and nhi is not None:
+                    matched = [v for v in values
+                               if ModelSet._number(v) is not None
+                               and nlo <= ModelSet._number(v) <= nhi]
+                else:
+                    strs = [str(v) for v in values]
+                    if (lo and lo not in strs) or (hi and hi not in strs):
+                        return None
+                    first = strs.index(lo) if lo else 0
+                    last = strs.index(hi) if hi else len(strs) - 1
+                    matched = values[first:last + 1]
+            else:
+                matched = [v for v in values
+                           if fnmatch.fnmatchcase(str(v), item)]
+            res += [v for v in matched if v not in res]
+        return res
+
+    def _rerun_points(self):
+        """The sizes of each model selected to be measured again, in a
+           dictionary indexed by model.  Each selector is of the form
+           COMMIT:BENCHMARK:VLEN:SIZE, where each field is matched by
+           _select against the commits, benchmarks, VLENs (or configuration
+           names) and sizes of the run.  Only points with existing results
+           are selected."""
+        cmtlist = [qb.cmt for qb in self._qemu_builds]
+        if self._args.get('native'):
+            cmtlist.append(NativeModel.CMT)
+        points = {}
+        for sel in self._args.get('rerun'):
+            fields = sel.split(':')
+            if len(fields) != 4:
+                self._log.warning(f'Warning: Ignoring bad point "{sel}"')
+                continue
+            cmts = ModelSet._select(fields[0], cmtlist)
+            bms = ModelSet._select(fields[1], self._args.get('bmlist'))
+            vlens = ModelSet._select(fields[2], self._args.get('vlenlist'))
+            if cmts is None or bms is None or vlens is None:
+                self._log.warning(f'Warning: Ignoring bad point "{sel}"')
+                continue
+            for m in self._model_list:
+                if m._cmt not in cmts or m.bm not in bms:
+                    continue
+                if m._vlen not in vlens \
+                   and not ModelSet._select(fields[2], [m.conf]):
+                    continue
+                if not m.results and not m.load_csv():
+                    continue
+                sizes = ModelSet._select(fields[3], list(m.results))
+                if sizes is None:
+                    self._log.warning(f'Warning: Ignoring bad point "{sel}"')
+                    break
+                for sz in sizes:
+                    if sz not in points.setdefault(m, []):
+                        points[m].append(sz)
+        return {m: sizes for m, sizes in points.items() if sizes}
+
+    @traced('phase')
+    def rerun(self):
+        """Measure the selected points again concurrently, with the
+           iterations they were measured with, and update their results
+           and provenance in place.
+
+           As for running, the models are copied to the worker processes,
+           so the new results are returned."""
+        points = self._rerun_points()
+        repeats = self._args.get('rerun_repeats')
+        for m in [m for m in points if not m.buildok]:
+            self._log.warning(f'Warning: No executable for {m.suffix}, so '
+                              'its points cannot be measured again')
+            del points[m]
+        npoints = sum(len(sizes) for sizes in points.values())
+        if not npoints:
+            self._log.warning('Warning: No points selected to run again')
+            return
+        self._log.info(f'Measuring {npoints} points again, {repeats} times '
+                       'each')
+        self._start = time.time()
+        resf = {}
+        reruns = {}
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            for m, sizes in points.items():
+                resf[m] = executor.submit (m.rerun, sizes, repeats)
+
+            failures = 0
+            for m, r in self._telemetry.as_completed('rerun', resf,
+                                                     npoints * repeats):
+                try:
+                    res = r.result()
+                except Exception as e:
+                    emess = f'ERROR: measuring again model config {m.suffix}'
+                    ename = type(e).__name__
+                    self._log.error(f'{emess}: {ename}.')
+                    res = {}
+                failures += len(points[m]) - len(res)
+                reruns[m] = {sz: (m.results[sz], r) for sz, r in res.items()}
+                m.results.update(res)
+
+        if failures > 0:
+            self._log.warning(
+                f'Warning: {failures} points failed to run again.')
+
+        for m, changed in reruns.items():
+            if changed:
+                m.export_csv()
+            for sz, (old, new) in changed.items():
+                change = new[1] / old[1] - 1.0 if old[1] > 0.0 else 0.0
+                self._log.info(f'{m.suffix} size {sz}: {old[1]:.3f}s -> '
+                               f'{new[1]:.3f}s ({100.0 * change:+.1f}%)')
+        self._save_reruns(reruns)
+
+    def _save_reruns(self, reruns):
+        """Record the points measured again in the provenance of the
+           results, with the result each replaced.  If the executable, QEMU
+           build, host or parameters are not those the model was measured
+           with, it can no longer be reused by later campaigns."""
+        resdir = self._args.get('resdir')
+        prov = Provenance.load(resdir) or {
+            'time': self._start, 'datestamp': None, 'host': None,
+            'models': {}}
+        prov.setdefault('args', self._args.campaign())
+        measured = {}
+        for ev in self._telemetry.points(['rerun'], self._start):
+            measured[(ev['config'], ev['size'])] = ev['ts']
+        host = HostFingerprint.digest(self.host)
+        for m, changed in reruns.items():
+            if not changed:
+                continue
+            entry = prov['models'].setdefault(
+                m.suffix, {'key': None, 'measured': {}, 'reused': {}})
+            key = m.prov_key(host)
+            if entry['key'] and entry['key'] != key:
+                diffs = [k for k in key if entry['key'].get(k) != key[k]]
+                self._log.warning(
+                    f'Warning: {m.suffix} measured again with a different '
+                    f'{", ".join(diffs)}, so will not be reused')
+            if entry['key'] != key:
+                entry['key'] = None
+            for sz, (old, new) in changed.items():
+                when = measured.get((m.suffix, sz))
+                entry['measured'][str(sz)] = when
+                entry['reused'].pop(str(sz), None)
+                entry.setdefault('reruns', {}).setdefault(str(sz), []).append(
+                    {'time': when, 'datestamp': self._args.get('datestamp'),
+                     'host': host, 'repeats': new[3].get('Repeats'),
+                     'spread': new[3].get('Spread'),
+                     'previous': {'iters': old[0], 'time': old[1],
+                                  'icount': old[2]}})
+        try:
+            Provenance.save(resdir, prov)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to save provenance: {ename}')
+
+    @traced('phase')
+    def profile(self):
+        """Profile all the selected points concurrently.  The results are
+           written to files by each process, so all we get back is the
+           filename."""
+        points = self._profile_points()
+        if not points:
+            return
+        self._log.info(f'Profiling {len(points)} points')
+        resf = {}
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            for m, sz in points:
+                resf[(m, sz)] = executor.submit (m.profile, sz)
+
+            successes = 0
+            failures = 0
+            for (m, sz), r in self._telemetry.as_completed('profile', resf,
+                                                           len(resf)):
+                try:
+                    if r.result():
+                        successes += 1
+                    else:
+                        failures +=1
+                except Exception as e:
+                    emess = 'ERROR: profiling model config ' + \
+                        f'{m.suffix}, size={sz}'
+                    ename = type(e).__name__
+                    self._log.error(f'{emess}: {ename}.')
+                    failures += 1
+
+        if failures > 0:
+            self._log.warning(
+                f'Warning: {failures} profiles failed.')
+
+        self._log.info(f'{successes} profiles completed.')
+
+    @traced('phase')
     def generate_csv(self):
         """Do the detailed analysis."""
         self._log.info('Exporting results as CSV')
         for m in self._model_list:
             if m.results:
                 m.export_csv()
+        self._save_provenance()
+
+    def _save_provenance(self):
+        """Record when each point was measured, or where it was reused
+           from, so later campaigns can reuse our results."""
+        measured = {}
+        for ev in self._telemetry.points(['run', 'requeue'], self._start):
+            measured[(ev['config'], ev['size'])] = ev['ts']
+        models = {}
+        for m in self._model_list:
+            if not m.results or m.suffix not in self._keys:
+                continue
+            entry = {'key': self._keys[m.suffix], 'measured': {},
+                     'reused': {}}
+            for sz in m.results:
+                if sz in m.reused:
+                    when, source = self._reused[m.suffix][sz]
+                    entry['reused'][str(sz)] = source
+                else:
+                    when = measured.get((m.suffix, sz))
+                entry['measured'][str(sz)] = when
+            models[m.suffix] = entry
+        commits = {m._qb.cmt: m._qb.hash for m in self._model_list
+                   if m._qb}
+        prov = {'time': self._start, 'datestamp': self._args.get('datestamp'),
+                'host': HostFingerprint.digest(self.host),
+                'args': self._args.campaign(), 'commits': commits,
+                'models': models}
+        try:
+            Provenance.save(self._args.get('resdir'), prov)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to save provenance: {ename}')
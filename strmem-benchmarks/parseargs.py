@@ -15,9 +15,12 @@ A module to parse arguments for the SiFive benchmarks
 import argparse
 import os
 import os.path
+import re
 import sys
 import time
 
+from implementations import ImplRegistry
+from provenance import Provenance
 
 # What we export
 
@@ -32,13 +35,66 @@ class ParseArgs:
        Almost all the work is done in the instance creation.  Note that at
        this time we don't have logging set up, so any error messages are just
        written to stderr.
+
+       A named sweep is a set of defaults for a standard set of
+       configurations, which can still be overridden on the command line.
     """
+
+    # The sweeps.  memcpy-sequence is that of the old memcpy-benchmarks
+    # run-sequence.sh script.
+    SWEEPS = {
+        'memcpy-sequence' : {
+            'bmlist'   : ['memcpy'],
+            'vlenlist' : ['stdlib', '128', '256', '512', '1024'],
+            'impls'    : ['smemcpy', 'vmemcpy'],
+            'lmullist' : ['1', '8'],
+            'sizelist' : [   1,    2,    3,    4,    5,    7,    8,    9,
+                            16,   25,   27,   32,   49,   64,   81,  125,
+                           128,  243,  256,  343,  512,  625,  729, 1024,
+                          2048, 2401, 3125, 4096, 6561, 8192, 15625,],
+        },
+    }
+
+    # Arguments which only concern one invocation, rather than what a
+    # campaign measured, so are not taken from the campaign when measuring
+    # its points again.
+    INVOCATION = ['datestamp', 'build', 'log_prefix', 'logdir', 'telemetry',
+                  'telemetry_interval', 'live', 'prometheus_file', 'trace',
+                  'report', 'report_only', 'resdir', 'reuse_baseline',
+                  'archive', 'history', 'rerun', 'rerun_repeats', 'sweep']
+
     def __init__(self):
         parser = self._build_parser()
         self.args = parser.parse_args()
+        if self.args.sweep:
+            parser.set_defaults(**ParseArgs.SWEEPS[self.args.sweep])
+            self.args = parser.parse_args()
+        if self.args.rerun:
+            parser.set_defaults(**self._campaign_args(self.args.resdir))
+            self.args = parser.parse_args()
+        self._campaign = {k: v for k, v in vars(self.args).items()
+                          if k not in ParseArgs.INVOCATION}
         self._fix_args()
         self._argsdict = vars(self.args)
 
+    @staticmethod
+    def _campaign_args(resdir):
+        """The arguments of the campaign in a results directory, as given
+           when it was run, which are the defaults when measuring its points
+           again."""
+        prov = Provenance.load(resdir) if resdir else None
+        if not prov or 'args' not in prov:
+            print('Warning: No arguments recorded for the campaign, so all '
+                  'must be given again', file=sys.stderr)
+            return {}
+        return {k: v for k, v in prov['args'].items()
+                if k not in ParseArgs.INVOCATION}
+
+    def campaign(self):
+        """The arguments as given which define what the campaign measures,
+           to be recorded with its results."""
+        return self._campaign
+
     def _build_parser(self):
         """The parser for the SiFive benchmarks"""
         parser = argparse.ArgumentParser(
@@ -151,9 +207,9 @@ class ParseArgs:
             type=str,
             nargs='+',
             default=[],
-            required=True,
             metavar='COMMIT',
-            help='QEMU commits to be benchmarked (at least one required)',
+            help='QEMU commits to be benchmarked (at least one required, ' \
+                 'unless measuring points again with --rerun)',
         )
         parser.add_argument(
             '--qemu-config',
@@ -182,6 +238,113 @@ class ParseArgs:
             dest="build",
             help='Do not build QEMU',
         )
+        parser.add_argument(
+            '--native',
+            action='store_true',
+            default=False,
+            help='Also build and run the standard library benchmarks ' \
+                 'natively on the host, to measure QEMU slowdown ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-native',
+            action='store_false',
+            dest="native",
+            help='Do not run the benchmarks natively',
+        )
+        parser.add_argument(
+            '--native-cc',
+            type=str,
+            default='gcc',
+            metavar='CC',
+            help='Host C compiler for native benchmarks (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--perf-counters',
+            action='store_true',
+            default=False,
+            help='Record host hardware performance counters for each timing ' \
+                 'run using perf stat (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-perf-counters',
+            action='store_false',
+            dest="perf_counters",
+            help='Do not record host hardware performance counters',
+        )
+        parser.add_argument(
+            '--xlate',
+            action='store_true',
+            default=False,
+            help='Also measure translation cost separately from execution ' \
+                 'cost for each size (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-xlate',
+            action='store_false',
+            dest="xlate",
+            help='Do not measure translation cost separately',
+        )
+        parser.add_argument(
+            '--xlate-repeats',
+            type=int,
+            default=5,
+            metavar='NUM',
+            help='Runs to take the fastest of when measuring translation ' \
+                 'cost (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--insn-mix',
+            action='store_true',
+            default=False,
+            help='Also count the guest instructions executed in each class ' \
+                 'for each size, and attribute time to each class ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-insn-mix',
+            action='store_false',
+            dest="insn_mix",
+            help='Do not count the guest instruction mix',
+        )
+        parser.add_argument(
+            '--insn-mix-iters',
+            type=int,
+            default=10,
+            metavar='NUM',
+            help='Iterations when counting the instruction mix ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--profile-points',
+            type=str,
+            nargs='*',
+            default=[],
+            metavar='BM:VLEN:SIZE',
+            help='Points to profile with perf record after benchmarking. ' \
+                 'Any field may be "*" to match everything',
+        )
+        parser.add_argument(
+            '--profile-mode',
+            type=str,
+            default='fp',
+            choices=['dwarf', 'fp', 'lbr'],
+            help='How perf record collects call graphs (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--profile-bytes',
+            type=int,
+            default=1000000000,
+            metavar='NUM',
+            help='Total bytes processed by each profile run (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--profile-timeout',
+            type=int,
+            default=3600,
+            metavar='SECS',
+            help='Timeout in seconds for each profile run (default: %(default)s)',
+        )
         parser.add_argument(
             '--target-time',
             type=int,
@@ -196,6 +359,40 @@ class ParseArgs:
             metavar='NUM',
             help='Iterations for warmup (default: %(default)s)',
         )
+        parser.add_argument(
+            '--sentinel-interval',
+            type=float,
+            default=600.0,
+            metavar='SECS',
+            help='Interval for running the sentinel benchmark to detect ' \
+                 'drift of the host, or 0 for no sentinel ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--sentinel-threshold',
+            type=float,
+            default=0.05,
+            metavar='FRAC',
+            help='Drift of the sentinel beyond which points are measured ' \
+                 'again (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--sweep',
+            type=str,
+            default=None,
+            choices=list(ParseArgs.SWEEPS),
+            help='Use the benchmarks, VLENs, implementations, LMULs and ' \
+                 'sizes of a standard sweep, unless given explicitly',
+        )
+        parser.add_argument(
+            '--iter-bytes',
+            type=int,
+            default=0,
+            metavar='NUM',
+            help='If non-zero, do not calibrate, but run each size for ' \
+                 'NUM bytes divided by the size iterations, as the old ' \
+                 'memcpy-benchmarks scripts did (default: %(default)s)',
+        )
         parser.add_argument(
             '--sizelist',
             type=int,
@@ -213,6 +410,60 @@ class ParseArgs:
             metavar='VLEN',
             help='VLEN configurations to run (default: %(default)s)',
         )
+        parser.add_argument(
+            '--lmullist',
+            type=str,
+            default=['1'],
+            nargs='*',
+            choices=['1', '2', '4', '8'],
+            metavar='LMUL',
+            help='LMUL configurations of the vector code to run ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--impls',
+            type=str,
+            default=[ImplRegistry.DEFAULT],
+            nargs='*',
+            metavar='IMPL',
+            help='Implementations of the vector benchmarks to run.  Built ' \
+                 'in are sifive, smemcpy, vmemcpy and bionic, the last ' \
+                 'three just for memcpy (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--impl-def',
+            type=str,
+            default=[],
+            nargs='*',
+            metavar='NAME=BM[,BM...]:SOURCE:FUNC[:lmul]',
+            help='Register additional implementations.  SOURCE is an ' \
+                 'assembly or C file defining FUNC with the interface of ' \
+                 'the standard library function.  Add ":lmul" if it uses ' \
+                 'the LMUL macro',
+        )
+        parser.add_argument(
+            '--placements',
+            type=str,
+            default=['malloc'],
+            nargs='*',
+            metavar='PLACE[:SRC[:DST]]',
+            help='Placements of the data buffers to run, with optional ' \
+                 'source and destination offsets in bytes.  PLACE is one ' \
+                 'of malloc, aligned (to 64 bytes), straddle (a page ' \
+                 'boundary) or guard (ending at a guard page, so offsets ' \
+                 'have no effect) (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--qemu-opts',
+            type=str,
+            default=[],
+            nargs='*',
+            metavar='NAME=OPTIONS',
+            help='Named sets of QEMU runtime options to run in addition to ' \
+                 'the default.  OPTIONS before the first "-" are extra ' \
+                 'CPU properties (e.g. "elen=32,vext_spec=v1.0"), the rest ' \
+                 'are extra QEMU arguments (e.g. "-one-insn-per-tb")',
+        )
         parser.add_argument(
             '--log-prefix',
             type=str,
@@ -227,6 +478,51 @@ class ParseArgs:
             metavar='DIR',
             help='Log directory (default %(default)s)',
         )
+        parser.add_argument(
+            '--telemetry',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='File for JSON lines telemetry events (default ' \
+                 '<LOGDIR>/<LOG-PREFIX>-<DATESTAMP>.jsonl)',
+        )
+        parser.add_argument(
+            '--telemetry-interval',
+            type=float,
+            default=2.0,
+            metavar='SECS',
+            help='Interval for updating the live view and metrics ' \
+                 '(default: %(default)s)',
+        )
+        parser.add_argument(
+            '--live',
+            action='store_true',
+            default=True,
+            help='Show a live view of progress when output is to a ' \
+                 'terminal (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-live',
+            action='store_false',
+            dest="live",
+            help='Just show a dot as each task completes',
+        )
+        parser.add_argument(
+            '--prometheus-file',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='Write progress metrics to FILE in Prometheus textfile ' \
+                 'format, for the node exporter',
+        )
+        parser.add_argument(
+            '--trace',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='Write a Chrome trace of every phase, subprocess and pool ' \
+                 'task to FILE, for viewing with Perfetto',
+        )
         parser.add_argument(
             '--report',
             action='store_true',
@@ -246,6 +542,55 @@ class ParseArgs:
             metavar='DIR',
             help='Results directory (default results-<DATESTAMP>)',
         )
+        parser.add_argument(
+            '--reuse-baseline',
+            action='store_true',
+            default=False,
+            help='Reuse points of the baseline commit measured by earlier ' \
+                 'campaigns with the same executable, QEMU build, host and ' \
+                 'parameters (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--no-reuse-baseline',
+            action='store_false',
+            dest='reuse_baseline',
+            help='Measure all points of the baseline commit',
+        )
+        parser.add_argument(
+            '--archive',
+            type=str,
+            default=None,
+            metavar='DIR',
+            help='Directory of results directories of earlier campaigns ' \
+                 'to reuse (default <STRMEMDIR>)',
+        )
+        parser.add_argument(
+            '--history',
+            type=str,
+            default=None,
+            metavar='FILE',
+            help='History database to which to add the results, see ' \
+                 'track_history.py (default: none)',
+        )
+        parser.add_argument(
+            '--rerun',
+            type=str,
+            nargs='+',
+            default=[],
+            metavar='COMMIT:BM:VLEN:SIZE',
+            help='Measure just these points of the results in --resdir ' \
+                 'again, with the same executables, iterations and ' \
+                 'options as the campaign, and update the results.  Each ' \
+                 'field is a comma separated list of globs and ranges LO..HI',
+        )
+        parser.add_argument(
+            '--rerun-repeats',
+            type=int,
+            default=3,
+            metavar='NUM',
+            help='How many times to measure each point again, taking the ' \
+                 'median (default: %(default)s)',
+        )
         parser.add_argument(
             '--report-only',
             action='store_true',
@@ -264,11 +609,148 @@ class ParseArgs:
 
     def _fix_args(self):
         """Fix up arguments that can only be finalized after parsing."""
+        if not self.args.qemulist:
+            print('ERROR: At least one QEMU commit is required with ' \
+                  '--qemulist', file=sys.stderr)
+            sys.exit(1)
+        if self.args.rerun:
+            # Points are measured again in an existing campaign, with the
+            # QEMU it was built with.
+            if not self.args.resdir or not os.path.isdir(self.args.resdir):
+                print('ERROR: --rerun needs the results directory of a ' \
+                      'campaign with --resdir', file=sys.stderr)
+                sys.exit(1)
+            if self.args.rerun_repeats < 1:
+                print('ERROR: --rerun-repeats must be at least 1',
+                      file=sys.stderr)
+                sys.exit(1)
+            self.args.build = False
         if not self.args.resdir:
             self.args.resdir = os.path.join (self.args.strmemdir,
                                              'results-' + self.args.datestamp)
         else:
             self.args.resdir = os.path.abspath(self.args.resdir)
+        if not self.args.archive:
+            self.args.archive = self.args.strmemdir
+        self.args.archive = os.path.abspath(self.args.archive)
+        if self.args.trace:
+            self.args.trace = os.path.abspath(self.args.trace)
+        if self.args.history:
+            self.args.history = os.path.abspath(self.args.history)
+        if not self.args.telemetry:
+            self.args.telemetry = os.path.join(
+                os.path.abspath(self.args.logdir),
+                f'{self.args.log_prefix}-{self.args.datestamp}.jsonl')
+        else:
+            self.args.telemetry = os.path.abspath(self.args.telemetry)
+        self.args.qemu_optsets = self._parse_optsets(self.args.qemu_opts)
+        self.args.placement_sets = self._parse_placements(
+            self.args.placements)
+        self.args.impl_defs = self._parse_impl_defs(self.args.impl_def)
+        for impl in self.args.impls:
+            if impl != ImplRegistry.DEFAULT \
+               and impl not in ImplRegistry.BUILTIN \
+               and impl not in self.args.impl_defs:
+                print(f'ERROR: Unknown implementation "{impl}"',
+                      file=sys.stderr)
+                sys.exit(1)
+        for name in self.args.qemu_optsets:
+            if name == ImplRegistry.DEFAULT or name in ImplRegistry.BUILTIN \
+               or name in self.args.impl_defs:
+                print(f'ERROR: QEMU option set name "{name}" could be '
+                      'confused with an implementation', file=sys.stderr)
+                sys.exit(1)
+            if name in [p[0] for p in self.args.placement_sets]:
+                print(f'ERROR: QEMU option set name "{name}" could be '
+                      'confused with a buffer placement', file=sys.stderr)
+                sys.exit(1)
+
+    @staticmethod
+    def _parse_placements(placelist):
+        """Parse the buffer placements into a list of tuples of name,
+           placement, source offset and destination offset.  The name of the
+           default of malloc with no offsets is empty."""
+        placements = []
+        for spec in placelist:
+            fields = spec.split(':')
+            place = fields[0]
+            try:
+                offs = [int(f) for f in fields[1:]]
+            except ValueError:
+                offs = None
+            if place not in ['malloc', 'aligned', 'straddle', 'guard'] \
+               or offs is None or len(offs) > 2 or any(o < 0 for o in offs):
+                print(f'ERROR: Bad buffer placement "{spec}"', file=sys.stderr)
+                sys.exit(1)
+            offs += [0] * (2 - len(offs))
+            if offs == [0, 0]:
+                name = '' if place == 'malloc' else place
+            else:
+                name = f'{place}_s{offs[0]}d{offs[1]}'
+            if name not in [p[0] for p in placements]:
+                placements.append((name, place, offs[0], offs[1]))
+        return placements
+
+    @staticmethod
+    def _parse_impl_defs(deflist):
+        """Parse the user defined implementations into a dictionary indexed
+           by name of a tuple of the list of benchmarks, the source file, the
+           function name and whether the source uses LMUL.  Names are used
+           in file names, so must be simple identifiers."""
+        impls = {}
+        for spec in deflist:
+            name, sep, val = spec.partition('=')
+            fields = val.split(':')
+            if not sep or not re.fullmatch(r'[A-Za-z0-9_]+', name) \
+               or len(fields) not in [3, 4] \
+               or (len(fields) == 4 and fields[3] != 'lmul'):
+                print(f'ERROR: Implementation "{spec}" must be ' \
+                      'NAME=BM[,BM...]:SOURCE:FUNC[:lmul], with NAME only ' \
+                      'letters, digits and underscores', file=sys.stderr)
+                sys.exit(1)
+            if re.fullmatch(r'm\d+', name) or name == ImplRegistry.DEFAULT \
+               or name in ImplRegistry.BUILTIN or name in impls:
+                print(f'ERROR: Implementation name "{name}" is already ' \
+                      'used', file=sys.stderr)
+                sys.exit(1)
+            if not os.path.isfile(fields[1]):
+                print(f'ERROR: Implementation source "{fields[1]}" not ' \
+                      'found', file=sys.stderr)
+                sys.exit(1)
+            impls[name] = (fields[0].split(','), fields[1], fields[2],
+                           len(fields) == 4)
+        return impls
+
+    @staticmethod
+    def _parse_optsets(optlist):
+        """Parse the named QEMU option sets into a dictionary indexed by name
+           of a tuple of CPU properties and additional arguments.  Names are
+           used in file names, so must be simple identifiers."""
+        optsets = {}
+        for opt in optlist:
+            name, sep, val = opt.partition('=')
+            if not sep or not re.fullmatch(r'[A-Za-z0-9_]+', name):
+                print(f'ERROR: QEMU option set "{opt}" must be NAME=OPTIONS, '
+                      'with NAME only letters, digits and underscores',
+                      file=sys.stderr)
+                sys.exit(1)
+            if re.fullmatch(r'm\d+', name):
+                print(f'ERROR: QEMU option set name "{name}" could be '
+                      'confused with an LMUL', file=sys.stderr)
+                sys.exit(1)
+            if name in optsets:
+                print(f'ERROR: Duplicate QEMU option set name "{name}"',
+                      file=sys.stderr)
+                sys.exit(1)
+            val = val.strip()
+            if val.startswith('-'):
+                cpuprops, qemuargs = '', val
+            else:
+                cpuprops, _, qemuargs = val.partition(' -')
+                if qemuargs:
+                    qemuargs = '-' + qemuargs
+            optsets[name] = (cpuprops.strip().strip(','), qemuargs.strip())
+        return optsets
 
     def get(self, name):
         """Alternative access by naming the arg."""
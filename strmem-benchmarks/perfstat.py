@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+# Host hardware performance counters
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to collect host hardware performance counters for a QEMU run, by
+wrapping the command with "perf stat -x".
+
+Counters are optional.  If perf is not installed, or the counters are not
+available (for example in a virtual machine, or because of the
+perf_event_paranoid setting), we just record nothing.
+"""
+
+import subprocess
+
+# What we export
+
+__all__ = [
+    'PerfStat',
+]
+
+
+class PerfStat:
+    """A class to wrap commands with "perf stat" and read the results.
+
+       The counters are for the whole process tree of the command, which for
+       a benchmark run is QEMU itself."""
+
+    # The perf events we collect, with the column names for the results.
+    EVENTS = {
+        'instructions'  : 'Host insns',
+        'cycles'        : 'Host cycles',
+        'cache-misses'  : 'Host cache misses',
+        'branch-misses' : 'Host branch misses',
+    }
+
+    # Derived column names
+    IPC = 'Host IPC'
+    HIPGI = 'Host insns/guest insn'
+
+    def __init__(self, timeout):
+        """Constructor just records the timeout for checking perf works."""
+        self._timeout = timeout
+
+    def available(self, log):
+        """Check that perf is installed and can count at least one of our
+           events.  Log the reason if not."""
+        events = ','.join(PerfStat.EVENTS)
+        cmd = f'perf stat -x, -e {events} -- true'
+        try:
+            res = subprocess.run(
+                cmd,
+                shell=True,
+                executable='/bin/bash',
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self._timeout,
+                check=True,
+            )
+        except subprocess.TimeoutExpired:
+            log.warning('Warning: perf stat timed out: no host counters.')
+            return False
+        except subprocess.CalledProcessError as e:
+            log.warning('Warning: perf stat failed: no host counters.')
+            log.debug(e.stderr)
+            return False
+
+        counters = self.parse(res.stderr.decode('utf-8'))
+        if not any(v is not None for v in counters.values()):
+            log.warning('Warning: host counters not supported.')
+            return False
+
+        return True
+
+    @staticmethod
+    def wrap(cmd, outfile):
+        """Wrap a command so perf stat writes its counters to outfile."""
+        events = ','.join(PerfStat.EVENTS)
+        return f'perf stat -x, -o {outfile} -e {events} -- {cmd}'
+
+    @staticmethod
+    def parse(text):
+        """Parse the CSV output of perf stat.  Return a dictionary indexed by
+           column name of the count, or None if an event was not counted."""
+        counters = {col: None for col in PerfStat.EVENTS.values()}
+        for line in text.splitlines():
+            fields = line.split(',')
+            if len(fields) < 3 or line.startswith('#'):
+                continue
+            # Events may have modifiers, such as "instructions:u"
+            event = fields[2].split(':')[0]
+            if event in PerfStat.EVENTS:
+                try:
+                    counters[PerfStat.EVENTS[event]] = int(fields[0])
+                except ValueError:
+                    # "<not counted>" or "<not supported>"
+                    pass
+        return counters
+
+    @staticmethod
+    def read(filename):
+        """Read the counters from a perf stat output file."""
+        with open(filename, 'r', encoding='utf-8') as fh:
+            return PerfStat.parse(fh.read())
+
+    @staticmethod
+    def derived(counters, icnt):
+        """Compute host instructions per cycle and host instructions per
+           guest instruction from the counters and the guest instruction
+           count, either of which may be missing."""
+        res = {PerfStat.IPC : None, PerfStat.HIPGI : None}
+        insns = counters.get(PerfStat.EVENTS['instructions'])
+        cycles = counters.get(PerfStat.EVENTS['cycles'])
+        if insns is not None and cycles:
+            res[PerfStat.IPC] = float(insns) / float(cycles)
+        if insns is not None and icnt:
+            res[PerfStat.HIPGI] = float(insns) / float(icnt)
+        return res
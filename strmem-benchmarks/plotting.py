@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+
+# Plot generation for reporting
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to generate the gnuplot commands for the graphs of one benchmark.
+
+The graphs are for any number of QEMU commits and any number of
+configurations.  All the data is written into the gnuplot script as inline
+data blocks, so the script is completely self-contained and many benchmarks
+can be plotted by a single gnuplot process.
+"""
+
+import math
+
+# What we export
+
+__all__ = [
+    'BenchmarkPlot',
+    'TrendPlot',
+]
+
+
+class BenchmarkPlot:
+    """A class to generate the gnuplot script for one benchmark.
+
+       The data is a dictionary indexed by commit and then configuration.
+       Each entry is either None (no results) or a dictionary indexed by data
+       size of the results row for that size, itself a dictionary indexed by
+       CSV column name.  The first commit is the baseline against which
+       speedups are computed.
+
+       If we have native results for the benchmark, these are supplied as a
+       single dictionary indexed by size in the same form.
+
+       We generate up to four pages of graphs.
+       - overlays of instruction counts and of timings for all commits
+       - speedup versus the baseline for each configuration
+       - heatmaps of speedup over size and configuration for each commit
+       - QEMU slowdown versus native for each configuration"""
+
+    # Colors correspond to the default colors used in Google spreadsheet
+    # graphs.  We cycle round if there are more series than colors.
+    COLORS = ['#4285f4', '#ea4335', '#fbbc04', '#34a853', '#ff6d01',
+              '#46bdc6', '#7baaf7', '#f07b72', '#fcd04f', '#71c287',]
+
+    def __init__(self, bm, cmtlist, conflist, data, native=None):
+        """Constructor just records the data to be plotted."""
+        self._bm = bm
+        self._cmtlist = cmtlist
+        self._conflist = conflist
+        self._data = data
+        self._native = native
+        self._blocks = {}
+        self._sizes = sorted({sz for cmt in cmtlist for conf in conflist
+                              if data[cmt][conf]
+                              for sz in data[cmt][conf]})
+
+    def _title(self, cmt):
+        """The legend title for a commit."""
+        if cmt == self._cmtlist[0]:
+            return f'baseline (#{cmt})'
+        return f'#{cmt}'
+
+    @staticmethod
+    def _layout(num):
+        """Rows and columns for a multiplot of num graphs."""
+        cols = max(1, math.ceil(math.sqrt(num)))
+        rows = max(1, math.ceil(num / cols))
+        return rows, cols
+
+    def _color(self, idx):
+        """Line style for the idx'th series."""
+        return f'lw 3 lc rgb "{self.COLORS[idx % len(self.COLORS)]}"'
+
+    def _speedup(self, cmt, conf, sz):
+        """Speedup of a commit over the baseline for a configuration and size,
+           or None if we do not have the data."""
+        base = self._data[self._cmtlist[0]][conf]
+        new = self._data[cmt][conf]
+        if not base or not new or sz not in base or sz not in new:
+            return None
+        if new[sz]['s/Miter'] <= 0.0 or base[sz]['s/Miter'] <= 0.0:
+            return None
+        return base[sz]['s/Miter'] / new[sz]['s/Miter']
+
+    def _slowdown(self, cmt, conf, sz):
+        """Slowdown of a commit relative to native execution for a
+           configuration and size, or None if we do not have the data."""
+        res = self._data[cmt][conf]
+        if not self._native or not res or sz not in self._native \
+           or sz not in res:
+            return None
+        if self._native[sz]['s/Miter'] <= 0.0:
+            return None
+        return res[sz]['s/Miter'] / self._native[sz]['s/Miter']
+
+    def _datablock(self, name, lines):
+        """Record an inline data block, returning its gnuplot name."""
+        blkname = f'${name}'
+        self._blocks[blkname] = lines
+        return blkname
+
+    def _series(self, cmt, conf):
+        """Data block of size, Icnt/iter, s/Miter and ns/inst for one commit
+           and configuration.  None if there is no data."""
+        res = self._data[cmt][conf]
+        if not res:
+            return None
+        name = f'd_{self._cmtlist.index(cmt)}_{self._conflist.index(conf)}'
+        lines = [f"{sz} {row['Icnt/iter']} {row['s/Miter']} {row['ns/inst']}"
+                 for sz, row in sorted(res.items())]
+        return self._datablock(name, lines)
+
+    def _speedup_series(self, cmt, conf):
+        """Data block of size and speedup for one commit and configuration.
+           None if there is no data."""
+        lines = []
+        for sz in self._sizes:
+            spd = self._speedup(cmt, conf, sz)
+            if spd is not None:
+                lines.append(f'{sz} {spd}')
+        if not lines:
+            return None
+        name = f's_{self._cmtlist.index(cmt)}_{self._conflist.index(conf)}'
+        return self._datablock(name, lines)
+
+    def _slowdown_series(self, cmt, conf):
+        """Data block of size and slowdown versus native for one commit and
+           configuration.  None if there is no data."""
+        lines = []
+        for sz in self._sizes:
+            slow = self._slowdown(cmt, conf, sz)
+            if slow is not None:
+                lines.append(f'{sz} {slow}')
+        if not lines:
+            return None
+        name = f'n_{self._cmtlist.index(cmt)}_{self._conflist.index(conf)}'
+        return self._datablock(name, lines)
+
+    def _heatmap(self, cmt):
+        """Matrix data block of log2 speedup for one commit, with a row per
+           configuration and a column per size.  Also return the largest
+           absolute value, for scaling the palette."""
+        lines = []
+        maxabs = 0.0
+        for conf in self._conflist:
+            row = []
+            for sz in self._sizes:
+                spd = self._speedup(cmt, conf, sz)
+                if spd is None:
+                    row.append('NaN')
+                else:
+                    lspd = math.log2(spd)
+                    maxabs = max(maxabs, abs(lspd))
+                    row.append(f'{lspd:.6f}')
+            lines.append(' '.join(row))
+        name = f'h_{self._cmtlist.index(cmt)}'
+        return self._datablock(name, lines), maxabs
+
+    def _page_overlays(self):
+        """Instruction counts and timings for all commits."""
+        cmds = []
+        rows, cols = self._layout(len(self._conflist) + 1)
+        cmds.append(f'set multiplot layout {rows},{cols} '
+                    f'title "{self._bm} performance" noenhanced '
+                    f'margins 0.04, 0.98, 0.06, 0.90 spacing 0.08')
+        cmds.append('set title "Instruction counts"')
+        cmds.append('set yrange [0:*]')
+        cmds.append('set ylabel "instructions/iteration"')
+        plots = []
+        idx = 0
+        for cmt in self._cmtlist:
+            for conf in self._conflist:
+                blk = self._series(cmt, conf)
+                if blk:
+                    plots.append(f'{blk} using 1:2 title '
+                                 f'"{self._title(cmt)} {conf}" noenhanced '
+                                 f'with lines {self._color(idx)}')
+                idx += 1
+        cmds.append(self._plot(plots))
+
+        for conf in self._conflist:
+            cmds.append(f'set title "{conf} QEMU timings" noenhanced')
+            cmds.append('set ylabel "Time for 1M iterations (s)"')
+            plots = []
+            for idx, cmt in enumerate(self._cmtlist):
+                blk = self._series(cmt, conf)
+                if blk:
+                    plots.append(f'{blk} using 1:3 title "{self._title(cmt)}" '
+                                 f'noenhanced with lines {self._color(idx)}')
+            cmds.append(self._plot(plots))
+
+        cmds.append('unset multiplot')
+        return cmds
+
+    def _page_speedups(self):
+        """Speedup versus baseline for each configuration."""
+        cmds = []
+        rows, cols = self._layout(len(self._conflist))
+        cmds.append(f'set multiplot layout {rows},{cols} '
+                    f'title "{self._bm} speedup versus baseline" noenhanced '
+                    f'margins 0.04, 0.98, 0.06, 0.90 spacing 0.08')
+        cmds.append('set yrange [*:*]')
+        cmds.append('set ylabel "Speedup (baseline time / time)"')
+        for conf in self._conflist:
+            cmds.append(f'set title "{conf} speedup" noenhanced')
+            plots = ['1 notitle with lines lw 1 lc rgb "grey"']
+            for idx, cmt in enumerate(self._cmtlist[1:], start=1):
+                blk = self._speedup_series(cmt, conf)
+                if blk:
+                    plots.append(f'{blk} using 1:2 title "{self._title(cmt)}" '
+                                 f'noenhanced with lines {self._color(idx)}')
+            cmds.append(self._plot(plots))
+        cmds.append('unset multiplot')
+        return cmds
+
+    def _page_heatmaps(self):
+        """Heatmaps of speedup over size and configuration for each commit
+           other than the baseline."""
+        cmtlist = self._cmtlist[1:]
+        cmds = []
+        rows, cols = self._layout(len(cmtlist))
+        cmds.append(f'set multiplot layout {rows},{cols} '
+                    f'title "{self._bm} log2 speedup versus baseline" '
+                    f'noenhanced margins 0.06, 0.94, 0.08, 0.90 spacing 0.1')
+        # Sizes are not evenly spaced, so we label the matrix columns.
+        step = max(1, len(self._sizes) // 12)
+        xtics = ', '.join(f'"{sz}" {i}' for i, sz in enumerate(self._sizes)
+                          if i % step == 0)
+        ytics = ', '.join(f'"{conf}" {i}'
+                          for i, conf in enumerate(self._conflist))
+        cmds.append('unset logscale x')
+        cmds.append('unset grid')
+        cmds.append(f'set xtics ({xtics}) rotate by 45 right noenhanced')
+        cmds.append(f'set ytics ({ytics}) noenhanced')
+        cmds.append(f'set xrange [-0.5:{len(self._sizes) - 0.5}]')
+        cmds.append(f'set yrange [-0.5:{len(self._conflist) - 0.5}]')
+        cmds.append('set ylabel "Configuration"')
+        cmds.append('set palette defined (-1 "#ea4335", 0 "white", '
+                    '1 "#4285f4")')
+        for cmt in cmtlist:
+            blk, maxabs = self._heatmap(cmt)
+            maxabs = max(maxabs, 0.01)
+            cmds.append(f'set cbrange [{-maxabs}:{maxabs}]')
+            cmds.append(f'set title "{self._title(cmt)}" noenhanced')
+            cmds.append(f'plot {blk} matrix with image notitle')
+        cmds.append('unset multiplot')
+        return cmds
+
+    def _page_slowdown(self):
+        """QEMU slowdown versus native for each configuration."""
+        # The heatmaps change a lot of settings, so start afresh.
+        cmds = ['reset']
+        cmds.extend(self._settings())
+        cmds.append('set logscale y 10')
+        cmds.append('set ylabel "Slowdown (QEMU time / native time)"')
+        rows, cols = self._layout(len(self._conflist))
+        cmds.append(f'set multiplot layout {rows},{cols} '
+                    f'title "{self._bm} QEMU slowdown versus native" '
+                    f'noenhanced margins 0.04, 0.98, 0.06, 0.90 spacing 0.08')
+        for conf in self._conflist:
+            cmds.append(f'set title "{conf} slowdown" noenhanced')
+            plots = []
+            for idx, cmt in enumerate(self._cmtlist):
+                blk = self._slowdown_series(cmt, conf)
+                if blk:
+                    plots.append(f'{blk} using 1:2 title "{self._title(cmt)}" '
+                                 f'noenhanced with lines {self._color(idx)}')
+            cmds.append(self._plot(plots))
+        cmds.append('unset multiplot')
+        return cmds
+
+    @staticmethod
+    def _settings():
+        """The common settings for all the line graphs."""
+        return [
+            'set datafile missing "NaN"',
+            'set xlabel "Size"',
+            'set xtics out nomirror',
+            'set logscale x 10',
+            'set ytics out autofreq nomirror',
+            'set grid ytics',
+            'set key left top Left reverse',
+        ]
+
+    @staticmethod
+    def _plot(plots):
+        """A plot command for a list of series.  Gnuplot does not like an
+           empty plot, so we plot nothing visible if there are no series."""
+        if not plots:
+            return 'plot NaN notitle'
+        return 'plot ' + ', \\\n     '.join(plots)
+
+    def script(self, outfile):
+        """The complete gnuplot script for this benchmark, writing to the
+           given (PostScript) output file."""
+        self._blocks = {}
+        pages = []
+        pages.extend(self._page_overlays())
+        if len(self._cmtlist) > 1:
+            pages.extend(self._page_speedups())
+            pages.extend(self._page_heatmaps())
+        if self._native:
+            pages.extend(self._page_slowdown())
+
+        cmds = [f'# Graphs for {self._bm}', 'reset']
+        for blkname, lines in self._blocks.items():
+            cmds.append(f'{blkname} << EOD')
+            cmds.extend(lines)
+            cmds.append('EOD')
+        cmds.extend([
+            'set terminal postscript enhanced color landscape "Muli,8"',
+            f"set output '{outfile}'",
+        ])
+        cmds.extend(self._settings())
+        cmds.extend(pages)
+        cmds.append('set output')
+        return '\n'.join(cmds) + '\n'
+
+
+class TrendPlot:
+    """A class to generate the gnuplot script for the history of one
+       benchmark.
+
+       The series are a dictionary indexed by VLEN and then size class name
+       of lists of tuples of commit, date and ns/inst, in date order.  The
+       changes are a dictionary with the same indices of lists of tuples of
+       the index in the series of the first value after a change and the
+       relative change.  There is one graph per VLEN, with a line for each
+       size class and each change marked, red for a regression and blue for
+       an improvement."""
+
+    def __init__(self, bm, series, changes):
+        """Constructor just records the data to be plotted."""
+        self._bm = bm
+        self._series = series
+        self._changes = changes
+
+    def script(self, outfile):
+        """The complete gnuplot script for this benchmark, writing to the
+           given (PostScript) output file."""
+        blocks = []
+        graphs = []
+        for vi, (vlen, byclass) in enumerate(self._series.items()):
+            plots = []
+            for ci, (cls, points) in enumerate(byclass.items()):
+                name = f'$t_{vi}_{ci}'
+                blocks.append(f'{name} << EOD')
+                blocks.extend(f'{date:.0f} {val}' for _, date, val in points)
+                blocks.append('EOD')
+                color = BenchmarkPlot.COLORS[ci % len(BenchmarkPlot.COLORS)]
+                plots.append(f'{name} using 1:2 with lines lw 2 '
+                             f'lc rgb "{color}" title "{cls}"')
+                for kind, color in [('up', '#ea4335'), ('down', '#4285f4')]:
+                    marks = [points[k] for k, chg in
+                             self._changes.get(vlen, {}).get(cls, [])
+                             if (chg > 0.0) == (kind == 'up')]
+                    if not marks:
+                        continue
+                    mname = f'$c_{vi}_{ci}_{kind}'
+                    blocks.append(f'{mname} << EOD')
+                    blocks.extend(f'{date:.0f} {val}'
+                                  for _, date, val in marks)
+                    blocks.append('EOD')
+                    plots.append(f'{mname} using 1:2 with points pt 7 ps 1.2 '
+                                 f'lc rgb "{color}" notitle')
+            graphs.append(f'set title "{self._bm} VLEN {vlen} ns/inst"')
+            graphs.append(BenchmarkPlot._plot(plots))
+
+        rows, cols = BenchmarkPlot._layout(len(graphs) // 2)
+        cmds = [f'# History of {self._bm}', 'reset']
+        cmds.extend(blocks)
+        cmds.extend([
+            'set terminal postscript enhanced color landscape "Muli,8"',
+            f"set output '{outfile}'",
+            'set datafile missing "NaN"',
+            'set xdata time',
+            'set timefmt "%s"',
+            'set format x "%Y-%m-%d"',
+            'set xtics out nomirror rotate by -45',
+            'set ytics out autofreq nomirror',
+            'set grid ytics',
+            'set key left top Left reverse',
+            f'set multiplot layout {rows},{cols}',
+        ])
+        cmds.extend(graphs)
+        cmds.extend(['unset multiplot', 'set output'])
+        return '\n'.join(cmds) + '\n'
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Differential analysis of host profiles
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to compare host profiles of two QEMU commits, to find which helpers
+got more expensive and at which sizes.
+
+Profiles of different commits may run different numbers of iterations and
+so execute different numbers of guest instructions.  So we normalize the self
+cost of each symbol by the guest instructions executed, computed from the
+instruction count per iteration in the results.  If there is no instruction
+count we normalize by iterations instead.
+"""
+
+import csv
+import glob
+import os
+import os.path
+
+from flamegraph import DiffFlameGraph
+from profiling import HostProfile
+
+# What we export
+
+__all__ = [
+    'ProfileDiff',
+]
+
+
+class ProfileDiff:
+    """A class to compare the host profiles of each commit with those of the
+       baseline commit.
+
+       For each point (benchmark, configuration and size) profiled for both
+       commits, symbols are aligned by name, and the change in normalized
+       self cost is ranked by its magnitude."""
+
+    HEADER = ['Base', 'Commit', 'Benchmark', 'VLEN', 'Size', 'Symbol', 'Norm',
+              'Base cost', 'Cost', 'Delta', 'Ratio']
+
+    def __init__(self, conflist, args, log):
+        """Constructor loads the profiles and computes the differences."""
+        self._args = args
+        self._log = log
+        self._conflist = conflist
+        self._profdir = os.path.join(args.get('resdir'), 'profiles')
+        self.rows = []
+        self._compare()
+
+    def _profiles(self, cmt, bm, conf):
+        """The sizes for which there is a profile of a configuration."""
+        prefix = os.path.join(self._profdir, f'prof-{cmt}-{bm}-{conf}-')
+        sizes = []
+        for f in glob.glob(glob.escape(prefix) + '*.csv'):
+            try:
+                sizes.append(int(f[len(prefix):-len('.csv')]))
+            except ValueError:
+                continue
+        return sorted(sizes)
+
+    def _icnt_per_iter(self, cmt, bm, conf, sz):
+        """The guest instructions per iteration from the results, or None if
+           we do not have them."""
+        resfile = os.path.join(self._args.get('resdir'),
+                               f'{cmt}-{bm}-{conf}.csv')
+        try:
+            with open(resfile, 'r', newline='', encoding='utf-8') as csvf:
+                for row in csv.DictReader(csvf, dialect=csv.unix_dialect):
+                    if int(row['Size']) == sz:
+                        return float(row['Icnt/iter'])
+        except (OSError, KeyError, TypeError, ValueError):
+            pass
+        return None
+
+    def _load(self, cmt, bm, conf, sz):
+        """Load the profile of a point.  Return a tuple of the iteration
+           count and the dictionary of symbol costs, or None on failure."""
+        csvfile = os.path.join(self._profdir,
+                               f'prof-{cmt}-{bm}-{conf}-{sz}.csv')
+        try:
+            return HostProfile.read_csv(csvfile)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to read {csvfile}: {ename}')
+            return None
+
+    def _norms(self, base, cmt, bm, conf, sz, base_iters, iters):
+        """The name of the normalization and the divisor for the base and new
+           profiles."""
+        base_icpi = self._icnt_per_iter(base, bm, conf, sz)
+        icpi = self._icnt_per_iter(cmt, bm, conf, sz)
+        if base_icpi and icpi:
+            return 'guest insn', base_icpi * base_iters, icpi * iters
+        return 'iteration', float(base_iters), float(iters)
+
+    def _compare(self):
+        """Compare every commit with the baseline for every point profiled
+           in both."""
+        cmtlist = self._args.get('qemulist')
+        if len(cmtlist) < 2 or not os.path.isdir(self._profdir):
+            return
+        base = cmtlist[0]
+        for cmt in cmtlist[1:]:
+            for bm in self._args.get('bmlist'):
+                for conf in self._conflist:
+                    base_sizes = self._profiles(base, bm, conf)
+                    for sz in self._profiles(cmt, bm, conf):
+                        if sz in base_sizes:
+                            self._compare_point(base, cmt, bm, conf, sz)
+
+    def _compare_point(self, base, cmt, bm, conf, sz):
+        """Compare the profiles of two commits for a single point, adding
+           the results to our rows, ranked by size of change."""
+        base_prof = self._load(base, bm, conf, sz)
+        prof = self._load(cmt, bm, conf, sz)
+        if not base_prof or not prof or not base_prof[0] or not prof[0]:
+            return
+        norm, base_div, div = self._norms(base, cmt, bm, conf, sz,
+                                          base_prof[0], prof[0])
+        rows = []
+        for sym in set(base_prof[1]) | set(prof[1]):
+            base_self = base_prof[1].get(sym, (0.0, 0.0))[1]
+            new_self = prof[1].get(sym, (0.0, 0.0))[1]
+            if base_self is None or new_self is None:
+                continue
+            base_cost = base_self / base_div
+            cost = new_self / div
+            if base_cost == 0.0 and cost == 0.0:
+                continue
+            ratio = cost / base_cost if base_cost > 0.0 else None
+            rows.append((base, cmt, bm, conf, sz, sym, norm, base_cost, cost,
+                         cost - base_cost, ratio))
+        rows.sort(key=lambda r: abs(r[9]), reverse=True)
+        self.rows.extend(rows)
+        self._flamegraph(base, cmt, bm, conf, sz, base_div, div)
+
+    def _flamegraph(self, base, cmt, bm, conf, sz, base_div, div):
+        """Draw the differential flame graph for a point, if we have folded
+           stacks for both commits."""
+        base_fold = os.path.join(self._profdir,
+                                 f'prof-{base}-{bm}-{conf}-{sz}.folded')
+        fold = os.path.join(self._profdir,
+                            f'prof-{cmt}-{bm}-{conf}-{sz}.folded')
+        if not os.path.exists(base_fold) or not os.path.exists(fold):
+            return
+        svgdir = os.path.join(self._args.get('resdir'), 'flamegraphs')
+        svgfile = os.path.join(svgdir,
+                               f'diff-{base}-{cmt}-{bm}-{conf}-{sz}.svg')
+        try:
+            base_stacks = {k: v / base_div for k, v in
+                           HostProfile.read_folded(base_fold).items()}
+            stacks = {k: v / div for k, v in
+                      HostProfile.read_folded(fold).items()}
+            os.makedirs(svgdir, exist_ok=True)
+            title = f'{bm} VLEN={conf} size={sz}: {cmt} versus {base}'
+            DiffFlameGraph(title, base_stacks, stacks).write(svgfile)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to draw {svgfile}: {ename}')
+
+    def export_csv(self, csvfile):
+        """Export all the differences to a CSV file."""
+        with open(csvfile, 'w', newline='', encoding="utf-8") as csvf:
+            csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+            csvwriter.writerow(ProfileDiff.HEADER)
+            for row in self.rows:
+                csvwriter.writerow(['' if v is None else v for v in row])
+        self._log.info(f'Hot helper differences in {csvfile}')
+
+    def write_markdown(self, fh, top):
+        """Write the top changes for each commit as a Markdown table."""
+        for cmt in self._args.get('qemulist')[1:]:
+            rows = [r for r in self.rows if r[1] == cmt]
+            if not rows:
+                continue
+            rows.sort(key=lambda r: abs(r[9]), reverse=True)
+            fh.write(f'Largest changes for {cmt} versus {rows[0][0]}\n\n')
+            fh.write('| Benchmark | VLEN | Size | Symbol | Norm | Base cost '
+                     '| Cost | Delta | Ratio |\n')
+            fh.write('|:--|:--|--:|:--|:--|--:|--:|--:|--:|\n')
+            for r in rows[:top]:
+                _, _, bm, conf, sz, sym, norm, base_cost, cost, delta, ratio \
+                    = r
+                rstr = '-' if ratio is None else f'{ratio:.2f}'
+                fh.write(f'| {bm} | {conf} | {sz} | `{sym}` | {norm} | '
+                         f'{base_cost:.4g} | {cost:.4g} | {delta:+.4g} | '
+                         f'{rstr} |\n')
+            fh.write('\n')
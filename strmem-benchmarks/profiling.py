@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# Host profiling of QEMU runs
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to profile QEMU running a benchmark with "perf record", and turn
+the result into a table of the self and children cost of each host symbol,
+and into folded call stacks for flame graphs.
+
+This replaces the memcpy-benchmarks run-perf.sh script and its associated
+post-processing scripts.
+"""
+
+import csv
+import re
+
+# What we export
+
+__all__ = [
+    'HostProfile',
+]
+
+
+class HostProfile:
+    """A class to wrap commands with "perf record" and read the results.
+
+       We support three ways of collecting call graphs
+       - dwarf: accurate but very slow and generates huge data files
+       - fp: frame pointers, cheap, but only accurate if QEMU is built with
+             frame pointers
+       - lbr: last branch record, cheap, but only available on recent Intel
+              processors."""
+
+    MODES = ['dwarf', 'fp', 'lbr']
+
+    # perf record options for each mode
+    _RECORD_OPTS = {
+        'dwarf' : '-m 16M --call-graph dwarf,4096',
+        'fp'    : '--call-graph fp',
+        'lbr'   : '--call-graph lbr',
+    }
+
+    # Columns of the profile tables
+    HEADER = ['Benchmark', 'VLEN', 'Size', 'Iterations', 'Mode', 'Event',
+              'Symbol', 'Type', 'Children %', 'Self %', 'Children', 'Self']
+
+    # Regular expressions for parsing perf report
+    _EVENT_RE = re.compile(r"^#\s+Samples:.*of event '([^']+)'")
+    _COUNT_RE = re.compile(r'^#\s+Event count \(approx\.\):\s+(\d+)')
+    _LINE_RE = re.compile(
+        r'^\s*([\d.]+)%\s+([\d.]+)%\s+\[(.)\]\s+(\S.*?)\s*$')
+
+    @staticmethod
+    def iterations(sz, nbytes):
+        """The number of iterations to process nbytes with blocks of size sz.
+           Always at least one."""
+        return max(1, nbytes // max(1, sz))
+
+    @staticmethod
+    def record_cmd(cmd, datafile, mode):
+        """Wrap a command so perf record writes its samples to datafile."""
+        opts = HostProfile._RECORD_OPTS[mode]
+        return f'perf record -q -o {datafile} {opts} -- {cmd}'
+
+    @staticmethod
+    def report_cmd(datafile):
+        """The command to report a flat profile with children from
+           datafile."""
+        return f'perf report -i {datafile} --stdio --children ' + \
+            '--sort symbol -g none --percent-limit 0'
+
+    @staticmethod
+    def script_cmd(datafile, outfile):
+        """The command to dump the samples with their call stacks from
+           datafile to outfile."""
+        return f'perf script -i {datafile} -F period,ip,sym > {outfile}'
+
+    @staticmethod
+    def fold(lines):
+        """Fold the output of perf script into call stacks.  Return a
+           dictionary indexed by stack, outermost frame first and separated
+           by ";", of the total sample period for that stack.
+
+           Each sample is a line with its period, followed by a line for each
+           frame, innermost first and indented with a tab, and then a blank
+           line."""
+        stacks = {}
+        period = None
+        frames = []
+
+        def flush():
+            if period is not None and frames:
+                stack = ';'.join(reversed(frames))
+                stacks[stack] = stacks.get(stack, 0) + period
+
+        for line in lines:
+            if not line.strip():
+                flush()
+                period = None
+                frames = []
+            elif line.startswith('\t') and period is not None:
+                fields = line.split(None, 1)
+                sym = fields[1].strip() if len(fields) > 1 else fields[0]
+                # Remove any offset or DSO perf has added
+                sym = re.sub(r'\s+\(.*\)$', '', sym)
+                sym = re.sub(r'\+0x[0-9a-f]+$', '', sym)
+                frames.append(sym.replace(';', ':'))
+            else:
+                flush()
+                frames = []
+                m = re.search(r'\d+', line)
+                period = int(m.group(0)) if m else 1
+        flush()
+        return stacks
+
+    @staticmethod
+    def write_folded(filename, stacks):
+        """Write folded stacks, one per line followed by its count, which is
+           the format used by flame graph tools."""
+        with open(filename, 'w', encoding='utf-8') as fh:
+            for stack, cnt in sorted(stacks.items()):
+                fh.write(f'{stack} {cnt}\n')
+
+    @staticmethod
+    def read_folded(filename):
+        """Read folded stacks.  Return a dictionary indexed by stack of the
+           count."""
+        stacks = {}
+        with open(filename, 'r', encoding='utf-8') as fh:
+            for line in fh:
+                stack, _, cnt = line.rstrip('\n').rpartition(' ')
+                try:
+                    stacks[stack] = stacks.get(stack, 0) + float(cnt)
+                except ValueError:
+                    continue
+        return stacks
+
+    @staticmethod
+    def parse_report(text):
+        """Parse the output of perf report.  Return a tuple of the event name
+           and a list of tuples (symbol, type, children %, self %, children,
+           self), where children and self are event counts estimated from the
+           percentages.  Event name and counts are None if perf does not
+           report the totals."""
+        event = None
+        total = None
+        rows = []
+        for line in text.splitlines():
+            m = HostProfile._EVENT_RE.match(line)
+            if m:
+                event = m.group(1)
+                continue
+            m = HostProfile._COUNT_RE.match(line)
+            if m:
+                total = int(m.group(1))
+                continue
+            if line.startswith('#'):
+                continue
+            m = HostProfile._LINE_RE.match(line)
+            if m:
+                pc_child = float(m.group(1))
+                pc_self = float(m.group(2))
+                rows.append([m.group(4), m.group(3), pc_child, pc_self])
+
+        res = []
+        for sym, typ, pc_child, pc_self in rows:
+            if total is None:
+                res.append((sym, typ, pc_child, pc_self, None, None))
+            else:
+                res.append((sym, typ, pc_child, pc_self,
+                            pc_child * total / 100.0,
+                            pc_self * total / 100.0))
+        return event, res
+
+    @staticmethod
+    def write_csv(csvfile, point, event, rows):
+        """Write a profile table to a CSV file.  The point is a tuple of
+           benchmark, VLEN, size, iterations and mode."""
+        with open(csvfile, 'w', newline='', encoding="utf-8") as csvf:
+            csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+            csvwriter.writerow(HostProfile.HEADER)
+            for row in rows:
+                csvwriter.writerow(
+                    list(point) + [event or '']
+                    + ['' if v is None else v for v in row])
+
+    @staticmethod
+    def read_csv(csvfile):
+        """Read a profile table from a CSV file.  Return a tuple of the
+           iteration count and a dictionary indexed by symbol of a tuple of
+           children and self counts, which are None if unknown."""
+        iters = None
+        res = {}
+        with open(csvfile, 'r', newline='', encoding='utf-8') as csvf:
+            for row in csv.DictReader(csvf, dialect=csv.unix_dialect):
+                iters = int(row['Iterations'])
+                vals = []
+                for col in ['Children', 'Self']:
+                    try:
+                        vals.append(float(row[col]))
+                    except (TypeError, ValueError):
+                        vals.append(None)
+                res[row['Symbol']] = tuple(vals)
+        return iters, res
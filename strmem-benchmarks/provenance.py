@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# Provenance of results, and reuse of results from earlier campaigns
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to record where each result came from, so results from one
+campaign can safely be reused by another.
+
+Each campaign writes provenance.json in its results directory.  For each
+model this has a key, which is the hash of the benchmark executable, the
+fingerprint of the QEMU build, the digest of the host fingerprint and a
+digest of the parameters of the run, together with when each point was
+measured, and where any reused points came from.
+
+A later campaign can reuse a point from any earlier campaign in the archive
+whose key for the model is the same, provided the host did not drift while
+it was measured.
+"""
+
+import csv
+import glob
+import hashlib
+import json
+import os
+import os.path
+
+# What we export
+
+__all__ = [
+    'Provenance',
+    'ResultsArchive',
+]
+
+
+class Provenance:
+    """A class for the provenance of the results of a campaign."""
+
+    FILE = 'provenance.json'
+
+    # The arguments which change what is measured
+    PARAMS = ['verify', 'warmup', 'target_time', 'iter_bytes', 'xlate',
+              'xlate_repeats', 'insn_mix', 'insn_mix_iters', 'perf_counters']
+
+    @staticmethod
+    def file_digest(filename):
+        """The SHA-256 hash of a file, or None if it cannot be read."""
+        h = hashlib.sha256()
+        try:
+            with open(filename, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b''):
+                    h.update(chunk)
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    @staticmethod
+    def digest(obj):
+        """A short hash of anything which can be written as JSON."""
+        return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str)
+                              .encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def provfile(resdir):
+        """The provenance file of a campaign."""
+        return os.path.join(resdir, Provenance.FILE)
+
+    @staticmethod
+    def save(resdir, prov):
+        """Save the provenance of a campaign, a dictionary with its time,
+           datestamp, host, the arguments it was run with, a dictionary of
+           the hash of each QEMU commit measured indexed by name and a
+           dictionary of models indexed by suffix."""
+        with open(Provenance.provfile(resdir), 'w', encoding='utf-8') as fh:
+            json.dump(prov, fh, indent=1)
+
+    @staticmethod
+    def load(resdir):
+        """Load the provenance of a campaign, or None if there is none."""
+        try:
+            with open(Provenance.provfile(resdir), 'r',
+                      encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+
+class ResultsArchive:
+    """A class for the results of earlier campaigns which may be reused.
+
+       The archive is a directory of results directories, each with its
+       provenance.  The newest matching campaign is used."""
+
+    def __init__(self, args, log):
+        """Constructor finds all the campaigns in the archive, except the
+           current one."""
+        self._args = args
+        self._log = log
+        resdir = os.path.realpath(args.get('resdir'))
+        self._campaigns = []
+        for provf in glob.glob(os.path.join(args.get('archive'), '*',
+                                            Provenance.FILE)):
+            cdir = os.path.dirname(provf)
+            if os.path.realpath(cdir) == resdir:
+                continue
+            prov = Provenance.load(cdir)
+            if prov and 'models' in prov:
+                self._campaigns.append((prov.get('time', 0.0), cdir, prov))
+        self._campaigns.sort(key=lambda c: c[0], reverse=True)
+        self._log.debug(f'DEBUG: {len(self._campaigns)} campaigns in archive')
+
+    def find(self, suffix, key):
+        """The newest campaign with results for a model with the same key.
+           Return a tuple of the results directory and the provenance of the
+           model, or None if there is none."""
+        for _, cdir, prov in self._campaigns:
+            entry = prov['models'].get(suffix)
+            if entry and entry.get('key') == key:
+                return (cdir, entry)
+        return None
+
+    @staticmethod
+    def _num(val):
+        """A numeric value from a CSV field, None if empty."""
+        if val in (None, ''):
+            return None
+        try:
+            return float(val)
+        except ValueError:
+            return val
+
+    @staticmethod
+    def read(resfile):
+        """The results in a results CSV file, as a dictionary indexed by size
+           of tuples of iterations, time, icount and a dictionary of any
+           additional results.  Raises an exception if the file cannot be
+           read."""
+        res = {}
+        with open(resfile, 'r', newline='', encoding='utf-8') as csvf:
+            reader = csv.reader(csvf, dialect=csv.unix_dialect)
+            header = next(reader)
+            first_extra = header.index('s/Miter') + 1
+            for row in reader:
+                sz = int(row[header.index('Size')])
+                extra = {k: ResultsArchive._num(v) for k, v in
+                         zip(header[first_extra:], row[first_extra:])}
+                icnt = row[header.index('Icount')]
+                res[sz] = (int(row[header.index('Iterations')]),
+                           float(row[header.index('Time')]),
+                           int(icnt) if icnt else None, extra)
+        return res
+
+    def points(self, cdir, suffix, entry, sizes):
+        """The reusable points of a model from a campaign, for the given
+           sizes.  Return a dictionary indexed by size of tuples of the
+           result, the time it was measured and the campaign it was first
+           measured in.  Points which drifted are not reusable."""
+        threshold = self._args.get('sentinel_threshold')
+        resfile = os.path.join(cdir, suffix + '.csv')
+        try:
+            results = ResultsArchive.read(resfile)
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to read {resfile}: {ename}')
+            return {}
+        res = {}
+        for sz, result in results.items():
+            if sz not in sizes:
+                continue
+            drift = result[3].get('Drift')
+            if isinstance(drift, float) and abs(drift - 1.0) > threshold:
+                continue
+            measured = entry.get('measured', {}).get(str(sz))
+            source = entry.get('reused', {}).get(str(sz),
+                                                 os.path.basename(cdir))
+            res[sz] = (result, measured, source)
+        return res
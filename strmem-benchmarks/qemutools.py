@@ -15,6 +15,7 @@ Note that we don't have to do this in parallel, since each build should fully
 load up the machine anyway.
 """
 
+import hashlib
 import multiprocessing
 import os
 import os.path
@@ -22,6 +23,9 @@ import shutil
 import subprocess
 import sys
 
+from tracing import Tracer
+from tracing import traced
+
 # What we export
 
 __all__ = [
@@ -36,6 +40,7 @@ class QEMUBuilder:
        The install and build paths are derived from the generic install and
        build paths passed as arguments.
     """
+    @traced('phase')
     def __init__(self, cmt, args, log):
         """Constructor for the builder, which actually does the building."""
         base_suffix = 'qemu-' + str(cmt) + '-'
@@ -44,6 +49,8 @@ class QEMUBuilder:
         self.cmt = cmt
         self._args = args
         self._log = log
+        self._tracer = Tracer(args)
+        self._fingerprint = None
         self.builddir = {}
         self.installdir = {}
         # Build plugin and no plugin versions.  Only checkout once
@@ -51,9 +58,17 @@ class QEMUBuilder:
         for plt in ['plugin', 'no-plugin']:
             self.builddir[plt] = os.path.join(base_bd, base_suffix + plt)
             self.installdir[plt] = os.path.join(base_id, base_suffix + plt)
-            self._log.info(f'Building QEMU commit {self.cmt} {plt} version')
+            if self._args.get('build'):
+                self._log.info(
+                    f'Building QEMU commit {self.cmt} {plt} version')
+            else:
+                self._log.info(
+                    f'Using built QEMU commit {self.cmt} {plt} version')
             self._build_qemu(plt, do_checkout)
 
+        # What the commit named, which a branch will not always name
+        self.hash = self._resolve()
+
         # Only have a QEMU plugin in one case
         self.qemuplugin = self._find_qemu_plugin()
         if not self.qemuplugin:
@@ -61,6 +76,7 @@ class QEMUBuilder:
             log.error(f'{emess} for commit {self.cmt} {plt} version')
             sys.exit(1)
 
+    @traced('subprocess')
     def _checkout(self):
         """Checkout the desired QEMU commit. Give up on failure.
         """
@@ -97,6 +113,27 @@ class QEMUBuilder:
                     f'ERROR: Checkout of QEMU commit {self.cmt} failed.')
                 sys.exit(1)
 
+    @traced('subprocess')
+    def _resolve(self):
+        """The full hash of the commit in the QEMU repository, or None if we
+           cannot get it."""
+        try:
+            res = subprocess.run(
+                f'git rev-parse --verify {self.cmt}^{{commit}}',
+                shell=True,
+                executable='/bin/bash',
+                cwd=self._args.get('qemudir'),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self._args.get('timeout'),
+                check=True,
+            )
+            return res.stdout.decode('utf-8').strip() or None
+        except (subprocess.SubprocessError, OSError):
+            self._log.debug(f'DEBUG: Unable to resolve QEMU commit {self.cmt}')
+            return None
+
+    @traced('subprocess')
     def _clean(self, plt):
         """Prepare a clean build.  Argument supplied is 'plugin' or
            'no-plugin'.  Since they are used for nothing else, we can just
@@ -120,6 +157,7 @@ class QEMUBuilder:
                 f'{emess} {self.installdir[plt]} failed: {ename}.')
             sys.exit(1)
 
+    @traced('subprocess')
     def _configure(self, plt):
         """Configure the desired QEMU commit.  Argument supplied is 'plugin'
            or 'no-plugin', which controls how we configure the build.  Give up
@@ -177,6 +215,7 @@ class QEMUBuilder:
             self._log.debug(e.stderr)
             sys.exit(1)
 
+    @traced('subprocess')
     def _build(self, plt):
         """Build the configured QEMU, giving up on failure.  Argument supplied
            is 'plugin' or 'no-plugin'."""
@@ -209,6 +248,7 @@ class QEMUBuilder:
             self._log.debug(e.stderr)
             sys.exit(1)
 
+    @traced('subprocess')
     def _install(self, plt):
         """Install the configured QEMU, giving up on failure.  Argument supplied
            is 'plugin' or 'no-plugin'."""
@@ -268,6 +308,23 @@ class QEMUBuilder:
         else:
             self._validate(plt)
 
+    def fingerprint(self):
+        """A hash of the QEMU executables and plugin we built, which
+           identifies the build whatever the commit is called."""
+        if not self._fingerprint:
+            h = hashlib.sha256()
+            for plt in ['plugin', 'no-plugin']:
+                q64 = os.path.join(self.installdir[plt], 'bin', 'qemu-riscv64')
+                files = [q64]
+                if plt == 'plugin':
+                    files.append(self.qemuplugin)
+                for f in files:
+                    with open(f, 'rb') as fh:
+                        for chunk in iter(lambda: fh.read(1 << 20), b''):
+                            h.update(chunk)
+            self._fingerprint = h.hexdigest()[:16]
+        return self._fingerprint
+
     def _find_qemu_plugin(self):
         """Find the QEMU libinsn plugin from its build directory.  This
            directory  moves around depending on the specific QEMU version
@@ -12,6 +12,11 @@
 We have a set of CSV files from which we report.
 """
 
+import concurrent.futures
+import csv
+import getpass
+import hashlib
+import math
 import os
 import os.path
 import shutil
@@ -19,6 +24,18 @@ import subprocess
 import tempfile
 import textwrap
 
+from analysis import CostModel
+from hostenv import HostFingerprint
+from implementations import ImplRegistry
+from insnmix import MixAttribution
+from modeling import Model
+from modeling import NativeModel
+from provenance import Provenance
+from plotting import BenchmarkPlot
+from profdiff import ProfileDiff
+from tracing import Tracer
+from tracing import traced
+
 # What we export
 
 __all__ = [
@@ -37,25 +54,67 @@ class Reporter:
         self._modelset = modelset
         self._args = args
         self._log = log
+        self._tracer = Tracer(args)
+        self._conflist = modelset.conflist(args)
         self.results = {}
+        self.data = {}
+        self.native = {}
         self._setup()
 
+    @traced('phase')
     def _setup(self):
-        """Figure out all the results we have."""
+        """Figure out all the results we have and load them."""
         resdir = self._args.get('resdir')
         for cmt in self._args.get('qemulist'):
             self.results[cmt] = {}
+            self.data[cmt] = {}
             for bm in self._args.get('bmlist'):
                 self.results[cmt][bm] = {}
-                for vlen in self._args.get('vlenlist'):
-                    resname = f'{cmt}-{bm}-{vlen}.csv'
+                self.data[cmt][bm] = {}
+                for conf in self._conflist:
+                    resname = f'{cmt}-{bm}-{conf}.csv'
                     resfile = os.path.join(resdir, resname)
                     if os.path.exists(resfile):
-                        self.results[cmt][bm][vlen] = resfile
+                        self.results[cmt][bm][conf] = resfile
+                        self.data[cmt][bm][conf] = self._read_csv(resfile)
                     else:
-                        self.results[cmt][bm][vlen] = None
+                        self.results[cmt][bm][conf] = None
+                        self.data[cmt][bm][conf] = None
                         self._log.debug(f'DEBUG: Did not find {resfile}')
 
+        # Native results if we have them.
+        for bm in self._args.get('bmlist'):
+            resname = f'{NativeModel.CMT}-{bm}-stdlib.csv'
+            resfile = os.path.join(resdir, resname)
+            if os.path.exists(resfile):
+                self.native[bm] = self._read_csv(resfile)
+            else:
+                self.native[bm] = None
+
+    def _read_csv(self, resfile):
+        """Read a results CSV file.  Return a dictionary indexed by size of
+           dictionaries of the numeric columns, or None if the file cannot be
+           read."""
+        res = {}
+        try:
+            with open(resfile, 'r', newline='', encoding='utf-8') as csvf:
+                for row in csv.DictReader(csvf, dialect=csv.unix_dialect):
+                    vals = {}
+                    for k, v in row.items():
+                        try:
+                            vals[k] = float(v)
+                        except (TypeError, ValueError):
+                            vals[k] = v
+                    res[int(row['Size'])] = vals
+        except Exception as e:
+            ename = type(e).__name__
+            self._log.warning(f'Warning: Unable to read {resfile}: {ename}')
+            return None
+
+        if not res:
+            return None
+        return res
+
     def _report_version(self, cmd, fh, width):
         """The cmd should report a tool's version. Write this to the given
            file handle, folding at the given width."""
@@ -89,6 +148,382 @@ class Reporter:
             fh.write(f'{lines}\n')
             fh.write('```\n')
 
+    def _report_costmodel(self, fh):
+        """Fit the cost models, saving them as CSV in the results directory
+           and writing them as a table to the given file handle."""
+        fh.write('For each commit, benchmark and configuration, time per call '
+                 'is fitted as a piecewise linear function of size, with a '
+                 'breakpoint where the data justifies it.  Overhead and '
+                 'ns/byte are for sizes up to the breakpoint, the large '
+                 'values for sizes above it.  Crossover is the size from '
+                 'which the vector code is always faster than the standard '
+                 'library.\n\n')
+        costmodel = CostModel(self._conflist, self._args, self._log)
+        costfile = os.path.join(self._args.get('resdir'), 'cost-model.csv')
+        try:
+            costmodel.export_csv(costfile)
+        except Exception as e:
+            ename=type(e).__name__
+            self._log.warning(f'Warning: Unable to write {costfile}: {ename}')
+        costmodel.write_markdown(fh)
+        fh.write('\n')
+
+    def _report_slowdown(self, fh):
+        """Write a table of the geometric mean over all sizes of the time
+           under QEMU of the standard library code divided by the native
+           time for each benchmark and commit."""
+        cmtlist = self._args.get('qemulist')
+        fh.write('Geometric mean over all sizes of the time for the standard '
+                 'library code under QEMU divided by the native time.  The '
+                 'graphs for each benchmark show slowdown by size for all '
+                 'configurations.\n\n')
+        fh.write('| Benchmark | ' + ' | '.join(cmtlist) + ' |\n')
+        fh.write('|:--|' + '--:|' * len(cmtlist) + '\n')
+        for bm in self._args.get('bmlist'):
+            native = self.native[bm]
+            cols = []
+            for cmt in cmtlist:
+                res = self.data[cmt][bm].get('stdlib')
+                logs = []
+                if native and res:
+                    for sz, row in res.items():
+                        if sz in native and native[sz]['s/Miter'] > 0.0 \
+                           and row['s/Miter'] > 0.0:
+                            logs.append(math.log(row['s/Miter'] /
+                                                 native[sz]['s/Miter']))
+                if logs:
+                    cols.append(f'{math.exp(sum(logs) / len(logs)):.1f}')
+                else:
+                    cols.append('-')
+            fh.write(f'| {bm} | ' + ' | '.join(cols) + ' |\n')
+        fh.write('\n')
+
+    @staticmethod
+    def _geomean(vals):
+        """Geometric mean of the positive numbers in a list, or None if there
+           are none."""
+        logs = [math.log(v) for v in vals
+                if isinstance(v, float) and v > 0.0]
+        if not logs:
+            return None
+        return math.exp(sum(logs) / len(logs))
+
+    def _have_translation(self):
+        """Do we have any separate translation results?"""
+        for cmtdata in self.data.values():
+            for bmdata in cmtdata.values():
+                for res in bmdata.values():
+                    if res and any('ns/TB' in row for row in res.values()):
+                        return True
+        return False
+
+    def _report_translation(self, fh):
+        """Write a table of the geometric mean over all sizes of the
+           translation time per translation block and the steady state
+           execution time for each benchmark, configuration and commit."""
+        cmtlist = self._args.get('qemulist')
+        fh.write('Geometric mean over all sizes of the translation time per '
+                 'translation block (ns/TB) and the steady state execution '
+                 'time (s/Miter) for each commit.  Translation time is the '
+                 'time for the first iteration less QEMU startup and the '
+                 'execution time of one iteration.  The per size values, '
+                 'together with the number of blocks translated, are in the '
+                 'results CSV files.\n\n')
+        fh.write('| Benchmark | VLEN | ' +
+                 ' | '.join(f'{cmt} ns/TB | {cmt} s/Miter' for cmt in cmtlist)
+                 + ' |\n')
+        fh.write('|:--|:--|' + '--:|--:|' * len(cmtlist) + '\n')
+        for bm in self._args.get('bmlist'):
+            for conf in self._conflist:
+                cols = []
+                for cmt in cmtlist:
+                    res = self.data[cmt][bm].get(conf) or {}
+                    for col, fmt in [('ns/TB', '.0f'), ('s/Miter', '.3f')]:
+                        gm = self._geomean([row.get(col)
+                                            for row in res.values()])
+                        cols.append('-' if gm is None else f'{gm:{fmt}}')
+                if any(c != '-' for c in cols[::2]):
+                    fh.write(f'| {bm} | {conf} | ' + ' | '.join(cols)
+                             + ' |\n')
+        fh.write('\n')
+
+    def _report_host(self, fh, host):
+        """Write the fingerprint of the host, and list any points for which
+           the sentinel shows the host drifted beyond the threshold."""
+        fh.write('| Setting | Value |\n')
+        fh.write('|:--|:--|\n')
+        for k, v in host.items():
+            if isinstance(v, list):
+                v = ', '.join(f'{x:.2f}' for x in v)
+            fh.write(f'| {k} | {"-" if v is None else v} |\n')
+        fh.write('\n')
+
+        threshold = self._args.get('sentinel_threshold')
+        drifted = []
+        for cmt, cmtdata in self.data.items():
+            for bm, bmdata in cmtdata.items():
+                for conf, res in bmdata.items():
+                    for sz, row in (res or {}).items():
+                        d = row.get('Drift')
+                        if isinstance(d, float) and abs(d - 1.0) > threshold:
+                            drifted.append(f'{cmt}-{bm}-{conf}:{sz} '
+                                           f'({d:.3f})')
+        if drifted:
+            fh.write('The host drifted beyond the threshold while measuring '
+                     'these points, even after measuring them again.  Divide '
+                     'their time by the drift shown to normalize it.\n\n')
+            for p in drifted:
+                fh.write(f'- {p}\n')
+            fh.write('\n')
+
+    def _report_reused(self, fh, prov):
+        """Write a table of the points reused from earlier campaigns, with
+           their age when this campaign ran."""
+        fh.write('These points of the baseline commit were measured by an '
+                 'earlier campaign with the same executable, QEMU build, '
+                 'host and parameters, and reused.\n\n')
+        fh.write('| Configuration | Points | Campaign | Age (days) |\n')
+        fh.write('|:--|--:|:--|--:|\n')
+        for suffix, entry in sorted(prov['models'].items()):
+            sources = {}
+            for sz, source in entry['reused'].items():
+                sources.setdefault(source, []).append(
+                    entry['measured'].get(sz))
+            for source, whens in sorted(sources.items()):
+                known = [w for w in whens if w is not None]
+                if known:
+                    age = (prov['time'] - min(known)) / 86400.0
+                    agestr = f'{age:.1f}'
+                else:
+                    agestr = '-'
+                fh.write(f'| {suffix} | {len(whens)} | {source} | '
+                         f'{agestr} |\n')
+        fh.write('\n')
+
+    def _report_reruns(self, fh, prov):
+        """Write a table of the points measured again after the campaign,
+           with the latest time each was measured again and the time it
+           replaced."""
+        fh.write('These points were measured again after the campaign, '
+                 'with the same iterations, taking the median of several '
+                 'repetitions.  Spread is the range of the repetitions '
+                 'relative to the median.\n\n')
+        fh.write('| Configuration | Size | When | Repeats | Spread % | '
+                 'Previous time | Reruns |\n')
+        fh.write('|:--|--:|:--|--:|--:|--:|--:|\n')
+        for suffix, entry in sorted(prov['models'].items()):
+            for sz, reruns in sorted(entry.get('reruns', {}).items(),
+                                     key=lambda r: int(r[0])):
+                last = reruns[-1]
+                if last['spread'] is None:
+                    spread = '-'
+                else:
+                    spread = f'{100.0 * last["spread"]:.1f}'
+                fh.write(f'| {suffix} | {sz} | {last["datestamp"]} | '
+                         f'{last["repeats"]} | {spread} | '
+                         f'{last["previous"]["time"]:.3f} | '
+                         f'{len(reruns)} |\n')
+        fh.write('\n')
+
+    def _report_options(self, fh):
+        """Write a table of how sensitive each benchmark is to each set of
+           QEMU runtime options.  This is the geometric mean over all sizes of
+           the time with the options divided by the time without them."""
+        cmtlist = self._args.get('qemulist')
+        optsets = self._args.get('qemu_optsets')
+        fh.write('Geometric mean over all sizes of the time with each set of '
+                 'QEMU runtime options divided by the time with the default '
+                 'options.  Values above 1 mean the options make the '
+                 'benchmark slower.\n\n')
+        for name, (cpuprops, qemuargs) in optsets.items():
+            fh.write(f'- {name}: `{" ".join([cpuprops, qemuargs]).strip()}`'
+                     '\n')
+        fh.write('\n')
+        fh.write('| Benchmark | Config | Options | ' + ' | '.join(cmtlist)
+                 + ' |\n')
+        fh.write('|:--|:--|:--|' + '--:|' * len(cmtlist) + '\n')
+        for bm in self._args.get('bmlist'):
+            for vlen in self._args.get('vlenlist'):
+                for lmul in self._modelset.lmuls(self._args, vlen):
+                    baseconf = Model.confname(vlen, lmul, '')
+                    for name in optsets:
+                        conf = Model.confname(vlen, lmul, name)
+                        cols = []
+                        for cmt in cmtlist:
+                            gm = self._relative(cmt, bm, conf, baseconf)
+                            cols.append('-' if gm is None else f'{gm:.2f}')
+                        fh.write(f'| {bm} | {baseconf} | {name} | '
+                                 + ' | '.join(cols) + ' |\n')
+        fh.write('\n')
+
+    def _report_placements(self, fh):
+        """Write a table of how sensitive each benchmark is to the placement
+           of its data buffers.  This is the geometric mean over all sizes of
+           the time with each placement divided by the time with buffers just
+           allocated by malloc."""
+        cmtlist = self._args.get('qemulist')
+        places = [p[0] for p in self._args.get('placement_sets') if p[0]]
+        fh.write('Geometric mean over all sizes of the time with each '
+                 'placement of the data buffers divided by the time with '
+                 'buffers allocated by malloc.  Placements are aligned to 64 '
+                 'bytes, straddling a page boundary or ending at a guard '
+                 'page, with any source (s) and destination (d) offsets in '
+                 'bytes.\n\n')
+        fh.write('| Benchmark | Config | Placement | ' + ' | '.join(cmtlist)
+                 + ' |\n')
+        fh.write('|:--|:--|:--|' + '--:|' * len(cmtlist) + '\n')
+        for bm in self._args.get('bmlist'):
+            for vlen in self._args.get('vlenlist'):
+                for lmul in self._modelset.lmuls(self._args, vlen):
+                    baseconf = Model.confname(vlen, lmul, '')
+                    for place in places:
+                        conf = Model.confname(vlen, lmul, '', place)
+                        cols = []
+                        for cmt in cmtlist:
+                            gm = self._relative(cmt, bm, conf, baseconf)
+                            cols.append('-' if gm is None else f'{gm:.2f}')
+                        fh.write(f'| {bm} | {baseconf} | {place} | '
+                                 + ' | '.join(cols) + ' |\n')
+        fh.write('\n')
+
+    def _report_impls(self, fh):
+        """Write a table comparing each implementation of the vector code
+           with the standard library.  This is the geometric mean over all
+           sizes of the time with the implementation divided by the time with
+           the standard library."""
+        cmtlist = self._args.get('qemulist')
+        fh.write('Geometric mean over all sizes of the time with each '
+                 'implementation divided by the time with the standard '
+                 'library, using the default buffer placement and QEMU '
+                 'options.  Values below 1 mean the implementation is '
+                 'faster.\n\n')
+        fh.write('| Benchmark | Config | Implementation | '
+                 + ' | '.join(cmtlist) + ' |\n')
+        fh.write('|:--|:--|:--|' + '--:|' * len(cmtlist) + '\n')
+        baseconf = Model.confname('stdlib', '1', '')
+        for bm in self._args.get('bmlist'):
+            for vlen in self._args.get('vlenlist'):
+                if vlen == 'stdlib':
+                    continue
+                for impl in self._modelset.impls(self._args, vlen, bm):
+                    implname = '' if impl.name == ImplRegistry.DEFAULT \
+                        else impl.name
+                    for lmul in self._modelset.lmuls(self._args, vlen, impl):
+                        conf = Model.confname(vlen, lmul, '', '', implname)
+                        cols = []
+                        for cmt in cmtlist:
+                            gm = self._relative(cmt, bm, conf, baseconf)
+                            cols.append('-' if gm is None else f'{gm:.2f}')
+                        fh.write(f'| {bm} | {conf} | {impl.name} | '
+                                 + ' | '.join(cols) + ' |\n')
+        fh.write('\n')
+
+    def _relative(self, cmt, bm, conf, baseconf):
+        """Geometric mean over all sizes of the time for a configuration
+           divided by the time for a base configuration, or None if there is
+           no data."""
+        base = self.data[cmt][bm].get(baseconf) or {}
+        res = self.data[cmt][bm].get(conf) or {}
+        return self._geomean([row['s/Miter'] / base[sz]['s/Miter']
+                              for sz, row in res.items()
+                              if sz in base and base[sz]['s/Miter'] > 0.0])
+
+    def _report_lmul(self, fh):
+        """Write a table of the time with each LMUL relative to LMUL=1, or
+           the smallest LMUL run if not 1, for each benchmark, VLEN and
+           commit, and save the best LMUL for each size as CSV in the results
+           directory."""
+        lmullist = self._args.get('lmullist')
+        reflmul = '1' if '1' in lmullist else min(lmullist, key=int)
+        fh.write('Geometric mean over all sizes of the time with each LMUL '
+                 f'divided by the time with LMUL={reflmul}, using the default '
+                 'QEMU options.  The best LMUL for each size is in lmul.csv '
+                 'in the results directory.\n\n')
+        fh.write('| Benchmark | VLEN | Commit | '
+                 + ' | '.join(f'm{lmul}' for lmul in lmullist)
+                 + ' | Best |\n')
+        fh.write('|:--|:--|:--|' + '--:|' * len(lmullist) + ':--|\n')
+        csvrows = []
+        for bm in self._args.get('bmlist'):
+            for vlen in self._args.get('vlenlist'):
+                if vlen == 'stdlib':
+                    continue
+                baseconf = Model.confname(vlen, reflmul, '')
+                for cmt in self._args.get('qemulist'):
+                    rels = [self._relative(cmt, bm,
+                                           Model.confname(vlen, lmul, ''),
+                                           baseconf)
+                            for lmul in lmullist]
+                    if all(r is None for r in rels):
+                        continue
+                    best = min((r, lmul) for r, lmul in zip(rels, lmullist)
+                               if r is not None)[1]
+                    cols = ['-' if r is None else f'{r:.2f}' for r in rels]
+                    fh.write(f'| {bm} | {vlen} | {cmt} | ' + ' | '.join(cols)
+                             + f' | m{best} |\n')
+                    csvrows.extend(self._lmul_sizes(cmt, bm, vlen))
+        fh.write('\n')
+        lmulfile = os.path.join(self._args.get('resdir'), 'lmul.csv')
+        try:
+            with open(lmulfile, 'w', newline='', encoding="utf-8") as csvf:
+                csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+                csvwriter.writerow(['Commit', 'Benchmark', 'VLEN', 'Size',
+                                    'Best LMUL']
+                                   + [f'm{lmul} s/Miter' for lmul in lmullist])
+                csvwriter.writerows(csvrows)
+        except Exception as e:
+            ename=type(e).__name__
+            self._log.warning(f'Warning: Unable to write {lmulfile}: {ename}')
+
+    def _lmul_sizes(self, cmt, bm, vlen):
+        """Rows of the best LMUL and the time for each LMUL for each size."""
+        lmullist = self._args.get('lmullist')
+        res = [self.data[cmt][bm].get(Model.confname(vlen, lmul, '')) or {}
+               for lmul in lmullist]
+        rows = []
+        for sz in sorted({sz for r in res for sz in r}):
+            times = [r[sz]['s/Miter'] if sz in r else None for r in res]
+            best = min((t, lmul) for t, lmul in zip(times, lmullist)
+                       if t is not None)[1]
+            rows.append([cmt, bm, vlen, sz, best]
+                        + ['' if t is None else t for t in times])
+        return rows
+
+    def _report_insn_mix(self, fh, mixattr):
+        """Write the cost attributed to each guest instruction class, saving
+           the costs as CSV in the results directory."""
+        fh.write('For each commit, benchmark and VLEN, time per iteration '
+                 'is fitted as the sum of the guest instructions per '
+                 'iteration in each class times a cost per instruction for '
+                 'the class, in ns, over all sizes and configurations.  The '
+                 'instruction counts for each configuration are in the mix '
+                 'directory of the results.\n\n')
+        mixfile = os.path.join(self._args.get('resdir'), 'insn-mix.csv')
+        try:
+            mixattr.export_csv(mixfile)
+        except Exception as e:
+            ename=type(e).__name__
+            self._log.warning(f'Warning: Unable to write {mixfile}: {ename}')
+        mixattr.write_markdown(fh)
+
+    def _report_hot_helpers(self, fh, profdiff):
+        """Write the largest changes in host symbol cost between the baseline
+           and each other commit, saving all the changes as CSV in the results
+           directory."""
+        fh.write('Self cost of each host symbol from the profiles, in sampled '
+                 'events (normally cycles) per guest instruction, or per '
+                 'iteration if there is no instruction count.  Ranked by the '
+                 'size of the change.  Differential flame graphs for each '
+                 'point are in the flamegraphs directory of the results.\n\n')
+        difffile = os.path.join(self._args.get('resdir'), 'hot-helpers.csv')
+        try:
+            profdiff.export_csv(difffile)
+        except Exception as e:
+            ename=type(e).__name__
+            self._log.warning(f'Warning: Unable to write {difffile}: {ename}')
+        profdiff.write_markdown(fh, 20)
+
+    @traced('phase')
     def _report_main(self, omitlist):
         """Generate the main section of the report.  Return the PDF file
            generated or None on failure."""
@@ -112,7 +547,7 @@ class Reporter:
         # Now open to append the specifics
         with open(tmpmd, mode="a", encoding="utf-8") as fh:
             datestamp = self._args.get('datestamp')
-            user = os.getlogin()
+            user = getpass.getuser()
             fh.write(f'- Datestamp: {datestamp}\n')
             fh.write(f'- User: {user}\n\n')
             fh.write('## Functions to be benchmarked\n\n')
@@ -122,6 +557,47 @@ class Reporter:
                     fh.write(f'- {bm} **(failed)**\n\n')
                 else:
                     fh.write(f'- {bm}\n\n')
+            fh.write('## Cost model\n\n')
+            self._report_costmodel(fh)
+            if any(self.native.values()):
+                fh.write('## QEMU slowdown versus native\n\n')
+                self._report_slowdown(fh)
+            if self._args.get('impls') != [ImplRegistry.DEFAULT]:
+                fh.write('## Comparison of implementations\n\n')
+                self._report_impls(fh)
+            if len(self._args.get('lmullist')) > 1:
+                fh.write('## Choice of LMUL\n\n')
+                self._report_lmul(fh)
+            if any(p[0] == '' for p in self._args.get('placement_sets')) \
+               and len(self._args.get('placement_sets')) > 1:
+                fh.write('## Sensitivity to buffer placement\n\n')
+                self._report_placements(fh)
+            if self._args.get('qemu_optsets'):
+                fh.write('## Sensitivity to QEMU options\n\n')
+                self._report_options(fh)
+            if self._have_translation():
+                fh.write('## Translation versus execution\n\n')
+                self._report_translation(fh)
+            mixattr = MixAttribution(self._conflist, self._args, self._log)
+            if mixattr.fits:
+                fh.write('## Instruction mix\n\n')
+                self._report_insn_mix(fh, mixattr)
+            profdiff = ProfileDiff(self._conflist, self._args, self._log)
+            if profdiff.rows:
+                fh.write('## Hot helper changes\n\n')
+                self._report_hot_helpers(fh, profdiff)
+            prov = Provenance.load(self._args.get('resdir'))
+            if prov and any(e['reused'] for e in prov['models'].values()):
+                fh.write('## Reused measurements\n\n')
+                self._report_reused(fh, prov)
+            if prov and any(e.get('reruns') for e in prov['models'].values()):
+                fh.write('## Re-measured points\n\n')
+                self._report_reruns(fh, prov)
+            host = HostFingerprint.load(
+                HostFingerprint.hostfile(self._args.get('resdir')))
+            if host:
+                fh.write('## Host environment\n\n')
+                self._report_host(fh, host)
             fh.write('## QEMU versions\n\n')
             for cmt in self._args.get('qemulist'):
                 fh.write(f'- {cmt}\n\n')
@@ -139,6 +615,20 @@ class Reporter:
             self._report_version(f'{ldd} --version -v', fh, 105)
 
         # Use pandoc to create the PDF file.
+        try:
+            return tmppdf if self._run_pandoc(tmpmd, tmppdf) else None
+        finally:
+            # The markdown file can now be deleted.
+            try:
+                os.remove(tmpmd)
+            except Exception as e:
+                self._log.debug(
+                    'Debug: Unable to delete temporary Markdown {tmpmd}')
+
+    @traced('subprocess')
+    def _run_pandoc(self, tmpmd, tmppdf):
+        """Run pandoc to turn the Markdown of the main report into PDF.
+           Return True on success, False on failure."""
         cmd = f'pandoc -s -V geometry:landscape {tmpmd} -o {tmppdf}'
         try:
             res = subprocess.run(
@@ -156,46 +646,21 @@ class Reporter:
             self._log.debug(e.cmd)
             self._log.debug(e.stdout)
             self._log.debug(e.stderr)
-            return None
+            return False
         except subprocess.CalledProcessError as e:
             self._log.error('ERROR: Pandoc failed.')
             self._log.debug(e.cmd)
             self._log.debug(e.stdout)
-            return None
-        else:
-            if res.returncode == 0:
-                return tmppdf
+            return False
 
-            return None
-        finally:
-            # The markdown file can now be deleted.
-            try:
-                os.remove(tmpmd)
-            except Exception as e:
-                self._log.debug(
-                    'Debug: Unable to delete temporary Markdown {tmpmd}')
+        return res.returncode == 0
 
-    def _plotpdf(self, bm):
-        """Generate graph for the specified benchmark.  Return the PDF file
-           generated on success, or None on failure."""
-        cmtlist = self._args.get('qemulist')
-        oldqemu = cmtlist[0]
-        newqemu = cmtlist[1]
-        vlenlist = self._args.get('vlenlist')
-        vlen1 = vlenlist[0]
-        vlen2 = vlenlist[1]
-        vlen3 = vlenlist[2]
-        plotcmd=os.path.join(self._args.get('strmemdir'),
-                             'plot-one-benchmark.sh')
-        cmd = f'{plotcmd} --benchmark "{bm}" ' \
-            f'--old-qemu "baseline (#{oldqemu}))" ' \
-            f'--new-qemu "latest (#{newqemu})" ' \
-	    f'--old-scalar-data "{self.results[oldqemu][bm][vlen1]}" ' \
-	    f'--new-scalar-data "{self.results[newqemu][bm][vlen1]}" ' \
-	    f'--old-small-vector-data "{self.results[oldqemu][bm][vlen2]}" ' \
-	    f'--new-small-vector-data "{self.results[newqemu][bm][vlen2]}" ' \
-	    f'--old-large-vector-data "{self.results[oldqemu][bm][vlen3]}" ' \
-	    f'--new-large-vector-data "{self.results[newqemu][bm][vlen3]}"'
+    @traced('subprocess')
+    def _combine_pdfs(self, reportfile, pdflist):
+        """Run gs to combine the main PDF and the graphs into the report.
+           Return True on success, False on failure."""
+        cmd = f'gs -dNOPAUSE -sDEVICE=pdfwrite -dBATCH ' \
+	    f'-sOUTPUTFILE="{reportfile}" {pdflist}'
         try:
             res = subprocess.run(
                 cmd,
@@ -208,98 +673,170 @@ class Reporter:
                 check=True,
             )
         except subprocess.TimeoutExpired as e:
-            self._log.error(f'ERROR: Plotting {bm} timed out.')
+            self._log.error('ERROR: PDF combining timed out.')
             self._log.debug(e.cmd)
             self._log.debug(e.stdout)
             self._log.debug(e.stderr)
-            return None
+            return False
         except subprocess.CalledProcessError as e:
-            self._log.error(f'ERROR: Plotting {bm} failed.')
+            self._log.error('ERROR: PDF combining failed.')
             self._log.debug(e.cmd)
             self._log.debug(e.stdout)
-            return None
+            return False
 
         if res.returncode != 0:
-            self._log.error(f'ERROR: Plotting {bm} failed: {res}.')
+            self._log.error('ERROR: PDF combining failed.')
             self._log.debug(cmd)
-            self._log.debug(res.stdout.decode('utf-8'))
-            self._log.debug(res.stderr.decode('utf-8'))
-            return None
+            return False
+
+        return True
+
+    @traced('subprocess')
+    def _plot_one(self, bm, script, plotfile):
+        """Run gnuplot on the script for one benchmark, which will write
+           plotfile.  Return True on success, False on failure."""
+        try:
+            subprocess.run(
+                'gnuplot',
+                shell=True,
+                executable='/bin/bash',
+                cwd=self._args.get('strmemdir'),
+                input=script.encode('utf-8'),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self._args.get('timeout'),
+                check=True,
+            )
+        except subprocess.TimeoutExpired as e:
+            self._log.error(f'ERROR: Plotting {bm} timed out.')
+            self._log.debug(e.stdout)
+            self._log.debug(e.stderr)
+            return False
+        except subprocess.CalledProcessError as e:
+            self._log.error(f'ERROR: Plotting {bm} failed.')
+            self._log.debug(e.stdout)
+            self._log.debug(e.stderr)
+            return False
+
+        return os.path.exists(plotfile)
+
+    @traced('phase')
+    def _plot_all(self, bmlist):
+        """Generate graphs for all the specified benchmarks.  Return a
+           dictionary indexed by benchmark of the PostScript file generated,
+           or None on failure.
+
+           Each graph is cached under a hash of its gnuplot script, which
+           contains all the data and plotting parameters, so we only need to
+           run gnuplot for graphs whose data has changed.  Those we do need
+           are run concurrently.  We use threads rather than processes, since
+           all the work is in the gnuplot subprocesses."""
+        cachedir = os.path.join(self._args.get('strmemdir'), 'graphs', 'cache')
+        try:
+            os.makedirs(cachedir, exist_ok=True)
+        except Exception as e:
+            ename=type(e).__name__
+            self._log.error(f'ERROR: Unable to create {cachedir}: {ename}')
+            return {bm: None for bm in bmlist}
+
+        cmtlist = self._args.get('qemulist')
+        plotfiles = {}
+        todo = {}
+        for bm in bmlist:
+            data = {cmt: self.data[cmt][bm] for cmt in cmtlist}
+            bmplot = BenchmarkPlot(bm, cmtlist, self._conflist, data,
+                                   self.native[bm])
+            key = hashlib.sha256(
+                bmplot.script('PLOTFILE').encode('utf-8')).hexdigest()
+            plotfile = os.path.join(cachedir, f'{bm}-{key[:16]}.ps')
+            plotfiles[bm] = plotfile
+            if os.path.exists(plotfile):
+                self._log.debug(f'DEBUG: Using cached graph {plotfile}')
+            else:
+                todo[bm] = bmplot
+
+        self._log.info(f'Plotting {len(todo)} graphs, ' \
+                       f'{len(bmlist) - len(todo)} cached')
+        resf = {}
+        tmpfiles = {}
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=os.cpu_count()) as executor:
+            for bm, bmplot in todo.items():
+                tmpfiles[bm] = plotfiles[bm] + '.tmp'
+                script = bmplot.script(tmpfiles[bm])
+                resf[bm] = executor.submit(self._plot_one, bm, script,
+                                           tmpfiles[bm])
 
-        return os.path.join(self._args.get('strmemdir'), 'graphs', f'{bm}.pdf')
+            for _ in concurrent.futures.as_completed(resf.values()):
+                print('.', end='', flush=True)
+        if resf:
+            print()
 
+        # Only completed graphs are moved into the cache, so an interrupted
+        # or failed plot is never mistaken for a valid one.
+        for bm, r in resf.items():
+            if r.result():
+                os.replace(tmpfiles[bm], plotfiles[bm])
+            else:
+                plotfiles[bm] = None
+                try:
+                    os.remove(tmpfiles[bm])
+                except FileNotFoundError:
+                    pass
+
+        return plotfiles
+
+    @traced('phase')
     def gen_report(self):
-        """Generate the report.  For now we only report with two QEMU commits
-           and three configs ."""
+        """Generate the report for any number of QEMU commits and
+           configurations.  The first commit is the baseline."""
         self._log.info('Generating report')
-        if len(self._args.get('qemulist')) != 2:
-            self._log.warning('Warning: Can only report with two QEMU commits.')
+        if not self._args.get('qemulist'):
+            self._log.warning('Warning: No QEMU commits to report.')
             return False
-        if len(self._args.get('vlenlist')) != 3:
-            self._log.warning('Warning: Can only report with three configs.')
+        if not self._conflist:
+            self._log.warning('Warning: No configurations to report.')
             return False
 
-        # Create all the graphs.
-        plotlist = []
+        # Work out what we can plot.  We plot a benchmark if it has any
+        # results, noting any missing datasets.
+        bmlist = []
         omitlist = []
-
         cmtlist = self._args.get('qemulist')
-        vlenlist = self._args.get('vlenlist')
         for bm in self._args.get('bmlist'):
-            canplot = True
-            for cmt in cmtlist:
-                for vlen in vlenlist:
-                    if not self.results[cmt][bm][vlen]:
-                        canplot = False
-            if canplot:
-                plotpdf = self._plotpdf(bm)
-                if plotpdf:
-                    plotlist.append(plotpdf)
-                    print('.', end='', flush=True)
-            else:
+            bmconfs = self._modelset.conflist(self._args, bm)
+            missing = [f'{cmt}-{conf}' for cmt in cmtlist
+                       for conf in bmconfs
+                       if not self.data[cmt][bm][conf]]
+            if len(missing) == len(cmtlist) * len(bmconfs):
                 omitlist.append(bm)
-                self._log.warning(f'\nWarning: Unable to plot for {bm}')
+                self._log.warning(f'Warning: Unable to plot for {bm}')
+            else:
+                bmlist.append(bm)
+                if missing:
+                    mstr = ', '.join(missing)
+                    self._log.warning(
+                        f'Warning: No results for {bm} with {mstr}')
 
-        print()
+        # Create all the graphs.
+        plotlist = []
+        for bm, plotfile in self._plot_all(bmlist).items():
+            if plotfile:
+                plotlist.append(plotfile)
+            else:
+                omitlist.append(bm)
 
         # Create a PDF with the main file.
         tmppdf = self._report_main(omitlist)
 
-        # Combine all the PDFs
+        # Combine the main PDF with all the PostScript graphs
         reportname = 'report-' + self._args.get('datestamp') + '.pdf'
         reportfile = os.path.join(self._args.get('strmemdir'), reportname)
         if tmppdf:
             pdflist = f'{tmppdf} ' + ' '.join(plotlist)
         else:
             pdflist = ' '.join(plotlist)
-        cmd = f'gs -dNOPAUSE -sDEVICE=pdfwrite -dBATCH ' \
-	    f'-sOUTPUTFILE="{reportfile}" {pdflist}'
-        try:
-            res = subprocess.run(
-                cmd,
-                shell=True,
-                executable='/bin/bash',
-                cwd=self._args.get('strmemdir'),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=self._args.get('timeout'),
-                check=True,
-            )
-        except subprocess.TimeoutExpired as e:
-            self._log.error('ERROR: PDF combining timed out.')
-            self._log.debug(e.cmd)
-            self._log.debug(e.stdout)
-            self._log.debug(e.stderr)
-            return False
-        except subprocess.CalledProcessError as e:
-            self._log.error('ERROR: PDF combining failed.')
-            self._log.debug(e.cmd)
-            self._log.debug(e.stdout)
-            return False
-
-        if res.returncode != 0:
-            self._log.error('ERROR: PDF combining failed.')
-            self._log.debug(cmd)
+        if not self._combine_pdfs(reportfile, pdflist):
             return False
 
         self._log.info(f'Report in {reportfile}')
@@ -16,12 +16,14 @@ It is based on a generic Embecosm framework for such benchmarking.
 
 import sys
 
+from history import History
 from support import Log
 from support import check_python_version
 from parseargs import ParseArgs
 from qemutools import QEMUBuilder
 from modeling import ModelSet
 from reporting import Reporter
+from tracing import Tracer
 
 def main():
     """Main program driving calculations"""
@@ -30,20 +32,36 @@ def main():
     log.setup(args.get('logdir'),
               args.get('log_prefix') + '-' + args.get('datestamp') + '.log')
     args.logall(log)
+    tracer = Tracer(args)
+    tracer.reset()
+    start = Tracer.now()
     # Create the QEMU executables
     qemu_builds = []
     for cmt in args.get('qemulist'):
         qemu_builds.append(QEMUBuilder(cmt, args, log))
-    # Unless we are just reporting, create all the configurations, then build
-    # them in parallel, then run them in parallel, then post-process.
-    if not args.get('report_only'):
+    # When measuring points again, use the existing configurations and
+    # results.  Otherwise, unless we are just reporting, create all the
+    # configurations, then build them in parallel, then run them in parallel,
+    # then post-process, then profile any selected points.
+    if args.get('rerun'):
+        res = ModelSet(qemu_builds, args, log, fresh=False)
+        res.rerun()
+    elif not args.get('report_only'):
         res = ModelSet(qemu_builds, args, log)
         res.build()
         res.run()
         res.generate_csv()
+        if args.get('history'):
+            hist = History(args.get('history'), log)
+            hist.ingest(args.get('resdir'), args.get('qemudir'))
+            hist.close()
+        res.profile()
     # Report the results
     rpt = Reporter(ModelSet, args, log)
     rpt.gen_report()
+    # Export the timeline of everything we did
+    tracer.complete('campaign', 'phase', start)
+    tracer.export(log)
 
 # Make sure we have new enough Python and only run if this is the main package
 check_python_version(3, 10)
@@ -12,6 +12,8 @@
 #include <stdio.h>
 #include <stdlib.h>
 
+#include "benchmark-support.h"
+
 extern void benchmark_wrapper (size_t size, size_t iters);
 #ifdef VERIF
 extern bool benchmark_verify (size_t size, size_t iters);
@@ -24,6 +26,12 @@ extern bool benchmark_verify (size_t size, size_t iters);
    of "iterations".  The "size" parameter is context specific.  For example
    for memcpy it would be size of the block to copy.
 
+   Optionally these may be followed by the placement of the data buffers
+   ("malloc", "aligned", "straddle" or "guard"), and the offset in bytes of
+   source and destination buffers from that placement.  This allows the cost
+   of misaligned accesses and accesses across page boundaries to be
+   measured.
+
    The normal mode of operation is to run a program twice for a given size,
    once with a small number of iterations, once with a large number of
    iterations. The two timings can then be subtracted to give a timing, just
@@ -41,18 +49,33 @@ main (int argc, char* argv[])
 {
   size_t size;
   size_t iters;
+  enum mem_placement placement = PLACE_MALLOC;
+  size_t src_offset = 0;
+  size_t dst_offset = 0;
 
-  if (argc != 3)
+  if ((argc < 3) || (argc > 6))
     {
-      printf ("Usage: benchmark_main <size> <iterations>\n");
+      printf ("Usage: benchmark_main <size> <iterations> "
+	      "[<placement> [<src offset> [<dst offset>]]]\n");
       exit (1);
     }
   else
     {
       size = (size_t) strtoul(argv[1], NULL, 0);
       iters = (size_t) strtoul(argv[2], NULL, 0);
+      if ((argc > 3) && (mem_parse_placement (argv[3], &placement) != 0))
+	{
+	  printf ("ERROR: Unknown placement %s\n", argv[3]);
+	  exit (1);
+	}
+      if (argc > 4)
+	src_offset = (size_t) strtoul(argv[4], NULL, 0);
+      if (argc > 5)
+	dst_offset = (size_t) strtoul(argv[5], NULL, 0);
     }
 
+  mem_set_placement (placement, src_offset, dst_offset);
+
   /* Make random seeding explicit (this is in fact implicit). */
   srand (1);
 
@@ -7,7 +7,147 @@
 
 #include <stddef.h>
 #include <stdint.h>
+#include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include "benchmark-support.h"
+
+/* Alignment used for aligned placement and as the base for offsets.  This is
+   a typical cache line size. */
+#define ALIGN_BYTES  64
+
+/* How benchmark buffers are placed. */
+static enum mem_placement mem_place = PLACE_MALLOC;
+static size_t mem_offset[] = { 0, 0 };
+
+/* Convert the name of a placement to its enumeration value.
+
+   @param[in]  name       Name of the placement
+   @param[out] placement  Where to put the result
+   @return  Zero on success, non-zero if the name is not recognized. */
+int
+mem_parse_placement (const char *name, enum mem_placement *placement)
+{
+  static const char *names[] = { "malloc", "aligned", "straddle", "guard" };
+
+  for (size_t i = 0; i < sizeof (names) / sizeof (names[0]); i++)
+    if (strcmp (name, names[i]) == 0)
+      {
+	*placement = (enum mem_placement) i;
+	return 0;
+      }
+
+  return 1;
+}
+
+/* Set how subsequent buffers are placed.
+
+   @param[in] placement   How to place buffers
+   @param[in] src_offset  Offset in bytes of source buffers from the aligned
+			  (or malloc) address
+   @param[in] dst_offset  Offset in bytes of destination buffers from the
+			  aligned (or malloc) address */
+void
+mem_set_placement (enum mem_placement placement, size_t src_offset,
+		   size_t dst_offset)
+{
+  mem_place = placement;
+  mem_offset[ROLE_SRC] = src_offset;
+  mem_offset[ROLE_DST] = dst_offset;
+}
+
+/* Allocate a buffer in its own pages, with a final guard page which may not
+   be accessed.  Any memory access beyond the guard will fault.
+
+   If straddle is true, the buffer is placed so a page boundary is inside it,
+   starting at the offset beyond a multiple of ALIGN_BYTES nearest to having
+   the boundary in its middle.  If the buffer is too short for any such start
+   to reach the boundary, the boundary is put in its middle regardless of the
+   offset.  Otherwise the buffer ends exactly at the guard page, so the
+   alignment of its start follows from its length and the offset is not
+   used.
+
+   @param[in] len       Size of the buffer in bytes
+   @param[in] off       Offset of the buffer from an aligned address
+   @param[in] straddle  True if the buffer should straddle a page boundary
+   @return  Pointer to the buffer.  We exit on failure. */
+static void *
+mem_alloc_paged (size_t len, size_t off, int straddle)
+{
+  size_t pagesize = (size_t) sysconf (_SC_PAGESIZE);
+  size_t npages = (len + 2 * ALIGN_BYTES + 1) / pagesize + 3;
+  uint8_t *base = mmap (NULL, npages * pagesize, PROT_READ | PROT_WRITE,
+			MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+  if (base == MAP_FAILED)
+    {
+      perror ("mmap");
+      exit (1);
+    }
+
+  uint8_t *guard = base + (npages - 1) * pagesize;
+  if (mprotect (guard, pagesize, PROT_NONE) != 0)
+    {
+      perror ("mprotect");
+      exit (1);
+    }
+
+  if (!straddle)
+    return guard - len;
+
+  uintptr_t boundary = (uintptr_t) base
+    + ((len / 2 + ALIGN_BYTES) / pagesize + 1) * pagesize;
+  uintptr_t mid = boundary - len / 2;
+  uintptr_t start;
+
+  off %= ALIGN_BYTES;
+  start = ((mid - off) & ~((uintptr_t) ALIGN_BYTES - 1)) + off;
+  if (start + len <= boundary)
+    start += ALIGN_BYTES;
+  if (start >= boundary || start + len <= boundary)
+    start = mid;
+  return (void *) start;
+}
+
+/* Allocate a buffer for a benchmark, placed according to the current
+   placement settings.  Buffers are never freed.
+
+   @param[in] len   Size of the buffer in bytes
+   @param[in] role  Whether this is a source or destination buffer
+   @return  Pointer to the buffer.  We exit on failure. */
+void *
+mem_alloc (size_t len, enum mem_role role)
+{
+  size_t off = mem_offset[role];
+  uint8_t *p;
+
+  switch (mem_place)
+    {
+    case PLACE_STRADDLE:
+      return mem_alloc_paged (len, off, 1);
+
+    case PLACE_GUARD:
+      return mem_alloc_paged (len, off, 0);
+
+    case PLACE_ALIGNED:
+      p = malloc (len + off + ALIGN_BYTES);
+      if (p == NULL)
+	break;
+      return (void *) ((((uintptr_t) p + ALIGN_BYTES - 1)
+			& ~((uintptr_t) ALIGN_BYTES - 1)) + off);
+
+    default:
+      p = malloc (len + off);
+      if (p == NULL)
+	break;
+      return p + off;
+    }
+
+  printf ("ERROR: Unable to allocate buffer\n");
+  exit (1);
+}
 
 /* Initialize a byte array with random values.
 
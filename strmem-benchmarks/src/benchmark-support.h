@@ -8,6 +8,27 @@
 #include <stddef.h>
 #include <stdint.h>
 
+/* Where benchmark buffers are placed in memory. */
+enum mem_placement
+  {
+    PLACE_MALLOC,	/* Just use malloc (the default) */
+    PLACE_ALIGNED,	/* Aligned to a cache line */
+    PLACE_STRADDLE,	/* Straddling a page boundary */
+    PLACE_GUARD		/* Ending immediately before a guard page */
+  };
+
+/* The role of a benchmark buffer, which determines its offset. */
+enum mem_role
+  {
+    ROLE_SRC,
+    ROLE_DST
+  };
+
+extern int   mem_parse_placement (const char *name,
+				  enum mem_placement *placement);
+extern void  mem_set_placement (enum mem_placement placement,
+				size_t src_offset, size_t dst_offset);
+extern void *mem_alloc (size_t len, enum mem_role role);
 extern void  mem_init_random (uint8_t *ptr, size_t len);
 extern void  mem_init_zero (uint8_t *ptr, size_t len);
 extern void  str_init_random (char *str, size_t len);
@@ -41,7 +41,7 @@ void
 benchmark_wrapper (size_t size, size_t iters)
 {
   /* Initialize */
-  data = malloc (size);
+  data = mem_alloc (size, ROLE_SRC);
   mem_init_random (data, size);
 
   /* Benchmark */
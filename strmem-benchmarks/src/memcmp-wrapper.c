@@ -48,8 +48,8 @@ benchmark_wrapper (size_t size, size_t iters)
   /* Initialize */
   for (size_t i = 0; i < DATASETS; i++)
     {
-      data1[i] = malloc (size);
-      data2[i] = malloc (size);
+      data1[i] = mem_alloc (size, ROLE_SRC);
+      data2[i] = mem_alloc (size, ROLE_DST);
       mem_init_random (data1[i], size);
       mem_init_random (data2[i], size);
     }
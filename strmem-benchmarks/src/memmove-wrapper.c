@@ -39,8 +39,8 @@ void
 benchmark_wrapper (size_t size, size_t iters)
 {
   /* Initialize */
-  dst = malloc (size);
-  src = malloc (size);
+  dst = mem_alloc (size, ROLE_DST);
+  src = mem_alloc (size, ROLE_SRC);
   mem_init_zero (dst, size);
   mem_init_random (src, size);
 
@@ -43,7 +43,7 @@ benchmark_wrapper (size_t size, size_t iters)
   /* Initialize */
   for (size_t i = 0; i < DATASETS; i++)
     {
-      data[i] = malloc (size);
+      data[i] = mem_alloc (size, ROLE_DST);
       mem_init_random (data[i], size);
     }
 
@@ -41,7 +41,7 @@ void
 benchmark_wrapper (size_t size, size_t iters)
 {
   /* Initialize */
-  data = malloc (size + 1);
+  data = mem_alloc (size + 1, ROLE_SRC);
   str_init_random (data, size);
 
   /* Benchmark */
@@ -45,7 +45,7 @@ benchmark_wrapper (size_t size, size_t iters)
   /* Initialize */
   for (size_t i = 0; i < DATASETS; i++)
     {
-      data[i] = malloc (size + 1);
+      data[i] = mem_alloc (size + 1, ROLE_SRC);
       str_init_random (data[i], size);
     }
 
@@ -45,8 +45,8 @@ benchmark_wrapper (size_t size, size_t iters)
 {
   /* Initialize. Note we do manual copying to dst_orig to avoid using the
      very functions we are testing. */
-  dst = malloc (size + size + 1);
-  src = malloc (size + size + 1);
+  dst = mem_alloc (size + size + 1, ROLE_DST);
+  src = mem_alloc (size + size + 1, ROLE_SRC);
   str_init_const (dst, size, '@');
   str_init_random (src, size + size);
 
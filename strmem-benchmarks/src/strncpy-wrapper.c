@@ -40,8 +40,8 @@ void
 benchmark_wrapper (size_t size, size_t iters)
 {
   /* Initialize */
-  dst = malloc (size + size + 1);
-  src = malloc (size + size + 1);
+  dst = mem_alloc (size + size + 1, ROLE_DST);
+  src = mem_alloc (size + size + 1, ROLE_SRC);
   str_init_const (dst, size + size, '@');
   str_init_random (src, size + size);
 
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+
+# Stand in tools for benchmarking the harness
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to create stand in versions of all the external tools the harness
+uses, so the harness itself can be run and measured on any Linux machine,
+without a RISC-V tool chain or real QEMU builds.
+
+There is a single stub program, which behaves as the tool it is named as.
+QEMU burns CPU for a synthetic time and writes synthetic plugin and debug
+logs, make builds empty executables and installs copies of the stub as QEMU,
+and the reporting tools just write their output files.  The synthetic costs
+are read from a JSON file, and every invocation appends a JSON line to a log
+with its own wall and CPU time, so these can be separated from the time
+taken by the harness.
+
+QEMU is checked out from a small git repository holding the stub configure
+script, with a branch for each commit.
+"""
+
+import json
+import os
+import os.path
+import shutil
+import stat
+import subprocess
+import sys
+
+# What we export
+
+__all__ = [
+    'StubTools',
+]
+
+
+# The stub program.  @PYTHON@, @CONFIG@ and @SUPPORT@ are replaced when it
+# is created.
+_STUB_SRC = r'''#!@PYTHON@
+
+# Stand in for a tool used by the benchmarking harness.  Generated by
+# stubtools.py, do not edit.
+
+import json
+import math
+import os
+import os.path
+import re
+import shutil
+import sys
+import time
+
+# Records are appended to the log just as the harness appends its own
+sys.path.append('@SUPPORT@')
+from support import append_jsonl
+
+START = time.time()
+CONFIG = '@CONFIG@'
+
+with open(CONFIG, 'r', encoding='utf-8') as fh:
+    cfg = json.load(fh)
+
+
+def burn(secs):
+    """Use secs of CPU time, which is what the harness measures."""
+    end = time.process_time() + secs
+    while time.process_time() < end:
+        pass
+
+
+def record(tool, **fields):
+    """Append a record of this invocation to the log."""
+    t = os.times()
+    rec = {'tool': tool, 'start': START, 'wall': time.time() - START,
+           'cpu': t.user + t.system}
+    rec.update(fields)
+    append_jsonl(cfg['log'], rec)
+
+
+def write(filename, text):
+    """Write text to filename."""
+    with open(filename, 'w', encoding='utf-8') as fh:
+        fh.write(text)
+
+
+def insn(pc, mnemonic):
+    """A line of the QEMU in_asm log."""
+    return f'0x{pc:016x}:  00000013          {mnemonic}\n'
+
+
+def qemu_log(filename, dlog, sz, iters, vlen):
+    """Write a synthetic in_asm log, and if asked an exec log.  The start
+       up is a number of scalar blocks, executed once.  The function is a
+       single vector loop block, executed once per vector of each
+       iteration, only translated if there are any iterations."""
+    start_pc = 0x10000
+    loop_pc = 0x20000
+    loop = ['vsetvli', 'vle8.v', 'vse8.v', 'add', 'sub', 'bnez']
+    ntbs = cfg['start_tbs']
+    lines = []
+    for i in range(ntbs):
+        pc = start_pc + 0x100 * i
+        lines.append('IN: start\n')
+        lines += [insn(pc + 4 * j, m)
+                  for j, m in enumerate(['addi', 'ld', 'sd', 'bne'])]
+        if 'exec' in dlog:
+            lines.append(f'Trace 0: 0x0 [00000000/{pc:016x}/00000000/'
+                         '00000000] start\n')
+    if iters > 0:
+        lines.append('IN: loop\n')
+        lines += [insn(loop_pc + 4 * j, m) for j, m in enumerate(loop)]
+        if 'exec' in dlog:
+            nvec = iters * max(1, math.ceil(sz * 8 / vlen))
+            tline = f'Trace 0: 0x0 [00000000/{loop_pc:016x}/00000000/' \
+                '00000000] loop\n'
+            lines += [tline] * nvec
+    write(filename, ''.join(lines))
+
+
+def qemu(tool, argv):
+    """Run a benchmark.  The executable is the first argument ending in
+       .exe, followed by the size, iterations and any placement."""
+    exe = [i for i, a in enumerate(argv) if a.endswith('.exe')]
+    if not exe or not os.path.exists(argv[exe[0]]):
+        print(f'{tool}: no benchmark executable', file=sys.stderr)
+        return 1
+    opts = argv[:exe[0]]
+    sz = int(argv[exe[0] + 1])
+    iters = int(argv[exe[0] + 2])
+    logf = None
+    dlog = ''
+    plugin = False
+    vlen = 128
+    for i, a in enumerate(opts[:-1]):
+        if a == '-D':
+            logf = opts[i + 1]
+        elif a in ['-d', '--d']:
+            dlog += ',' + opts[i + 1]
+        elif a == '-plugin':
+            plugin = True
+        elif a == '-cpu':
+            m = re.search(r'vlen=(\d+)', opts[i + 1])
+            if m:
+                vlen = int(m.group(1))
+    burn(cfg['qemu_start'] + 1.0e-9 * iters * (cfg['ns_per_iter']
+                                               + cfg['ns_per_byte'] * sz))
+    if plugin and logf:
+        icnt = cfg['start_insns'] + iters * (cfg['insns_per_iter']
+                                             + cfg['insns_per_byte'] * sz)
+        write(logf, f'total insns: {int(icnt)}\n')
+    elif logf and 'in_asm' in dlog:
+        qemu_log(logf, dlog, sz, iters, vlen)
+    record('qemu', size=sz, iters=iters, plugin=plugin)
+    return 0
+
+
+def configure(tool, argv):
+    """Record how QEMU is configured in the build directory."""
+    prefix = None
+    for a in argv:
+        if a.startswith('--prefix='):
+            prefix = a[len('--prefix='):]
+    write('stub-config.json',
+          json.dumps({'prefix': prefix,
+                      'plugins': '--enable-plugins' in argv}))
+    record(tool)
+    return 0
+
+
+def make(tool, argv):
+    """Build a benchmark, or build or install QEMU."""
+    bm = [a[len('BENCHMARK='):] for a in argv if a.startswith('BENCHMARK=')]
+    if bm:
+        burn(cfg['build_time'])
+        write(f'benchmark-{bm[0]}.exe', 'stub\n')
+        record(tool, what='benchmark')
+        return 0
+    with open('stub-config.json', 'r', encoding='utf-8') as fh:
+        qcfg = json.load(fh)
+    if 'install' in argv:
+        bindir = os.path.join(qcfg['prefix'], 'bin')
+        os.makedirs(bindir, exist_ok=True)
+        for q in ['qemu-riscv64', 'qemu-riscv32']:
+            shutil.copy(os.path.abspath(__file__), os.path.join(bindir, q))
+        record(tool, what='install')
+        return 0
+    burn(cfg['qemu_build_time'])
+    if qcfg['plugins']:
+        os.makedirs(os.path.join('tests', 'plugin'), exist_ok=True)
+        write(os.path.join('tests', 'plugin', 'libinsn.so'), 'stub\n')
+    record(tool, what='qemu')
+    return 0
+
+
+def outfile(tool, argv):
+    """Write the output file of a reporting tool."""
+    fname = None
+    if tool == 'gnuplot':
+        m = re.search(r"set output '([^']+)'", sys.stdin.read())
+        fname = m.group(1) if m else None
+    elif tool == 'pandoc' and '-o' in argv[:-1]:
+        fname = argv[argv.index('-o') + 1]
+    elif tool == 'gs':
+        for a in argv:
+            if a.startswith('-sOUTPUTFILE='):
+                fname = a[len('-sOUTPUTFILE='):]
+    if fname:
+        write(fname, 'stub\n')
+    record(tool)
+    return 0
+
+
+def version(tool, argv):
+    """Report a version."""
+    print(f'{tool} (stub) 0.0')
+    record(tool)
+    return 0
+
+
+TOOLS = {
+    'qemu-riscv64' : qemu,
+    'qemu-riscv32' : qemu,
+    'configure' : configure,
+    'make' : make,
+    'gnuplot' : outfile,
+    'pandoc' : outfile,
+    'gs' : outfile,
+}
+
+if __name__ == '__main__':
+    name = os.path.basename(sys.argv[0])
+    sys.exit(TOOLS.get(name, version)(name, sys.argv[1:]))
+'''
+
+
+class StubTools:
+    """A class to create the stand in tools and read back what they did.
+
+       The synthetic costs are CPU seconds for QEMU start up and for each
+       benchmark and QEMU build, ns for each iteration and for each byte of
+       each iteration, and the same for instruction counts, and the number
+       of translation blocks of start up code."""
+
+    # The tools we stand in for on the path
+    BIN_TOOLS = ['make', 'gnuplot', 'pandoc', 'gs',
+                 'riscv64-unknown-linux-gnu-gcc',
+                 'riscv64-unknown-linux-gnu-as',
+                 'riscv64-unknown-linux-gnu-ld']
+
+    DEFAULTS = {
+        'qemu_start' : 0.005,
+        'ns_per_iter' : 20.0,
+        'ns_per_byte' : 0.25,
+        'start_insns' : 100000,
+        'insns_per_iter' : 20,
+        'insns_per_byte' : 0.5,
+        'start_tbs' : 50,
+        'build_time' : 0.0,
+        'qemu_build_time' : 0.0,
+    }
+
+    def __init__(self, stubdir, costs):
+        """Constructor just records where the tools go and their costs,
+           which override the defaults."""
+        self.stubdir = os.path.abspath(stubdir)
+        self.bindir = os.path.join(self.stubdir, 'bin')
+        self.qemudir = os.path.join(self.stubdir, 'qemu')
+        self.logfile = os.path.join(self.stubdir, 'stub-log.jsonl')
+        self._cfgfile = os.path.join(self.stubdir, 'stub-config.json')
+        self._costs = dict(StubTools.DEFAULTS)
+        self._costs.update(costs)
+
+    def _write_stub(self, filename):
+        """Write the stub program as filename, which it then behaves as."""
+        src = _STUB_SRC.replace('@PYTHON@', sys.executable)
+        src = src.replace('@CONFIG@', self._cfgfile)
+        src = src.replace('@SUPPORT@', os.path.dirname(os.path.abspath(
+            __file__)))
+        with open(filename, 'w', encoding='utf-8') as fh:
+            fh.write(src)
+        os.chmod(filename, os.stat(filename).st_mode | stat.S_IXUSR
+                 | stat.S_IXGRP | stat.S_IXOTH)
+
+    def _git(self, cmd):
+        """Run a git command in the stub QEMU repository."""
+        subprocess.run(
+            f'git -c user.name=stub -c user.email=stub@localhost {cmd}',
+            shell=True,
+            executable='/bin/bash',
+            cwd=self.qemudir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+
+    def create(self, commits, installdir):
+        """Create the tools, the stub QEMU repository with a branch for each
+           commit and the sysroot ldd in installdir.  Any existing tools are
+           replaced."""
+        shutil.rmtree(self.stubdir, ignore_errors=True)
+        os.makedirs(self.bindir)
+        os.makedirs(self.qemudir)
+        cfg = dict(self._costs)
+        cfg['log'] = self.logfile
+        with open(self._cfgfile, 'w', encoding='utf-8') as fh:
+            json.dump(cfg, fh, indent=2)
+        for tool in StubTools.BIN_TOOLS:
+            self._write_stub(os.path.join(self.bindir, tool))
+        lddir = os.path.join(installdir, 'sysroot', 'usr', 'bin')
+        os.makedirs(lddir, exist_ok=True)
+        self._write_stub(os.path.join(lddir, 'ldd'))
+
+        self._write_stub(os.path.join(self.qemudir, 'configure'))
+        self._git('init -q')
+        self._git('add configure')
+        self._git('commit -q -m "Stub QEMU"')
+        for cmt in commits:
+            self._git(f'branch {cmt}')
+
+    def path(self):
+        """The search path with the tools first."""
+        return f'{self.bindir}:{os.environ["PATH"]}'
+
+    def reset(self):
+        """Forget everything the tools have done."""
+        try:
+            os.remove(self.logfile)
+        except FileNotFoundError:
+            pass
+
+    def records(self):
+        """The records of everything the tools have done, as a list of
+           dictionaries."""
+        res = []
+        try:
+            with open(self.logfile, 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        res.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return res
@@ -13,6 +13,7 @@
 Benchmarking common procedures.
 """
 
+import json
 import logging
 import os
 import sys
@@ -22,6 +23,7 @@ import sys
 
 __all__ = [
     'Log',
+    'append_jsonl',
     'check_python_version',
 ]
 
@@ -36,17 +38,17 @@ class Log:
         if not os.path.isabs(logdir):
             logdir = os.path.abspath(logdir)
 
-            if not os.path.isdir(logdir):
-                try:
-                    os.makedirs(logdir)
-                except PermissionError:
-                    print(f'ERROR: Unable to create log directory {logdir}',
-                          file=sys.stderr)
-                    sys.exit(1)
+        if not os.path.isdir(logdir):
+            try:
+                os.makedirs(logdir)
+            except PermissionError:
+                print(f'ERROR: Unable to create log directory {logdir}',
+                      file=sys.stderr)
+                sys.exit(1)
 
-            if not os.access(logdir, os.W_OK):
-                print(f'ERROR: Unable to write to log directory {logdir}',
-                    file=sys.stderr)
+        if not os.access(logdir, os.W_OK):
+            print(f'ERROR: Unable to write to log directory {logdir}',
+                file=sys.stderr)
 
         return logdir
 
@@ -104,3 +106,19 @@ def check_python_version(major, minor):
         print(f'ERROR: Requires Python {major}.{minor} or later',
               file=sys.stderr)
         sys.exit(1)
+
+
+def append_jsonl(filename, rec):
+    """Append a record to a file as a JSON line.  The line is written with a
+       single write to a file opened for appending, so the lines of several
+       processes are kept whole.  Errors are ignored, since recording what
+       the harness does must never stop the benchmarking."""
+    line = json.dumps(rec, default=str) + '\n'
+    try:
+        fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
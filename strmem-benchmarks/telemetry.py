@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+# Live telemetry of benchmarking campaigns
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to record what the benchmarking is doing as it happens, and to show
+progress.
+
+Events are appended as JSON lines to a single file.  They are written both
+by the main process and by the worker processes of the pools, so each event
+is written with a single write to a file opened for append, which keeps lines
+whole.  The main process follows the file to show a live view of progress,
+and optionally to export metrics in the Prometheus textfile format.
+"""
+
+import concurrent.futures
+import json
+import os
+import os.path
+import sys
+import time
+
+from support import append_jsonl
+
+# What we export
+
+__all__ = [
+    'Telemetry',
+]
+
+
+class Telemetry:
+    """A class to emit telemetry events and follow them to show progress.
+
+       A point is a unit of work which is reported as it completes: a size
+       of a model when running, a build when building and a profile when
+       profiling.  A task is a single job in a pool, which may do many
+       points.
+
+       Instances are copied to the worker processes, so only hold simple
+       state."""
+
+    # Name of the QEMU process we count as active
+    QEMU_COMM = 'qemu-riscv64'
+
+    def __init__(self, args):
+        """Constructor just records where events and metrics go."""
+        self._eventfile = args.get('telemetry')
+        self._promfile = args.get('prometheus_file')
+        self._interval = args.get('telemetry_interval')
+        self._live = args.get('live') and sys.stdout.isatty()
+        self._target_time = args.get('target_time')
+        self._ncpus = os.cpu_count() or 1
+
+    def emit(self, event, **fields):
+        """Append an event with the given fields to the event file."""
+        rec = {'ts': time.time(), 'pid': os.getpid(), 'event': event}
+        rec.update(fields)
+        append_jsonl(self._eventfile, rec)
+
+    def _follow(self, state):
+        """Read any new events for the phase, updating the state."""
+        try:
+            with open(self._eventfile, 'rb') as fh:
+                fh.seek(state['offset'])
+                data = fh.read()
+        except OSError:
+            return
+        # Only whole lines, leaving any partial line for next time
+        end = data.rfind(b'\n') + 1
+        state['offset'] += end
+        for line in data[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get('phase') != state['phase']:
+                continue
+            if rec['event'] == 'point':
+                state['points'] += 1
+            elif rec['event'] == 'point_failed':
+                state['failed'] += 1
+
+    def points(self, phases, since):
+        """The point events of any of the given phases emitted since the
+           given time, as a list of dictionaries in the order emitted."""
+        res = []
+        try:
+            with open(self._eventfile, 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec['event'] == 'point' and rec['ts'] >= since \
+                       and rec.get('phase') in phases:
+                        res.append(rec)
+        except OSError:
+            pass
+        return res
+
+    def _active_qemu(self):
+        """The number of QEMU processes running, or None if we cannot
+           tell."""
+        try:
+            pids = [p for p in os.listdir('/proc') if p.isdigit()]
+        except OSError:
+            return None
+        n = 0
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/comm', 'r', encoding='utf-8') as fh:
+                    if fh.read().strip() == Telemetry.QEMU_COMM:
+                        n += 1
+            except OSError:
+                continue
+        return n
+
+    def _eta(self, state):
+        """Estimated seconds to complete the phase, or None if we cannot
+           tell.  We use the rate at which points have completed so far.
+           Until the first point completes, we assume each takes a timing
+           and an instruction counting run of the calibration target time,
+           with one per CPU running at once."""
+        remaining = state['npoints'] - state['points'] - state['failed']
+        if remaining <= 0:
+            return 0.0
+        elapsed = time.time() - state['start']
+        done = state['points'] + state['failed']
+        if done > 0:
+            return remaining * elapsed / done
+        if state['phase'] != 'run':
+            return None
+        per_point = 2.0 * float(self._target_time)
+        return max(0.0, remaining * per_point / self._ncpus - elapsed)
+
+    @staticmethod
+    def _hms(secs):
+        """Format seconds as hours, minutes and seconds."""
+        if secs is None:
+            return '--:--:--'
+        secs = int(secs)
+        return f'{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}'
+
+    def _show(self, state, qemu, eta):
+        """Show the live view on a single line of the terminal."""
+        qstr = '-' if qemu is None else f'{qemu}/{self._ncpus}'
+        line = (f'{state["phase"]}: {state["points"]}/{state["npoints"]} '
+                f'points, {state["tasks"]}/{state["ntasks"]} tasks, '
+                f'{state["failed"]} failed, QEMU/cores {qstr}, '
+                f'ETA {self._hms(eta)}')
+        print(f'\r{line:<79s}', end='', flush=True)
+
+    def _export(self, state, qemu, eta):
+        """Write the metrics for the phase in Prometheus textfile format.
+           We write to a temporary file and rename, so the collector never
+           sees a partial file."""
+        phase = state['phase']
+        metrics = [
+            ('points_total', 'Points in the phase', state['npoints']),
+            ('points_completed', 'Points completed', state['points']),
+            ('points_failed', 'Points failed', state['failed']),
+            ('tasks_total', 'Pool tasks in the phase', state['ntasks']),
+            ('tasks_completed', 'Pool tasks completed', state['tasks']),
+            ('elapsed_seconds', 'Time since the phase started',
+             time.time() - state['start']),
+            ('eta_seconds', 'Estimated time to complete the phase', eta),
+            ('qemu_processes', 'QEMU processes running', qemu),
+            ('cpus', 'Host CPUs', self._ncpus),
+        ]
+        lines = []
+        for name, desc, val in metrics:
+            if val is None:
+                continue
+            lines.append(f'# HELP strmem_{name} {desc}')
+            lines.append(f'# TYPE strmem_{name} gauge')
+            lines.append(f'strmem_{name}{{phase="{phase}"}} {val}')
+        tmpf = self._promfile + '.tmp'
+        try:
+            with open(tmpf, 'w', encoding='utf-8') as fh:
+                fh.write('\n'.join(lines) + '\n')
+            os.replace(tmpf, self._promfile)
+        except OSError:
+            pass
+
+    def _tick(self, state):
+        """Update the state from new events and show it."""
+        self._follow(state)
+        if not self._live and not self._promfile:
+            return
+        qemu = self._active_qemu()
+        eta = self._eta(state)
+        if self._live:
+            self._show(state, qemu, eta)
+        if self._promfile:
+            self._export(state, qemu, eta)
+
+    @staticmethod
+    def _name(key):
+        """The name of a task from its key, which is a model or a tuple of a
+           model and a size."""
+        if isinstance(key, tuple):
+            return '-'.join(str(getattr(k, 'suffix', k)) for k in key)
+        return str(getattr(key, 'suffix', key))
+
+    def as_completed(self, phase, resf, npoints):
+        """Generate the key and future of each entry of the dictionary resf
+           of futures, in the order they complete, showing progress in the
+           meantime.  npoints is the number of points the futures will
+           report."""
+        state = {'phase': phase, 'start': time.time(), 'npoints': npoints,
+                 'ntasks': len(resf), 'points': 0, 'failed': 0, 'tasks': 0,
+                 'offset': 0}
+        try:
+            state['offset'] = os.path.getsize(self._eventfile)
+        except OSError:
+            pass
+        self.emit('phase_start', phase=phase, tasks=len(resf),
+                  points=npoints)
+        pending = {f: k for k, f in resf.items()}
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, timeout=self._interval,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+                key = pending.pop(f)
+                state['tasks'] += 1
+                ok = f.exception() is None and bool(f.result())
+                self.emit('task_end', phase=phase, task=self._name(key),
+                          ok=ok)
+                if not self._live:
+                    print('.', end='', flush=True)
+                yield key, f
+            self._tick(state)
+        print()
+        self.emit('phase_end', phase=phase,
+                  duration=time.time() - state['start'],
+                  points=state['points'], failed=state['failed'])
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+# Timeline tracing of the benchmarking harness
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""
+A module to record spans of time spent in each phase, subprocess and pool
+task of the harness, and export them as a Chrome trace, which can be viewed
+with Perfetto (https://ui.perfetto.dev) or chrome://tracing.
+
+Spans are recorded by the main process and by the worker processes of the
+pools, so while running each is appended as a JSON line to a spans file
+alongside the trace file, with a single write to keep lines whole.  At the
+end the main process converts them to the trace.  Each process has its own
+lane, so we can see what every worker was doing, and when it was idle.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import os.path
+import threading
+import time
+
+from support import append_jsonl
+
+# What we export
+
+__all__ = [
+    'Tracer',
+    'traced',
+]
+
+
+class Tracer:
+    """A class to record spans and export them as a Chrome trace.  If no
+       trace file is given, tracing is disabled and does nothing.
+
+       Instances are copied to the worker processes, so only hold simple
+       state."""
+
+    def __init__(self, args):
+        """Constructor just records where the trace goes."""
+        self._tracefile = args.get('trace')
+        if self._tracefile:
+            self._spanfile = self._tracefile + '.spans'
+        else:
+            self._spanfile = None
+
+    @staticmethod
+    def now():
+        """The current time in microseconds, which is the unit of Chrome
+           traces.  Wall clock time, so it is the same in every process."""
+        return time.time_ns() // 1000
+
+    def reset(self):
+        """Remove any spans left from a previous run."""
+        if self._spanfile:
+            try:
+                os.remove(self._spanfile)
+            except FileNotFoundError:
+                pass
+
+    def complete(self, name, cat, start, **args):
+        """Record a span which started at start and finishes now."""
+        if not self._spanfile:
+            return
+        end = Tracer.now()
+        rec = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start,
+               'dur': end - start, 'pid': os.getpid(),
+               'tid': threading.get_native_id(), 'args': args}
+        append_jsonl(self._spanfile, rec)
+
+    @contextlib.contextmanager
+    def span(self, name, cat='phase', **args):
+        """A context manager recording a span around its body."""
+        start = Tracer.now()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, **args)
+
+    def export(self, log):
+        """Convert the spans to a Chrome trace.  The main process, which is
+           the one exporting, is named "harness" and the others "worker".
+           Return the trace file name, or None if there is no trace."""
+        if not self._spanfile:
+            return None
+        events = []
+        pids = set()
+        try:
+            with open(self._spanfile, 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    events.append(rec)
+                    pids.add(rec['pid'])
+        except FileNotFoundError:
+            pass
+
+        main = os.getpid()
+        for i, pid in enumerate(sorted(pids - {main})):
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                           'args': {'name': f'worker {i + 1}'}})
+            events.append({'name': 'process_sort_index', 'ph': 'M',
+                           'pid': pid, 'args': {'sort_index': i + 1}})
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': main,
+                       'args': {'name': 'harness'}})
+        events.append({'name': 'process_sort_index', 'ph': 'M', 'pid': main,
+                       'args': {'sort_index': 0}})
+        try:
+            with open(self._tracefile, 'w', encoding='utf-8') as fh:
+                json.dump({'traceEvents': events,
+                           'displayTimeUnit': 'ms'}, fh)
+            os.remove(self._spanfile)
+        except OSError as e:
+            ename = type(e).__name__
+            log.warning(f'Warning: Unable to write trace {self._tracefile}: '
+                        f'{ename}')
+            return None
+        log.info(f'Timeline trace in {self._tracefile}')
+        return self._tracefile
+
+
+def traced(cat):
+    """A decorator to record a span around a method, if the object has a
+       tracer in its _tracer attribute, which may only be set by the method
+       itself if it is a constructor.  The span is named after the class
+       and method, and records the configuration or commit of the object and
+       any simple positional arguments."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = Tracer.now()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                tracer = getattr(self, '_tracer', None)
+                if tracer:
+                    spanargs = {}
+                    for attr in ['suffix', 'cmt']:
+                        if hasattr(self, attr):
+                            spanargs[attr] = getattr(self, attr)
+                            break
+                    simple = [a for a in args
+                              if isinstance(a, (int, float, str))]
+                    if simple:
+                        spanargs['args'] = simple
+                    name = f'{type(self).__name__}.{func.__name__}'
+                    tracer.complete(name, cat, start, **spanargs)
+        return wrapper
+    return decorator
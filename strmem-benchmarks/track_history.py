@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+# Script to track results across campaigns
+
+# Copyright (C) 2024 Embecosm Limited
+
+# Contributor: Jeremy Bennett <jeremy.bennett@embecosm.com>
+
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""This tracks performance across many campaigns and QEMU commits.
+
+"ingest" adds the results directories of campaigns to the history database.
+"analyze" finds the change points of every series, and writes the suspected
+regression and improvement commits as CSV and Markdown, with trend charts
+for each benchmark.
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import os.path
+import sqlite3
+import subprocess
+import sys
+import time
+
+from history import ChangePoints
+from history import History
+from plotting import TrendPlot
+from support import Log
+from support import check_python_version
+
+
+def ingest(args, hist, log):
+    """Ingest campaigns."""
+    for resdir in args.resdirs:
+        if not os.path.isdir(resdir):
+            log.warning(f'Warning: {resdir} is not a results directory')
+            continue
+        if hist.ingest(resdir, args.qemudir) is None:
+            log.info(f'Already ingested {resdir}')
+    ncmts, ncamps, npts = hist.stats()
+    log.info(f'History has {ncmts} commits, {ncamps} campaigns and '
+             f'{npts} points')
+
+
+def _date(secs):
+    """A date as a string."""
+    return datetime.datetime.fromtimestamp(secs).strftime('%Y-%m-%d')
+
+
+def _plot(bm, series, changes, outdir, args, log):
+    """Draw the trend charts for one benchmark with gnuplot."""
+    plotfile = os.path.join(outdir, f'history-{bm}.ps')
+    script = TrendPlot(bm, series, changes).script(plotfile)
+    try:
+        subprocess.run(
+            'gnuplot',
+            shell=True,
+            executable='/bin/bash',
+            cwd=outdir,
+            input=script.encode('utf-8'),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=args.timeout,
+            check=True,
+        )
+    except subprocess.TimeoutExpired as e:
+        log.error(f'ERROR: Plotting history of {bm} timed out.')
+        log.debug(e.stderr)
+        return
+    except subprocess.CalledProcessError as e:
+        log.error(f'ERROR: Plotting history of {bm} failed.')
+        log.debug(e.stderr)
+        return
+    log.info(f'History of {bm} in {plotfile}')
+
+
+def analyze(args, hist, log):
+    """Find the change points of every series, and report them."""
+    os.makedirs(args.outdir, exist_ok=True)
+    detector = ChangePoints(args.min_change, args.penalty)
+    start = time.time()
+    rows = []
+    bycommit = {}
+    series = {}
+    changes = {}
+    for bm, vlen, cls in hist.keys(args.bmlist):
+        points = hist.series(bm, vlen, cls)
+        clsname = History.classname(cls)
+        series.setdefault(bm, {}).setdefault(vlen, {})[clsname] = points
+        found = detector.detect([p[2] for p in points])
+        changes.setdefault(bm, {}).setdefault(vlen, {})[clsname] = found
+        for k, chg in found:
+            cmt, date, _ = points[k]
+            kind = 'regression' if chg > 0.0 else 'improvement'
+            rows.append([bm, vlen, clsname, cmt, points[k - 1][0],
+                         _date(date), 100.0 * chg, kind])
+            bycommit.setdefault((date, cmt), []).append(
+                (f'{bm}/{vlen}/{clsname}', chg))
+    nseries = sum(len(c) for v in series.values() for c in v.values())
+    log.info(f'Analyzed {nseries} series in {time.time() - start:.2f}s')
+
+    csvfile = os.path.join(args.outdir, 'history-changes.csv')
+    with open(csvfile, 'w', newline='', encoding='utf-8') as csvf:
+        csvwriter = csv.writer(csvf, dialect=csv.unix_dialect)
+        csvwriter.writerow(['Benchmark', 'VLEN', 'Sizes', 'Commit',
+                            'Previous', 'Date', 'Change %', 'Kind'])
+        csvwriter.writerows(rows)
+    log.info(f'Change points in {csvfile}')
+
+    mdfile = os.path.join(args.outdir, 'history-commits.md')
+    with open(mdfile, 'w', encoding='utf-8') as fh:
+        fh.write('# Suspected regression and improvement commits\n\n')
+        fh.write('Change in ns/inst at each commit where a series of '
+                 'benchmark, VLEN and sizes changed.  Positive is a '
+                 'regression.\n\n')
+        fh.write('| Commit | Date | Regressions | Worst % | Improvements | '
+                 'Best % | Series |\n')
+        fh.write('|:--|:--|--:|--:|--:|--:|:--|\n')
+        for (date, cmt), chgs in sorted(bycommit.items()):
+            ups = [c for _, c in chgs if c > 0.0]
+            downs = [c for _, c in chgs if c < 0.0]
+            worst = f'{100.0 * max(ups):+.1f}' if ups else '-'
+            best = f'{100.0 * min(downs):+.1f}' if downs else '-'
+            names = ', '.join(f'{n} ({100.0 * c:+.1f}%)' for n, c in chgs)
+            fh.write(f'| {cmt} | {_date(date)} | {len(ups)} | {worst} | '
+                     f'{len(downs)} | {best} | {names} |\n')
+    log.info(f'Suspected commits in {mdfile}')
+
+    if args.plots:
+        for bm in series:
+            _plot(bm, series[bm], changes[bm], args.outdir, args, log)
+
+
+def parse_args():
+    """Parse the arguments."""
+    parser = argparse.ArgumentParser(
+        description='Track results across campaigns and QEMU commits')
+    parser.add_argument(
+        '--db',
+        type=str,
+        default='history.db',
+        metavar='FILE',
+        help='History database (default: %(default)s)',
+    )
+    parser.add_argument(
+        '--logdir',
+        type=str,
+        default='logs',
+        metavar='DIR',
+        help='Directory in which to store logs (default: %(default)s)',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ing = sub.add_parser('ingest', help='Add campaigns to the history')
+    ing.add_argument(
+        'resdirs',
+        type=str,
+        nargs='+',
+        metavar='RESDIR',
+        help='Results directories of the campaigns',
+    )
+    ing.add_argument(
+        '--qemudir',
+        type=str,
+        default=None,
+        metavar='DIR',
+        help='QEMU repository for commit dates (default: use the date of ' \
+             'the campaign)',
+    )
+
+    ana = sub.add_parser('analyze', help='Find changes in the history')
+    ana.add_argument(
+        '--outdir',
+        type=str,
+        default='.',
+        metavar='DIR',
+        help='Directory for the results (default: %(default)s)',
+    )
+    ana.add_argument(
+        '--bmlist',
+        type=str,
+        nargs='+',
+        default=None,
+        metavar='BENCHMARK',
+        help='Benchmarks to analyze (default: all)',
+    )
+    ana.add_argument(
+        '--min-change',
+        type=float,
+        default=0.02,
+        metavar='FRAC',
+        help='Smallest relative change reported (default: %(default)s)',
+    )
+    ana.add_argument(
+        '--penalty',
+        type=float,
+        default=4.0,
+        metavar='NUM',
+        help='Penalty for each change, in units of the noise variance ' \
+             'times the log of the series length (default: %(default)s)',
+    )
+    ana.add_argument(
+        '--plots',
+        action='store_true',
+        default=True,
+        help='Draw trend charts (default: %(default)s)',
+    )
+    ana.add_argument(
+        '--no-plots',
+        action='store_false',
+        dest='plots',
+        help='Do not draw trend charts',
+    )
+    ana.add_argument(
+        '--timeout',
+        type=int,
+        default=120,
+        metavar='SECS',
+        help='Timeout in seconds for drawing each chart ' \
+             '(default: %(default)s)',
+    )
+    args = parser.parse_args()
+    if args.command == 'analyze':
+        args.outdir = os.path.abspath(args.outdir)
+    return args
+
+
+def main():
+    """Main program tracking history"""
+    args = parse_args()
+    log = Log()
+    log.setup(args.logdir, 'history-' + time.strftime('%Y-%m-%d-%H-%M-%S')
+              + '.log')
+    try:
+        hist = History(args.db, log)
+    except sqlite3.Error:
+        return 1
+    try:
+        if args.command == 'ingest':
+            ingest(args, hist, log)
+        else:
+            analyze(args, hist, log)
+    finally:
+        hist.close()
+
+# Make sure we have new enough Python and only run if this is the main package
+check_python_version(3, 10)
+if __name__ == '__main__':
+    sys.exit(main())